@@ -0,0 +1,114 @@
+"""Implicit ACK correlation for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from handlers.histogram import LatencyHistogram
+
+logger = logging.getLogger("mqtt-proxy.ack_tracker")
+
+
+class _Outstanding:
+    __slots__ = ("sent", "echoed")
+
+    def __init__(self, sent):
+        self.sent = sent
+        self.echoed = False
+
+
+class AckTracker:
+    """
+    Outstanding-request table for our own node's packets, keyed by packet id.
+
+    Entries are added when the node uplinks one of its own packets to MQTT and are
+    resolved by the broker echo (the packet made it through the broker and back) and
+    by the implicit ACK (ROUTING_APP with request_id: the mesh rebroadcast it).
+    Entries that see no implicit ACK within the timeout count as failures.
+    """
+    def __init__(self, timeout=60, max_entries=4096):
+        self.timeout = timeout
+        self.max_entries = max(1, int(max_entries))
+        self._outstanding = OrderedDict()
+        self._lock = threading.Lock()
+        self.ack_latency = LatencyHistogram()
+        self.echo_latency = LatencyHistogram()
+        self.tracked = 0
+        self.acked = 0
+        self.echoed = 0
+        self.expired = 0
+
+    def track(self, packet_id, now=None):
+        """Start tracking a packet our node sent."""
+        if not packet_id:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            if packet_id in self._outstanding:
+                return  # Uplink retry of the same packet: keep the original send time
+            while len(self._outstanding) >= self.max_entries:
+                self._outstanding.popitem(last=False)
+                self.expired += 1
+            self._outstanding[packet_id] = _Outstanding(now)
+            self.tracked += 1
+
+    def on_echo(self, packet_id, now=None):
+        """The broker echoed the packet back to us."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._outstanding.get(packet_id)
+            if entry is None or entry.echoed:
+                return
+            entry.echoed = True
+            self.echoed += 1
+        self.echo_latency.observe(now - entry.sent)
+
+    def on_ack(self, packet_id, now=None):
+        """An implicit ACK for the packet arrived. Returns the round-trip time or None if untracked."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._outstanding.pop(packet_id, None)
+            if entry is None:
+                return None
+            self.acked += 1
+        latency = now - entry.sent
+        self.ack_latency.observe(latency)
+        logger.debug(f"⚡ ACK for packetId={packet_id} after {latency:.2f}s")
+        return latency
+
+    def _expire(self, now):
+        while self._outstanding:
+            _, oldest = next(iter(self._outstanding.items()))
+            if now - oldest.sent < self.timeout:
+                break
+            self._outstanding.popitem(last=False)
+            self.expired += 1
+
+    def expire(self, now=None):
+        """Expire overdue entries (also done lazily on track())."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+
+    def __len__(self):
+        return len(self._outstanding)
+
+    def success_rate(self):
+        """Share of finished requests that got an implicit ACK, or None if none finished yet."""
+        finished = self.acked + self.expired
+        return self.acked / finished if finished else None
+
+    def stats(self):
+        return {
+            "outstanding": len(self._outstanding),
+            "tracked": self.tracked,
+            "acked": self.acked,
+            "echoed": self.echoed,
+            "expired": self.expired,
+            "success_rate": self.success_rate(),
+            "ack_latency": self.ack_latency.summary(),
+            "echo_latency": self.echo_latency.summary(),
+        }
@@ -0,0 +1,149 @@
+"""LoRa airtime estimation and duty-cycle budget for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from meshtastic.protobuf import mqtt_pb2
+
+logger = logging.getLogger("mqtt-proxy.airtime")
+
+# Modem presets as used by the firmware: preset -> (spreading factor, bandwidth kHz, coding rate denominator)
+# Keyed by Config.LoRaConfig.ModemPreset enum value.
+MODEM_PRESETS = {
+    0: (11, 250.0, 5),   # LONG_FAST
+    1: (12, 125.0, 8),   # LONG_SLOW
+    2: (12, 62.5, 8),    # VERY_LONG_SLOW
+    3: (10, 250.0, 5),   # MEDIUM_SLOW
+    4: (9, 250.0, 5),    # MEDIUM_FAST
+    5: (8, 250.0, 5),    # SHORT_SLOW
+    6: (7, 250.0, 5),    # SHORT_FAST
+    7: (11, 125.0, 8),   # LONG_MODERATE
+    8: (7, 500.0, 5),    # SHORT_TURBO
+    9: (11, 500.0, 5),   # LONG_TURBO
+}
+DEFAULT_LORA_PARAMS = MODEM_PRESETS[0]
+
+# The firmware rounds these "custom" bandwidth settings to the real SX126x/SX128x bandwidths
+_BANDWIDTH_ALIASES = {31: 31.25, 62: 62.5, 200: 203.125, 400: 406.25, 800: 812.5, 1600: 1625.0}
+
+# Meshtastic radio settings
+PREAMBLE_SYMBOLS = 16
+MESH_HEADER_BYTES = 16  # On-air MeshPacket header (dest, from, id, flags, channel hash, ...)
+
+
+def lora_params(lora_config):
+    """
+    Return (spreading_factor, bandwidth_khz, coding_rate) for a Config.LoRaConfig.
+    Falls back to the LONG_FAST preset when the config is missing or incomplete.
+    """
+    if lora_config is None:
+        return DEFAULT_LORA_PARAMS
+    try:
+        if getattr(lora_config, "use_preset", True):
+            return MODEM_PRESETS.get(int(lora_config.modem_preset), DEFAULT_LORA_PARAMS)
+        sf = int(lora_config.spread_factor)
+        bw = int(lora_config.bandwidth)
+        cr = int(lora_config.coding_rate)
+        if not (7 <= sf <= 12) or bw <= 0 or not (5 <= cr <= 8):
+            return DEFAULT_LORA_PARAMS
+        return sf, float(_BANDWIDTH_ALIASES.get(bw, bw)), cr
+    except (TypeError, ValueError):
+        return DEFAULT_LORA_PARAMS
+
+
+def estimate_airtime(payload_bytes, spreading_factor, bandwidth_khz, coding_rate):
+    """
+    Time on air in seconds for one LoRa frame (Semtech SX127x/SX126x formula,
+    explicit header, CRC on, low data rate optimisation when symbols exceed 16 ms).
+    """
+    sf = spreading_factor
+    t_sym = (2 ** sf) / (bandwidth_khz * 1000.0)
+    low_dr = 1 if t_sym > 0.016 else 0
+    cr = coding_rate - 4  # 4/5 -> 1 ... 4/8 -> 4
+    t_preamble = (PREAMBLE_SYMBOLS + 4.25) * t_sym
+    numerator = 8 * payload_bytes - 4 * sf + 28 + 16
+    symbols = 8 + max(math.ceil(numerator / (4.0 * (sf - 2 * low_dr))) * (cr + 4), 0)
+    return t_preamble + symbols * t_sym
+
+
+def frame_bytes(payload):
+    """
+    Estimate the on-air frame size of a ServiceEnvelope payload: the MeshPacket header
+    plus the (encrypted) packet payload. Falls back to the envelope size if unparseable.
+    """
+    try:
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.ParseFromString(payload)
+        packet = envelope.packet
+        if packet.HasField("encrypted"):
+            return MESH_HEADER_BYTES + len(packet.encrypted)
+        if packet.HasField("decoded"):
+            return MESH_HEADER_BYTES + packet.decoded.ByteSize()
+    except Exception:
+        pass
+    return len(payload)
+
+
+class DutyCycleBudget:
+    """
+    Sliding-window transmit budget, e.g. 10% of 3600 s for EU868 sub-band g3.
+
+    record() logs the airtime of each send; wait_time() says how long to hold the
+    next frame so that the airtime inside any window never exceeds the limit.
+    """
+    def __init__(self, limit_percent, window_seconds=3600):
+        self.window = float(window_seconds)
+        self.budget = self.window * float(limit_percent) / 100.0
+        self._sends = deque()  # (timestamp, airtime)
+        self._used = 0.0
+        self._lock = threading.Lock()
+        self.total_airtime = 0.0
+        self.total_wait = 0.0
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self._sends and self._sends[0][0] <= cutoff:
+            _, airtime = self._sends.popleft()
+            self._used -= airtime
+        if not self._sends:
+            self._used = 0.0  # Avoid float drift once the window is empty
+
+    def used(self, now=None):
+        """Airtime (seconds) spent within the current window."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return self._used
+
+    def remaining(self, now=None):
+        """Airtime (seconds) still available within the current window."""
+        return max(0.0, self.budget - self.used(now))
+
+    def wait_time(self, airtime, now=None):
+        """Seconds to wait before a frame of the given airtime fits in the budget."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            excess = self._used + airtime - self.budget
+            if excess <= 0:
+                return 0.0
+            # Walk the window until enough old airtime has aged out
+            freed = 0.0
+            for timestamp, spent in self._sends:
+                freed += spent
+                if freed >= excess:
+                    return max(0.0, timestamp + self.window - now)
+            # Frame is larger than the whole budget: send once the window is empty
+            return max(0.0, self._sends[-1][0] + self.window - now) if self._sends else 0.0
+
+    def record(self, airtime, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._sends.append((now, airtime))
+            self._used += airtime
+            self.total_airtime += airtime
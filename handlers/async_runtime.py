@@ -0,0 +1,200 @@
+"""asyncio runtime for MQTT Proxy: radio, MQTT, queue pacing and health checks on one event loop."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import signal
+import asyncio
+import logging
+
+logger = logging.getLogger("mqtt-proxy.async_runtime")
+
+RECONNECT_DELAY = 5
+
+
+def _on_loop(loop):
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+def call_on_loop(loop, callback, *args):
+    """Run callback on loop: directly when already on it, otherwise scheduled thread-safely."""
+    if _on_loop(loop):
+        callback(*args)
+    else:
+        loop.call_soon_threadsafe(callback, *args)
+
+
+class AsyncioMqttLoop:
+    """
+    Drives a paho client from an asyncio event loop instead of paho's network thread,
+    using paho's external socket callbacks: the socket is read when readable, written
+    when paho has data queued, and loop_misc() (keepalive pings) runs once a second.
+
+    Connecting is a blocking socket connect, so it runs in the loop's executor. A lost
+    connection is re-established every reconnect_delay seconds until stop().
+    """
+    def __init__(self, client, loop, reconnect_delay=5):
+        self.client = client
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.running = False
+        self._sock = None
+        self._task = None
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._sock = sock
+        call_on_loop(self.loop, self.loop.add_reader, sock, self._read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        if sock is self._sock:
+            self._sock = None
+        # By descriptor: paho closes the socket right after this callback returns
+        call_on_loop(self.loop, self._remove, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        call_on_loop(self.loop, self.loop.add_writer, sock, self._write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        call_on_loop(self.loop, self.loop.remove_writer, sock.fileno())
+
+    def _remove(self, fd):
+        self.loop.remove_reader(fd)
+        self.loop.remove_writer(fd)
+
+    def _read(self):
+        self.client.loop_read()
+
+    def _write(self):
+        self.client.loop_write()
+
+    def start(self, connect):
+        """Connect with connect() (a blocking call, run in the executor) and keep the connection up."""
+        self.running = True
+        if _on_loop(self.loop):
+            self._task = self.loop.create_task(self._run(connect))
+        else:
+            self._task = asyncio.run_coroutine_threadsafe(self._run(connect), self.loop)
+
+    async def _run(self, connect):
+        attempt = connect
+        while self.running:
+            if self._sock is None:
+                try:
+                    await self.loop.run_in_executor(None, attempt)
+                except Exception as e:
+                    logger.warning("⚠️ MQTT connect failed: %s. Retrying in %ds.", e, self.reconnect_delay)
+                    await asyncio.sleep(self.reconnect_delay)
+                    continue
+                finally:
+                    # connect() stored the broker details, later attempts only reconnect
+                    attempt = self.client.reconnect
+            self.client.loop_misc()
+            await asyncio.sleep(1 if self._sock is not None else self.reconnect_delay)
+
+    def stop(self):
+        """Flush what paho has queued (e.g. DISCONNECT) and detach from the loop."""
+        self.running = False
+        if self._task is not None:
+            call_on_loop(self.loop, self._task.cancel)
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                self.client.loop_write()
+            except Exception:
+                pass
+            # Unless writing the DISCONNECT already closed it (and ran _on_socket_close)
+            if sock.fileno() != -1:
+                call_on_loop(self.loop, self._remove, sock.fileno())
+
+
+class AsyncProxyRuntime:
+    """
+    Runs an MQTTProxy on a single asyncio event loop instead of its thread-per-task layout.
+
+    The radio (TCP through asyncio streams), the MQTT client (AsyncioMqttLoop), queue pacing
+    (MessageQueue.run_async), the once-a-second health/status tick and the reconnect timer
+    all run on the loop, so a shutdown is a task cancellation. Serial radios still use the
+    library's reader thread; only its frames are handled off the loop.
+    """
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.loop = None
+        self._main = None
+
+    def run(self):
+        try:
+            asyncio.run(self.main())
+        except asyncio.CancelledError:
+            pass
+
+    async def main(self):
+        proxy = self.proxy
+        self.loop = asyncio.get_running_loop()
+        self._main = asyncio.current_task()
+        proxy.event_loop = self.loop
+        proxy._start_services(signals=False)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self.shutdown)
+
+        while proxy.running:
+            proxy.iface = None
+            queue_task = None
+            try:
+                proxy.iface = await self._open_interface()
+                logger.info("🔌 TCP/Serial connection initiated (event loop)...")
+                await self._wait_for_config()
+                proxy._activate()
+                queue_task = self.loop.create_task(proxy.message_queue.run_async())
+
+                while proxy.running and proxy.iface and not getattr(proxy.iface, "closed", False):
+                    await asyncio.sleep(1)
+                    proxy._tick(time.time())
+            except Exception as e:
+                logger.error("❌ Connection error: %s", e)
+            finally:
+                if queue_task is not None:
+                    queue_task.cancel()
+                proxy._cleanup()
+
+            if proxy.running:
+                logger.info("⏳ Reconnecting in %d seconds...", RECONNECT_DELAY)
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _open_interface(self):
+        # Imported here to keep this module free of the proxy's handler imports at load time
+        from handlers.meshtastic import AsyncTCPInterface, create_interface
+        config = self.proxy._interface_config()
+        if config.interface_type != "tcp":
+            return await self.loop.run_in_executor(None, create_interface, config, self.proxy)
+        iface = AsyncTCPInterface(config.tcp_node_host, self.loop, portNumber=config.tcp_node_port,
+                                  timeout=config.tcp_timeout, proxy=self.proxy)
+        try:
+            await iface.open()
+        except BaseException:
+            iface.close()
+            raise
+        return iface
+
+    async def _wait_for_config(self):
+        """Event loop version of MQTTProxy._wait_for_config."""
+        from config import cfg
+        wait_start = time.time()
+        while self.proxy.running:
+            node = self.proxy.iface.localNode
+            if node and node.nodeNum != -1 and node.moduleConfig:
+                return
+            if time.time() - wait_start > cfg.config_wait_timeout:
+                logger.warning(f"⚠️ Connected but no config received for {cfg.config_wait_timeout}s...")
+            await asyncio.sleep(cfg.poll_interval)
+
+    def shutdown(self):
+        self.proxy.handle_sigint(None, None)
+        if self._main is not None:
+            self._main.cancel()
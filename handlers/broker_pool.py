@@ -0,0 +1,140 @@
+"""Per-broker connections for extra MQTT roots in MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import ssl
+import time
+import logging
+from urllib.parse import urlsplit, unquote
+import paho.mqtt.client as mqtt
+from handlers.async_runtime import AsyncioMqttLoop
+
+logger = logging.getLogger("mqtt-proxy.broker_pool")
+
+
+def parse_broker_url(url):
+    """
+    Split "mqtt[s]://user:pass@host:port" into (host, port, username, password, use_tls).
+    The port defaults to 1883, or 8883 for mqtts.
+    """
+    parts = urlsplit(url)
+    use_tls = parts.scheme == "mqtts"
+    port = parts.port or (8883 if use_tls else 1883)
+    username = unquote(parts.username) if parts.username else None
+    password = unquote(parts.password) if parts.password else None
+    return parts.hostname, port, username, password, use_tls
+
+
+def redact_url(url):
+    """The broker URL without its password, for logs and status lines."""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = parts.netloc.replace(f":{parts.password}@", ":***@", 1)
+    return parts._replace(netloc=netloc).geturl()
+
+
+class BrokerConnection:
+    """
+    A subscribe-only connection to the broker that serves some of the extra roots.
+
+    Received messages go through the primary handler's ingress chain, so loop protection,
+    dedup and virtual channel rewrites behave the same whichever broker delivered them.
+    Uplinks are still published on the primary connection only.
+    """
+    def __init__(self, url, roots, handler, index):
+        self.url = url
+        self.roots = list(roots)
+        self.handler = handler
+        self.host, self.port, self.username, self.password, self.use_tls = parse_broker_url(url)
+        self.client_id = f"MeshtasticPythonMqttProxy-{handler.node_id}-{index}"
+        self.client = None
+        self._network = None
+        self.connected = False
+        self.connects = 0
+        self.reconnects = 0
+        self.rx_count = 0
+        self.last_activity = 0
+
+    def start(self):
+        """Connect and start this connection's network loop."""
+        if not self.host:
+            logger.error("❌ Invalid broker URL for extra roots %s: %s", self.roots, redact_url(self.url))
+            return
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+        if self.username:
+            self.client.username_pw_set(self.username, self.password)
+        if self.use_tls:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            self.client.tls_set_context(context)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        try:
+            logger.info("🔌 Connecting to %s:%d for extra roots %s...", self.host, self.port, ", ".join(self.roots))
+            event_loop = getattr(self.handler, "event_loop", None)
+            if event_loop is not None:
+                self._network = AsyncioMqttLoop(self.client, event_loop)
+                self._network.start(lambda: self.client.connect(self.host, self.port, 60))
+            else:
+                self.client.connect(self.host, self.port, 60)
+                self.client.loop_start()
+        except Exception as e:
+            logger.error("❌ Failed to connect to extra root broker %s: %s", redact_url(self.url), e)
+
+    def stop(self):
+        if self.client:
+            try:
+                if self._network is not None:
+                    self.client.disconnect()
+                    self._network.stop()
+                    self._network = None
+                else:
+                    self.client.loop_stop()
+                    self.client.disconnect()
+            except Exception:
+                pass
+
+    def _on_connect(self, client, userdata, flags, rc, props=None):
+        if rc != 0:
+            self.connected = False
+            logger.error("❌ Extra root broker %s connect failed: %s", redact_url(self.url), rc)
+            return
+        self.connected = True
+        self.last_activity = time.time()
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        logger.info("✅ Extra root broker %s connected", redact_url(self.url))
+        for topic in self.handler.planner.plan_roots(self.roots):
+            logger.info("📥 Subscribing (%s): %s", self.host, topic)
+            client.subscribe(topic)
+
+    def _on_disconnect(self, client, userdata, flags, rc, props=None):
+        self.connected = False
+        if rc != 0:
+            logger.warning("⚠️ Extra root broker %s disconnected (rc=%s). Will attempt to reconnect.",
+                           redact_url(self.url), rc)
+
+    def _on_message(self, client, userdata, message):
+        self.handler.receive(message, self)
+
+    def stats(self):
+        return {
+            "url": redact_url(self.url),
+            "roots": list(self.roots),
+            "connected": self.connected,
+            "rx": self.rx_count,
+            "reconnects": self.reconnects,
+            "last_activity": self.last_activity,
+        }
+
+
+def build_pool(handler, root_brokers):
+    """One BrokerConnection per distinct broker URL, serving every root mapped to it."""
+    by_url = {}
+    for root, url in root_brokers.items():
+        by_url.setdefault(url, []).append(root)
+    return [BrokerConnection(url, roots, handler, i + 1) for i, (url, roots) in enumerate(by_url.items())]
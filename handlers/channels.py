@@ -0,0 +1,85 @@
+"""Channel permission index for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import logging
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+logger = logging.getLogger("mqtt-proxy.channels")
+
+# One entry per enabled channel slot on the node.
+# name is the display name as configured (or the firmware default) with its original case.
+ChannelEntry = namedtuple("ChannelEntry", ["index", "uplink", "downlink", "role", "name"])
+
+_EMPTY = MappingProxyType({})
+
+
+def channel_display_name(index, ch):
+    """Return the name the firmware uses for a channel slot in MQTT topics."""
+    name = ch.settings.name
+    if not name:
+        name = "LongFast" if index == 0 else f"CH{index}"
+    return name
+
+
+class ChannelIndex:
+    """
+    Immutable lookup table from lowercased channel name to ChannelEntry.
+
+    The table is rebuilt from localNode.channels whenever the channel list object
+    changes or invalidate() is called (after admin set-channel traffic or a reconnect),
+    so the per-packet uplink/downlink checks are a single dict lookup.
+    Readers always see either the old or the new table, never a half-built one.
+    """
+    def __init__(self):
+        self._table = _EMPTY
+        self._source = None
+        # Invalidation generation requested vs. generation the current table was built for.
+        # Using counters instead of a flag means an invalidate() racing a rebuild is never lost.
+        self._requested = 0
+        self._built = -1
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def invalidate(self):
+        """Mark the table stale; it is rebuilt on the next lookup."""
+        self._requested += 1
+
+    def get_table(self, channels):
+        """Return the current table for the given channel list, rebuilding if stale."""
+        if self._built != self._requested or channels is not self._source:
+            self.rebuild(channels)
+        return self._table
+
+    def lookup(self, channels, channel_name):
+        """Return the ChannelEntry for channel_name (case-insensitive), or None."""
+        return self.get_table(channels).get(channel_name.lower())
+
+    def rebuild(self, channels):
+        """Build a new table from a list of Channel protobufs and swap it in atomically."""
+        generation = self._requested
+        table = {}
+        for i, ch in enumerate(channels or []):
+            if ch.role == 0: # DISABLED
+                continue
+            name = channel_display_name(i, ch)
+            # Note: Meshtastic protobuf might use default values if field is not present
+            entry = ChannelEntry(
+                index=i,
+                uplink=getattr(ch.settings, "uplink_enabled", True),
+                downlink=getattr(ch.settings, "downlink_enabled", True),
+                role=ch.role,
+                name=name,
+            )
+            # First slot wins if two channels share a name, matching firmware lookup order
+            table.setdefault(name.lower(), entry)
+
+        with self._lock:
+            self._table = MappingProxyType(table)
+            self._source = channels
+            self._built = generation
+            self.version += 1
+        logger.debug("🗂️ Channel index rebuilt (%d channels, version %d)", len(table), self.version)
+        return self._table
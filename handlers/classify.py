@@ -0,0 +1,205 @@
+"""Decrypt-and-classify of downlink packets for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import base64
+import struct
+import time
+import logging
+import threading
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import portnums_pb2
+from google.protobuf.message import DecodeError
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from handlers.channels import channel_display_name
+
+logger = logging.getLogger("mqtt-proxy.classify")
+
+# The well-known default channel key ("AQ==" / psk index 1)
+DEFAULT_KEY = bytes([0xd4, 0xf1, 0xbb, 0x3a, 0x20, 0x29, 0x07, 0x59,
+                     0xf0, 0xbc, 0xff, 0xab, 0xcf, 0x4e, 0x69, 0x01])
+
+_VALID_PORTNUMS = frozenset(portnums_pb2.PortNum.values())
+
+
+def expand_psk(psk):
+    """
+    Expand a channel PSK the way the firmware does.
+    Returns the AES key, or None for an unencrypted channel.
+    """
+    psk = bytes(psk or b"")
+    if not psk:
+        return None
+    if len(psk) == 1:
+        index = psk[0]
+        if index == 0:
+            return None
+        # Simple keys 1..255: the default key with its last byte bumped by index - 1
+        return DEFAULT_KEY[:-1] + bytes([(DEFAULT_KEY[-1] + index - 1) & 0xff])
+    if len(psk) < 16:
+        return psk.ljust(16, b"\x00")
+    if 16 < len(psk) < 32:
+        return psk.ljust(32, b"\x00")
+    return psk[:32]
+
+
+def _xor_hash(data):
+    value = 0
+    for b in data:
+        value ^= b
+    return value
+
+
+def channel_hash(name, key):
+    """The 8-bit channel hash carried in MeshPacket.channel for encrypted packets."""
+    return _xor_hash(name.encode("utf-8")) ^ _xor_hash(key or b"")
+
+
+def parse_extra_keys(raw):
+    """Parse "Name=base64psk,Other=AQ==" into {name: key}."""
+    keys = {}
+    for entry in (raw or "").split(","):
+        entry = entry.strip()
+        if not entry or "=" not in entry:
+            continue
+        name, psk = entry.split("=", 1)
+        try:
+            key = expand_psk(base64.b64decode(psk.strip()))
+        except (ValueError, TypeError):
+            logger.warning("⚠️ Ignoring invalid channel key for '%s'", name.strip())
+            continue
+        if key:
+            keys[name.strip()] = key
+    return keys
+
+
+def decrypt(key, packet_id, sender, data):
+    """AES-CTR decrypt a MeshPacket payload. Nonce: packet id (u64 LE), from (u32 LE), 4 zero bytes."""
+    nonce = struct.pack("<QII", packet_id, sender, 0)
+    decryptor = Cipher(algorithms.AES(key), modes.CTR(nonce)).decryptor()
+    return decryptor.update(data) + decryptor.finalize()
+
+
+class ChannelKeyCache:
+    """
+    Channel keys indexed by lowercased name and by channel hash.
+
+    Built from localNode.channels plus configured extra-root keys, and rebuilt when the
+    channel list object changes or invalidate() is called (same scheme as ChannelIndex).
+    """
+    def __init__(self, extra_keys=None):
+        self.extra_keys = dict(extra_keys or {})
+        self._by_name = {}
+        self._by_hash = {}
+        self._source = None
+        self._requested = 0
+        self._built = -1
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._requested += 1
+
+    def _tables(self, channels):
+        if self._built != self._requested or channels is not self._source:
+            self.rebuild(channels)
+        return self._by_name, self._by_hash
+
+    def rebuild(self, channels):
+        generation = self._requested
+        by_name = {}
+        by_hash = {}
+
+        def add(name, key):
+            by_name.setdefault(name.lower(), key)
+            by_hash.setdefault(channel_hash(name, key), []).append(key)
+
+        for i, ch in enumerate(channels or []):
+            if ch.role == 0:  # DISABLED
+                continue
+            key = expand_psk(ch.settings.psk)
+            if key:
+                add(channel_display_name(i, ch), key)
+        for name, key in self.extra_keys.items():
+            add(name, key)
+
+        with self._lock:
+            self._by_name = by_name
+            self._by_hash = by_hash
+            self._source = channels
+            self._built = generation
+
+    def candidates(self, channels, channel_names, hash_value):
+        """Keys to try for a packet: those of its channel names first, then any key with a matching hash."""
+        by_name, by_hash = self._tables(channels)
+        keys = []
+        for channel_name in channel_names:
+            named = by_name.get(channel_name.lower()) if channel_name else None
+            if named is not None and named not in keys:
+                keys.append(named)
+        for key in by_hash.get(hash_value, ()):
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+
+class PacketClassifier:
+    """
+    Works out the portnum of a downlink packet without modifying it.
+
+    Cleartext packets report decoded.portnum directly; encrypted ones are decrypted with
+    the matching channel key. A key is accepted only if the plaintext parses as a Data
+    message with a known portnum. Per-packet cost is tracked in time_ns / classified.
+    """
+    def __init__(self, key_cache, channels_provider):
+        self.key_cache = key_cache
+        self.get_channels = channels_provider
+        self.classified = 0
+        self.unknown = 0
+        self.time_ns = 0
+
+    def classify(self, ctx):
+        """Return the portnum of ctx's packet, or None if it can't be determined."""
+        start = time.perf_counter_ns()
+        try:
+            portnum = self._classify(ctx)
+        finally:
+            self.time_ns += time.perf_counter_ns() - start
+        if portnum is None:
+            self.unknown += 1
+        else:
+            self.classified += 1
+        return portnum
+
+    def _classify(self, ctx):
+        packet = ctx.packet
+        if packet is None:
+            return None
+        if packet.HasField("decoded"):
+            return packet.decoded.portnum
+        if not packet.HasField("encrypted"):
+            return None
+        # Extra-root messages reach us after the virtual channel rewrite: the topic carries
+        # "<prefix>-<name>" and packet.channel a synthetic hash, but the envelope's
+        # channel_id is still the original channel name
+        envelope = ctx.envelope
+        names = (envelope.channel_id if envelope is not None else None, ctx.channel)
+        if any(name and name.upper() == "PKI" for name in names):
+            return None  # Public-key encrypted, no channel key applies
+        sender = getattr(packet, "from")
+        for key in self.key_cache.candidates(self.get_channels(), names, packet.channel):
+            data = mesh_pb2.Data()
+            try:
+                data.ParseFromString(decrypt(key, packet.id, sender, packet.encrypted))
+            except (DecodeError, ValueError):
+                continue
+            if data.portnum and data.portnum in _VALID_PORTNUMS:
+                return data.portnum
+        return None
+
+    def stats(self):
+        total = self.classified + self.unknown
+        return {
+            "classified": self.classified,
+            "unknown": self.unknown,
+            "us_per_packet": (self.time_ns / total / 1000.0) if total else None,
+        }
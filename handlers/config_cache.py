@@ -0,0 +1,213 @@
+"""Cached config stream for radio mux clients in MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import admin_pb2, portnums_pb2
+from google.protobuf.message import DecodeError
+
+logger = logging.getLogger("mqtt-proxy.config_cache")
+
+# want_config_id nonces the firmware treats specially: config without the NodeDB, or only the NodeDB
+SPECIAL_NONCE_ONLY_CONFIG = 69420
+SPECIAL_NONCE_ONLY_NODES = 69421
+
+# NodeDB size of the firmware (MAX_NUM_NODES on most boards); nodes first heard live beyond
+# this evict the least recently heard one, as the firmware's NodeDB does
+MAX_NUM_NODES = 100
+
+# Admin requests that don't change anything the config stream carries
+_READ_ONLY_ADMIN = ("send_input_event", "set_time_only", "key_verification")
+
+_NODES = ("node_info",)
+
+
+def _frame_key(from_radio, variant):
+    """Snapshot slot for a config stream frame, or None if the frame is not part of the snapshot."""
+    if variant in ("my_info", "metadata", "deviceuiConfig"):
+        return (variant,)
+    if variant in ("config", "moduleConfig"):
+        return (variant, getattr(from_radio, variant).WhichOneof("payload_variant"))
+    if variant == "channel":
+        return (variant, from_radio.channel.index)
+    if variant == "fileInfo":
+        return (variant, from_radio.fileInfo.file_name)
+    return None
+
+
+def changes_config(to_radio):
+    """True if a client's ToRadio is an admin request that may change the node's config or NodeDB."""
+    if not to_radio.HasField("packet") or to_radio.packet.decoded.portnum != portnums_pb2.ADMIN_APP:
+        return False
+    admin = admin_pb2.AdminMessage()
+    try:
+        admin.ParseFromString(to_radio.packet.decoded.payload)
+    except DecodeError:
+        return True
+    which = admin.WhichOneof("payload_variant")
+    return bool(which) and not which.startswith("get_") and which not in _READ_ONLY_ADMIN
+
+
+class _Snapshot:
+    def __init__(self):
+        self.frames = OrderedDict()  # key -> serialized FromRadio, in stream order
+        self.nodes = OrderedDict()   # num -> NodeInfo
+        self.my_node_num = None
+
+
+class ConfigCache:
+    """
+    Snapshot of the node's config stream (my_info, NodeDB, config, module config, channels,
+    metadata), built from the frames the proxy already reads.
+
+    A new snapshot starts at my_info and becomes current at config_complete_id. Streams
+    answering the special config-only / nodes-only nonces are partial: they only update
+    the current snapshot's config frames or NodeDB, and never become a snapshot by
+    themselves. Between streams the NodeDB is kept up to date from NodeInfo/Position
+    packets and the last heard time of every decoded packet, capped at max_nodes. Clients asking for config are answered from the
+    snapshot, with their own want_config_id as the completion nonce. Config-changing admin
+    requests and node reboots invalidate it until the next full stream.
+    """
+    def __init__(self, max_nodes=MAX_NUM_NODES):
+        self.max_nodes = max_nodes
+        self._lock = threading.Lock()
+        self._current = None
+        self._pending = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.built_at = 0
+
+    @property
+    def valid(self):
+        return self._current is not None
+
+    def invalidate(self, reason=""):
+        with self._lock:
+            if self._current is None:
+                return
+            self._current = None
+            self.invalidations += 1
+        logger.info("🗂️ Config cache invalidated%s", f" ({reason})" if reason else "")
+
+    def observe(self, from_radio, raw):
+        """Feed one FromRadio frame (parsed, and the serialized bytes it came from)."""
+        variant = from_radio.WhichOneof("payload_variant")
+        if variant is None:
+            return
+        with self._lock:
+            if variant == "my_info":
+                self._pending = _Snapshot()
+                self._pending.my_node_num = from_radio.my_info.my_node_num
+            if variant == "rebooted":
+                self._current = None
+                self._pending = None
+                self.invalidations += 1
+                return
+            if variant == "config_complete_id":
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    return
+                nonce = from_radio.config_complete_id
+                if nonce not in (SPECIAL_NONCE_ONLY_CONFIG, SPECIAL_NONCE_ONLY_NODES):
+                    self._current = pending
+                    self.built_at = time.time()
+                elif self._current is not None:
+                    self._merge(self._current, pending, nonce)
+                return
+            target = self._pending if self._pending is not None else self._current
+            if target is None:
+                return
+            if variant == "node_info":
+                node = mesh_pb2.NodeInfo()
+                node.CopyFrom(from_radio.node_info)
+                target.frames.setdefault(_NODES, None)
+                target.nodes[node.num] = node
+            elif variant == "packet":
+                if self._current is not None:
+                    self._apply_packet(self._current, from_radio.packet)
+            else:
+                key = _frame_key(from_radio, variant)
+                if key is not None:
+                    target.frames[key] = raw
+
+    @staticmethod
+    def _merge(snapshot, partial, nonce):
+        """Fold a config-only or nodes-only stream into a full snapshot."""
+        for key, raw in partial.frames.items():
+            if key != _NODES:
+                snapshot.frames[key] = raw
+        if nonce == SPECIAL_NONCE_ONLY_NODES:
+            snapshot.nodes = partial.nodes
+        else:
+            snapshot.nodes.update(partial.nodes)
+        snapshot.frames.setdefault(_NODES, None)
+
+    def _evict_node(self, snapshot):
+        """Drop the least recently heard node, never our own or a favorite."""
+        candidates = [node for num, node in snapshot.nodes.items()
+                      if num != snapshot.my_node_num and not node.is_favorite]
+        if candidates:
+            del snapshot.nodes[min(candidates, key=lambda node: node.last_heard).num]
+
+    def _apply_packet(self, snapshot, packet):
+        """Keep the cached NodeDB current from live traffic."""
+        sender = getattr(packet, "from")
+        if not sender or not packet.HasField("decoded"):
+            return
+        node = snapshot.nodes.get(sender)
+        if node is None:
+            if len(snapshot.nodes) >= self.max_nodes:
+                self._evict_node(snapshot)
+            node = mesh_pb2.NodeInfo(num=sender)
+            snapshot.nodes[sender] = node
+            snapshot.frames.setdefault(_NODES, None)
+        if packet.rx_time:
+            node.last_heard = packet.rx_time
+        if packet.rx_snr:
+            node.snr = packet.rx_snr
+        portnum = packet.decoded.portnum
+        try:
+            if portnum == portnums_pb2.NODEINFO_APP:
+                node.user.ParseFromString(packet.decoded.payload)
+            elif portnum == portnums_pb2.POSITION_APP:
+                node.position.ParseFromString(packet.decoded.payload)
+        except DecodeError:
+            pass
+
+    def replay(self, nonce):
+        """
+        Serialized frames answering want_config_id=nonce from the snapshot, ending with
+        config_complete_id=nonce. None when there is no valid snapshot.
+        """
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            frames = []
+            for key, raw in snapshot.frames.items():
+                if key == _NODES:
+                    for num, node in snapshot.nodes.items():
+                        if nonce == SPECIAL_NONCE_ONLY_CONFIG and num != snapshot.my_node_num:
+                            continue
+                        frames.append(mesh_pb2.FromRadio(node_info=node).SerializeToString())
+                elif nonce != SPECIAL_NONCE_ONLY_NODES or key == ("my_info",):
+                    frames.append(raw)
+        frames.append(mesh_pb2.FromRadio(config_complete_id=nonce).SerializeToString())
+        return frames
+
+    def stats(self):
+        snapshot = self._current
+        return {
+            "valid": snapshot is not None,
+            "nodes": len(snapshot.nodes) if snapshot is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,98 @@
+"""Congestion-aware downlink pacing for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger("mqtt-proxy.congestion")
+
+
+class CongestionPacer:
+    """
+    Tracks the local node's channel utilization / air_util_tx telemetry and turns it
+    into a pacing factor (>= 1) that stretches the delay between downlink sends.
+
+    Below half the ceiling the mesh is considered quiet and the target factor is 1.
+    Between half the ceiling and the ceiling the target grows exponentially up to
+    max_factor. The factor follows a rising target immediately (back off fast) and
+    decays towards a lower target with the given half-life (ramp back up gently).
+    """
+    def __init__(self, ceiling, max_factor=16.0, air_util_tx_ceiling=0.0, base_delay=1.0, half_life=120.0):
+        self.ceiling = float(ceiling)
+        self.max_factor = max(1.0, float(max_factor))
+        self.air_util_tx_ceiling = float(air_util_tx_ceiling)
+        self.base_delay = float(base_delay)
+        self.half_life = float(half_life)
+        self.channel_utilization = None
+        self.air_util_tx = None
+        self.last_update = 0.0
+        self.updates = 0
+        self._target = 1.0
+        self._factor = 1.0
+        self._factor_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _pressure(self):
+        """Highest utilization relative to its ceiling (0 = idle, 1 = at the ceiling)."""
+        pressure = 0.0
+        if self.channel_utilization is not None and self.ceiling > 0:
+            pressure = self.channel_utilization / self.ceiling
+        if self.air_util_tx is not None and self.air_util_tx_ceiling > 0:
+            pressure = max(pressure, self.air_util_tx / self.air_util_tx_ceiling)
+        return pressure
+
+    def _target_factor(self, pressure):
+        if pressure <= 0.5:
+            return 1.0
+        if pressure >= 1.0:
+            return self.max_factor
+        # 0.5 -> 1x, 1.0 -> max_factor, exponential in between
+        return self.max_factor ** ((pressure - 0.5) / 0.5)
+
+    def _decayed(self, now):
+        """Current factor after decaying towards the target since the last evaluation."""
+        if self._factor <= self._target or self.half_life <= 0:
+            return self._target
+        elapsed = max(0.0, now - self._factor_time)
+        decay = 0.5 ** (elapsed / self.half_life)
+        return max(self._target, self._target + (self._factor - self._target) * decay)
+
+    def update(self, channel_utilization=None, air_util_tx=None, now=None):
+        """Feed a telemetry sample (percentages, as reported in DeviceMetrics / LocalStats)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if channel_utilization is not None:
+                self.channel_utilization = float(channel_utilization)
+            if air_util_tx is not None:
+                self.air_util_tx = float(air_util_tx)
+            self.last_update = now
+            self.updates += 1
+
+            current = self._decayed(now)
+            self._target = self._target_factor(self._pressure())
+            self._factor = max(current, self._target)
+            self._factor_time = now
+            factor = self._factor
+
+        logger.debug("📶 Channel utilization %.1f%%, air_util_tx %.1f%% -> pacing factor %.2f",
+                     self.channel_utilization or 0.0, self.air_util_tx or 0.0, factor)
+
+    def factor(self, now=None):
+        """Current pacing factor (1 = no extra pacing)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._decayed(now)
+
+    def extra_delay(self, now=None):
+        """Additional delay (seconds) to add between downlink sends."""
+        return self.base_delay * (self.factor(now) - 1.0)
+
+    def stats(self):
+        return {
+            "channel_utilization": self.channel_utilization,
+            "air_util_tx": self.air_util_tx,
+            "factor": self.factor(),
+            "updates": self.updates,
+        }
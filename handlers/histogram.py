@@ -0,0 +1,154 @@
+"""Fixed-bucket latency histogram for MQTT Proxy metrics."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import math
+import bisect
+import threading
+import weakref
+
+# Upper bounds in seconds, roughly logarithmic from 1 ms to 2 minutes
+DEFAULT_BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+
+def log_bounds(low, high, per_decade):
+    """
+    HDR-style log-spaced bucket bounds from low to high (seconds), per_decade buckets per
+    power of ten, so the relative error is the same at every scale.
+    """
+    steps = int(round(math.log10(high / low) * per_decade))
+    return tuple(float(f"{low * 10 ** (i / per_decade):.3g}") for i in range(steps + 1))
+
+
+def _fold(total, shard):
+    """Add a shard's bucket counts and sum into total, keeping the larger max."""
+    for i in range(len(shard) - 1):
+        total[i] += shard[i]
+    total[-1] = max(total[-1], shard[-1])
+
+
+def _retire_shard(histogram_ref, shard):
+    histogram = histogram_ref()
+    if histogram is not None:
+        histogram._retire(shard)
+
+
+class _ShardOwner:
+    """Lives in a thread's local storage, so it is collected when the thread exits."""
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds.
+
+    observe() is O(log buckets), lock-free and allocation-free, so it can sit on hot
+    paths: each thread counts into its own bucket array, and readers sum the arrays.
+    When a thread exits, its counts are folded into a shared base array, so memory
+    stays bounded by the live threads however often workers are recreated.
+    Percentiles are estimated by linear interpolation inside the bucket.
+    """
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self._base = self._empty()  # Counts of threads that have exited
+        self._shards = []  # Per live thread: bucket counts (last is +Inf), then sum and max
+        self._local = threading.local()
+        self._shards_lock = threading.Lock()
+
+    def _empty(self):
+        return [0] * (len(self.bounds) + 1) + [0.0, 0.0]
+
+    def _shard(self):
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            # Once per thread: only the owning thread ever writes to its shard
+            owner = self._local.owner = _ShardOwner(self._empty())
+            with self._shards_lock:
+                self._shards.append(owner.shard)
+            weakref.finalize(owner, _retire_shard, weakref.ref(self), owner.shard)
+        return owner.shard
+
+    def observe(self, seconds):
+        if seconds < 0:
+            seconds = 0.0
+        shard = self._shard()
+        shard[bisect.bisect_left(self.bounds, seconds)] += 1
+        shard[-2] += seconds
+        if seconds > shard[-1]:
+            shard[-1] = seconds
+
+    def _snapshot(self):
+        """(bucket counts, sum, max) over all threads."""
+        with self._shards_lock:
+            total = list(self._base)
+            shards = [list(shard) for shard in self._shards]
+        for shard in shards:
+            _fold(total, shard)
+        return total[:-2], total[-2], total[-1]
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            _fold(self._base, shard)
+            self._shards = [s for s in self._shards if s is not shard]
+
+    @property
+    def count(self):
+        return sum(self._snapshot()[0])
+
+    @property
+    def sum(self):
+        return self._snapshot()[1]
+
+    @property
+    def max(self):
+        return self._snapshot()[2]
+
+    def percentile(self, q):
+        """Estimated q-th percentile (0-100) in seconds, or None if empty."""
+        counts, _, maximum = self._snapshot()
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q / 100.0 * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else maximum
+                upper = min(upper, maximum)
+                lower = min(lower, upper)
+                return lower + (upper - lower) * ((rank - seen) / n)
+            seen += n
+        return maximum
+
+    def mean(self):
+        counts, total_sum, _ = self._snapshot()
+        total = sum(counts)
+        return total_sum / total if total else None
+
+    def buckets(self):
+        """[(upper_bound, cumulative_count), ...] ending with (inf, count), Prometheus style."""
+        counts = self._snapshot()[0]
+        result = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            cumulative += n
+            result.append((bound, cumulative))
+        return result
+
+    def summary(self):
+        """Compact dict for status logs and APIs."""
+        count = self.count
+        return {
+            "count": count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if count else None,
+        }
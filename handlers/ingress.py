@@ -0,0 +1,232 @@
+"""Ingress filter chain for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import mqtt_pb2
+
+logger = logging.getLogger("mqtt-proxy.ingress")
+
+# Stage cost classes. Stages run in ascending cost order so cheap checks reject
+# traffic before anything pays for a protobuf parse.
+COST_TOPIC = 0      # Only looks at the topic string / MQTT flags
+COST_HEADER = 10    # Needs a few envelope fields (parsed once, cached on the context)
+COST_DECODE = 100   # Needs the decoded packet plus shared state lookups
+
+
+class IngressContext:
+    """
+    A single inbound MQTT message as it moves through the filter chain.
+
+    The ServiceEnvelope is parsed lazily and at most once, so only stages that
+    actually need packet fields pay for the decode.
+    """
+    __slots__ = ("topic", "payload", "retain", "node_id", "prefixed_node_id", "classifier",
+                 "_envelope", "_packet", "_parsed", "_is_echo", "_topic_parts", "_portnum")
+
+    _UNCLASSIFIED = object()
+
+    def __init__(self, topic, payload, retain, node_id=None, prefixed_node_id=None, classifier=None):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain
+        self.node_id = node_id
+        self.prefixed_node_id = prefixed_node_id
+        self.classifier = classifier
+        self._portnum = self._UNCLASSIFIED
+        self._envelope = None
+        self._packet = None
+        self._parsed = False
+        self._is_echo = None
+        self._topic_parts = None
+
+    def _parse(self):
+        self._parsed = True
+        try:
+            envelope = mqtt_pb2.ServiceEnvelope()
+            envelope.ParseFromString(self.payload)
+            self._envelope = envelope
+            self._packet = envelope.packet
+        except Exception:
+            # Fallback? Maybe it's a raw MeshPacket?
+            try:
+                packet = mesh_pb2.MeshPacket()
+                packet.ParseFromString(self.payload)
+                self._packet = packet
+            except Exception:
+                pass
+
+    @property
+    def envelope(self):
+        """The parsed ServiceEnvelope, or None if the payload is not one."""
+        if not self._parsed:
+            self._parse()
+        return self._envelope
+
+    @property
+    def packet(self):
+        """The MeshPacket from the envelope (or raw payload), or None."""
+        if not self._parsed:
+            self._parse()
+        return self._packet
+
+    @property
+    def sender_node_id(self):
+        """Hex node id (without '!') of packet.from, or None."""
+        packet = self.packet
+        if packet is not None:
+            sender_val = getattr(packet, "from")
+            if sender_val:
+                return f"{sender_val:08x}"
+        return None
+
+    @property
+    def packet_id(self):
+        packet = self.packet
+        if packet is not None and packet.id:
+            return packet.id
+        return None
+
+    @property
+    def sender(self):
+        """packet.from as an integer node number (0 if unknown)."""
+        packet = self.packet
+        return getattr(packet, "from") if packet is not None else 0
+
+    @property
+    def dest(self):
+        """packet.to as an integer node number (0 if unknown)."""
+        packet = self.packet
+        return packet.to if packet is not None else 0
+
+    @property
+    def portnum(self):
+        """
+        Portnum of the packet (decrypting a copy if needed), or None if unknown.
+        Only computed when something asks for it and a classifier is attached.
+        """
+        if self._portnum is self._UNCLASSIFIED:
+            self._portnum = self.classifier.classify(self) if self.classifier is not None else None
+        return self._portnum
+
+    @property
+    def size(self):
+        return len(self.payload)
+
+    def _split_topic(self):
+        if self._topic_parts is None:
+            self._topic_parts = self.topic.split("/")
+        return self._topic_parts
+
+    @property
+    def channel(self):
+        """Channel name from a <root>/2/<e|c>/<channel>/<gateway> topic, or None."""
+        parts = self._split_topic()
+        if len(parts) >= 4 and parts[-3] in ("e", "c"):
+            return parts[-2]
+        return None
+
+    @property
+    def root(self):
+        """Root topic (everything before /<version>/<e|c>/<channel>/<gateway>), or None."""
+        parts = self._split_topic()
+        if len(parts) >= 5 and parts[-3] in ("e", "c"):
+            return "/".join(parts[:-4])
+        return None
+
+    @property
+    def is_echo(self):
+        """
+        True if this is the broker echo of a packet our own gateway published
+        (Firmware needs this to generate Implicit ACKs).
+        """
+        if self._is_echo is None:
+            self._is_echo = False
+            envelope = self.envelope
+            if envelope is not None and envelope.gateway_id and self.node_id:
+                if envelope.gateway_id == self.node_id or envelope.gateway_id == self.prefixed_node_id:
+                    packet = envelope.packet
+                    # Only allow echo bypass for packets that are eligible for Implicit ACKs
+                    if packet.HasField("encrypted") or \
+                       (packet.HasField("decoded") and packet.decoded.request_id):
+                        self._is_echo = True
+        return self._is_echo
+
+
+class FilterStage:
+    """
+    Base class for an ingress filter stage.
+
+    Subclasses set name/cost and implement accept(ctx), returning True to pass the
+    message on or False to drop it. The chain keeps per-stage counters.
+    """
+    name = "stage"
+    cost = COST_DECODE
+
+    def __init__(self):
+        self.hits = 0
+        self.drops = 0
+        self.time_ns = 0
+
+    def accept(self, ctx):
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "cost": self.cost,
+            "hits": self.hits,
+            "drops": self.drops,
+            "time_ms": self.time_ns / 1e6,
+        }
+
+
+class IngressChain:
+    """Ordered list of filter stages; the first stage that rejects a message stops the chain."""
+    def __init__(self, stages=None):
+        self._lock = threading.Lock()
+        self.stages = []
+        for stage in stages or []:
+            self.add_stage(stage)
+
+    def add_stage(self, stage):
+        """Insert a stage, keeping the chain sorted by cost (stable for equal costs)."""
+        with self._lock:
+            stages = list(self.stages)
+            position = len(stages)
+            for i, existing in enumerate(stages):
+                if stage.cost < existing.cost:
+                    position = i
+                    break
+            stages.insert(position, stage)
+            # Swap the list so a concurrent process() keeps iterating the old one
+            self.stages = stages
+
+    def get_stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def process(self, ctx):
+        """Run ctx through the chain. Returns the rejecting stage, or None if it passed."""
+        for stage in self.stages:
+            start = time.perf_counter_ns()
+            stage.hits += 1
+            try:
+                accepted = stage.accept(ctx)
+            except Exception as e:
+                logger.debug("⚠️ Ingress stage '%s' failed, passing message: %s", stage.name, e)
+                accepted = True
+            stage.time_ns += time.perf_counter_ns() - start
+            if not accepted:
+                stage.drops += 1
+                return stage
+        return None
+
+    def stats(self):
+        """Per-stage hit/drop/time counters in chain order."""
+        return [stage.stats() for stage in self.stages]
@@ -0,0 +1,305 @@
+"""Multi-process ingress prefilter for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import queue
+import struct
+import logging
+import threading
+import multiprocessing
+from types import SimpleNamespace
+from handlers.shm_ring import ShmRing
+
+logger = logging.getLogger("mqtt-proxy.ingress_pool")
+
+_ITEM = struct.Struct("<IHB")  # payload length, topic length, retain
+
+
+def encode_batch(items):
+    """Serialize (topic, payload, retain) tuples into one ring record."""
+    parts = []
+    for topic, payload, retain in items:
+        topic_bytes = topic.encode("utf-8")
+        parts.append(_ITEM.pack(len(payload), len(topic_bytes), 1 if retain else 0))
+        parts.append(topic_bytes)
+        parts.append(bytes(payload))
+    return b"".join(parts)
+
+
+def decode_batch(data):
+    """Inverse of encode_batch."""
+    items = []
+    offset = 0
+    while offset < len(data):
+        payload_len, topic_len, retain = _ITEM.unpack_from(data, offset)
+        offset += _ITEM.size
+        topic = data[offset:offset + topic_len].decode("utf-8", errors="replace")
+        offset += topic_len
+        items.append((topic, data[offset:offset + payload_len], bool(retain)))
+        offset += payload_len
+    return items
+
+
+def _worker_main(index, ring_name, capacity, control, results, settings):
+    """
+    Worker process: decode each batch, run the prefilter chain and report the indices
+    of the messages that passed, plus per-stage drop counts.
+    """
+    # Imported here so the parent can import this module from handlers.mqtt
+    from handlers.ingress import IngressChain, IngressContext
+    from handlers.mqtt import StatTopicFilter, RetainedFilter, OwnTopicFilter, DuplicateFilter
+    from handlers.node_tracker import PacketDeduplicator
+
+    ring = ShmRing(capacity, name=ring_name)
+    deduplicator = PacketDeduplicator(settings["dedup_timeout"])
+    chain = IngressChain([
+        StatTopicFilter(),
+        RetainedFilter(SimpleNamespace(mqtt_forward_retained=settings["forward_retained"])),
+        OwnTopicFilter(),
+        DuplicateFilter(deduplicator),
+    ])
+    owner, nodes = settings["owner"], set(settings["nodes"])
+    try:
+        while True:
+            command = control.get()
+            kind = command[0]
+            if kind == "stop":
+                break
+            if kind == "seen":
+                deduplicator.mark_seen(command[1], command[2])
+            elif kind == "nodes":
+                owner, nodes = command[1], set(command[2])
+            elif kind == "batch":
+                data = ring.read()
+                survivors = []
+                drops = {}
+                for i, (topic, payload, retain) in enumerate(decode_batch(data or b"")):
+                    ctx = IngressContext(topic, payload, retain, node_id=owner,
+                                         prefixed_node_id=f"!{owner}" if owner else None)
+                    if nodes:
+                        # Same attribution as MQTTHandler._attribute_to_node
+                        envelope = ctx.envelope
+                        gateway = envelope.gateway_id.lstrip("!") if envelope is not None else ""
+                        if gateway in nodes:
+                            ctx.node_id = gateway
+                            ctx.prefixed_node_id = f"!{gateway}"
+                    stage = chain.process(ctx)
+                    if stage is None:
+                        survivors.append(i)
+                    else:
+                        drops[stage.name] = drops.get(stage.name, 0) + 1
+                results.put((index, command[1], survivors, drops))
+    except (KeyboardInterrupt, EOFError, OSError):
+        pass
+    finally:
+        ring.close()
+
+
+class _Worker:
+    def __init__(self, index, process, ring, control):
+        self.index = index
+        self.process = process
+        self.ring = ring
+        self.control = control
+        self.outstanding = {}  # batch_id -> [(message, source), ...]
+
+
+class IngressPool:
+    """
+    Prefilters inbound MQTT messages in worker processes, for hub deployments where most
+    of a high-rate feed is dropped by ingress anyway.
+
+    Messages are collected into batches (up to batch_size, or whatever arrived within
+    batch_interval seconds) and written to a worker's shared memory ring. The worker
+    parses each payload and runs the stat, retained, own-topic and duplicate checks;
+    only the indices of the messages that passed come back, and those go through
+    handler.handle_incoming() as before. Checks in the main process therefore still see
+    every survivor, and the workers can only drop what the main chain would drop too.
+
+    The workers' duplicate check uses their own copy of the RF-seen packet table, fed
+    from deduplicator.mark_seen(). Batches that don't fit in a ring, or that were with a
+    worker that died, are processed in the main process instead.
+    """
+    def __init__(self, handler, workers=2, batch_size=64, batch_interval=0.005, ring_bytes=1024 * 1024):
+        self.handler = handler
+        self.size = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_interval = max(0.0005, float(batch_interval))
+        self.ring_bytes = max(4096, int(ring_bytes))
+        self.deduplicator = handler.deduplicator
+        self.forward_retained = bool(handler.config and getattr(handler.config, 'mqtt_forward_retained', False))
+        self.workers = []
+        self.running = False
+        self._mp = multiprocessing.get_context("spawn")
+        self._results = None
+        self._pending = []
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._next_batch = 0
+        self._next_worker = 0
+        self._threads = []
+        self.batches = 0
+        self.messages = 0
+        self.passed = 0
+        self.overflow = 0
+        self.restarts = 0
+        self.drops = {}
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._results = self._mp.Queue()
+        self.workers = [self._spawn(i) for i in range(self.size)]
+        if self.deduplicator is not None:
+            self.deduplicator.add_listener(self.mark_seen)
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name="ingress-dispatch", daemon=True),
+            threading.Thread(target=self._result_loop, name="ingress-results", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("⚙️ Ingress pool started: %d workers, batches of up to %d", self.size, self.batch_size)
+
+    def _spawn(self, index):
+        ring = ShmRing(self.ring_bytes)
+        control = self._mp.Queue()
+        settings = {
+            "owner": self.handler.node_id,
+            "nodes": list(self._nodes()),
+            "forward_retained": self.forward_retained,
+            "dedup_timeout": self.deduplicator.timeout if self.deduplicator is not None else 60,
+        }
+        process = self._mp.Process(target=_worker_main, name=f"ingress-{index}", daemon=True,
+                                   args=(index, ring.name, ring.capacity, control, self._results, settings))
+        process.start()
+        return _Worker(index, process, ring, control)
+
+    def _nodes(self):
+        return set(self.handler.peers)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        with self._cond:
+            self._pending = []
+            self._cond.notify_all()
+        if self.deduplicator is not None:
+            self.deduplicator.remove_listener(self.mark_seen)
+        for worker in self.workers:
+            try:
+                worker.control.put(("stop",))
+            except (OSError, ValueError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=2)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.ring.close(unlink=True)
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self.workers = []
+
+    def submit(self, message, source):
+        """Queue a received message for prefiltering."""
+        with self._cond:
+            self._pending.append((message, source))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def mark_seen(self, node_id, packet_id):
+        """Deduplicator listener: mirror a packet seen on the radio to every worker."""
+        for worker in self.workers:
+            try:
+                worker.control.put(("seen", node_id, packet_id))
+            except (OSError, ValueError):
+                pass
+
+    def update_nodes(self):
+        """Tell the workers which local nodes share the connection (after add_peer/remove_peer)."""
+        command = ("nodes", self.handler.node_id, list(self._nodes()))
+        for worker in self.workers:
+            try:
+                worker.control.put(command)
+            except (OSError, ValueError):
+                pass
+
+    def _dispatch_loop(self):
+        while self.running:
+            with self._cond:
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(timeout=self.batch_interval)
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            if batch:
+                self._dispatch(batch)
+            self._check_workers()
+
+    def _dispatch(self, batch):
+        data = encode_batch([(m.topic, m.payload, m.retain) for m, _ in batch])
+        with self._lock:
+            # Least loaded worker, round robin between equals
+            candidates = self.workers[self._next_worker:] + self.workers[:self._next_worker]
+            worker = min(candidates, key=lambda w: len(w.outstanding))
+            self._next_worker = (worker.index + 1) % len(self.workers)
+            batch_id = self._next_batch
+            self._next_batch += 1
+            written = worker.ring.write(data)
+            if written:
+                worker.outstanding[batch_id] = batch
+                self.batches += 1
+                self.messages += len(batch)
+        if not written:
+            self.overflow += len(batch)
+            self._process_inline(batch)
+            return
+        worker.control.put(("batch", batch_id))
+
+    def _process_inline(self, batch):
+        for message, source in batch:
+            self.handler.handle_incoming(message, source)
+
+    def _result_loop(self):
+        while self.running:
+            try:
+                index, batch_id, survivors, drops = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                return
+            with self._lock:
+                worker = next((w for w in self.workers if w.index == index), None)
+                batch = worker.outstanding.pop(batch_id, None) if worker is not None else None
+                for name, count in drops.items():
+                    self.drops[name] = self.drops.get(name, 0) + count
+                self.passed += len(survivors)
+            if batch is None:
+                continue
+            for i in survivors:
+                message, source = batch[i]
+                self.handler.handle_incoming(message, source)
+
+    def _check_workers(self):
+        for position, worker in enumerate(list(self.workers)):
+            if worker.process.is_alive() or not self.running:
+                continue
+            logger.warning("⚠️ Ingress worker %d exited (code %s), restarting", worker.index, worker.process.exitcode)
+            with self._lock:
+                lost = list(worker.outstanding.values())
+                worker.outstanding.clear()
+                self.workers[position] = self._spawn(worker.index)
+                self.restarts += 1
+            worker.ring.close(unlink=True)
+            for batch in lost:
+                self._process_inline(batch)
+
+    def stats(self):
+        return {
+            "workers": sum(1 for w in self.workers if w.process.is_alive()),
+            "batches": self.batches,
+            "messages": self.messages,
+            "passed": self.passed,
+            "overflow": self.overflow,
+            "restarts": self.restarts,
+            "drops": dict(self.drops),
+        }
@@ -3,13 +3,21 @@
 # This software is licensed under the MIT License. See LICENSE file for details.
 
 import time
+import asyncio
 import logging
+import threading
 from pubsub import pub
 from meshtastic import mesh_pb2
+from meshtastic.protobuf import mqtt_pb2
+from meshtastic.mesh_interface import MeshInterface
+from meshtastic.stream_interface import START2
 from meshtastic.tcp_interface import TCPInterface
 from meshtastic.serial_interface import SerialInterface
-from meshtastic.protobuf import portnums_pb2
+from meshtastic.protobuf import portnums_pb2, telemetry_pb2
 from google.protobuf.message import DecodeError
+from handlers.async_runtime import call_on_loop
+from handlers.radio_mux import FrameReader
+from handlers.tracing import tracer, UPLINK
 
 logger = logging.getLogger("mqtt-proxy.handlers.meshtastic")
 
@@ -19,11 +27,19 @@ class MQTTProxyMixin:
     This intercepts mqttClientProxyMessage from the node and publishes to MQTT.
     Also handles "implicit ACKs" (ROUTING_APP packets) and suppresses DecodeErrors.
     """
+    standby = False  # Set by the interfaces; a warm standby only keeps library state
+
     def _handleFromRadio(self, fromRadio):
         """
         Intersects mqttClientProxyMessage from the node and publishes to MQTT.
         """
         decoded = None
+        channels_changed = False
+        resubscribe = False
+        if self.standby:
+            # Warm standby: only let the library keep its state until the proxy promotes us
+            return self._super_handle_from_radio(fromRadio)
+        tracer.begin(UPLINK)
         try:
             # Update generic radio activity timestamp for ANY received data
             # Access the proxy instance injected/attached to the interface
@@ -40,7 +56,43 @@ class MQTTProxyMixin:
             else:
                 decoded = fromRadio
 
+            # Local clients sharing this radio session get every frame, untouched
+            radio_mux = getattr(self.proxy, 'radio_mux', None) if getattr(self, 'proxy', None) else None
+            if radio_mux is not None and isinstance(fromRadio, bytes):
+                radio_mux.broadcast(fromRadio, decoded)
+
             if decoded:
+                # Channel slots arrive in the config stream; admin responses carry set/get channel results.
+                # Either may change localNode.channels, so the proxy's channel index must be rebuilt
+                # once the library has applied them (after the super call below). MQTT subscriptions
+                # are only re-planned once the stream is complete, not for every channel slot.
+                if decoded.HasField("channel") or decoded.HasField("config_complete_id") or \
+                   (decoded.HasField("packet") and decoded.packet.decoded.portnum == portnums_pb2.ADMIN_APP):
+                    channels_changed = True
+                    resubscribe = not decoded.HasField("channel")
+
+                # Local node telemetry drives congestion-aware downlink pacing
+                if decoded.HasField("packet") and decoded.packet.decoded.portnum == portnums_pb2.TELEMETRY_APP:
+                    self._track_local_telemetry(decoded.packet)
+
+                # ServiceEnvelope of a proxied uplink, parsed once for the trackers below
+                proxied_envelope = None
+                if decoded.HasField("mqttClientProxyMessage"):
+                    try:
+                        proxied_envelope = mqtt_pb2.ServiceEnvelope()
+                        proxied_envelope.ParseFromString(decoded.mqttClientProxyMessage.data)
+                    except DecodeError:
+                        proxied_envelope = None
+
+                # Remember which senders the node hears on RF (suppresses their redundant MQTT copies
+                # and tells which PKI destinations are reachable through this node)
+                if hasattr(self, 'proxy') and self.proxy and \
+                   (getattr(self.proxy, 'rf_heard', None) is not None or getattr(self.proxy, 'reachable_nodes', None) is not None):
+                    if decoded.HasField("packet"):
+                        self._track_rf_sender(decoded.packet)
+                    elif proxied_envelope is not None:
+                        self._track_rf_sender(proxied_envelope.packet)
+
                 # 2. Check for mqttClientProxyMessage (node wants to publish to MQTT)
                 if decoded.HasField("mqttClientProxyMessage"):
                     mqtt_msg = decoded.mqttClientProxyMessage
@@ -48,38 +100,7 @@ class MQTTProxyMixin:
                             mqtt_msg.topic, len(mqtt_msg.data), mqtt_msg.retained)
                     
                     if hasattr(self, 'proxy') and self.proxy and self.proxy.mqtt_handler:
-                        # Mark this sender as "seen" to prevent loops if we subscribe to this topic
-                        try:
-                            # Extract sender from packet if available
-                            sender_id = None
-                            packet_id = None
-                            
-                            if decoded.packet:
-                                # Extract sender from 'from' field (fromId doesn't exist in protobuf)
-                                try:
-                                    # FIX: Use 'from' (getattr handles reserved keyword conflict) and default to 0
-                                    sender_val = getattr(decoded.packet, "from", 0)
-                                    sender_id = f"{sender_val:08x}"
-                                except:
-                                    pass
-                                
-                                if decoded.packet.id:
-                                    packet_id = decoded.packet.id
-                            
-                            if sender_id and packet_id and hasattr(self.proxy, 'deduplicator') and self.proxy.deduplicator:
-                                self.proxy.deduplicator.mark_seen(sender_id, packet_id)
-                        except Exception as e:
-                            logger.warning(f"⚠️ Failed to track node/packet: {e}")
-
-                        # 3. Check for uplink_enabled for this channel
-                        channel_name = self.proxy._extract_channel_from_topic(mqtt_msg.topic)
-                        if channel_name:
-                            if not self.proxy._is_channel_uplink_enabled(channel_name):
-                                logger.info("🛡️ Dropping Node->MQTT message (uplink_enabled=False for channel '%s'): %s", 
-                                            channel_name, mqtt_msg.topic)
-                                return
-
-                        self.proxy.mqtt_handler.publish(mqtt_msg.topic, mqtt_msg.data, retain=mqtt_msg.retained)
+                        self._publish_proxied(decoded, mqtt_msg, proxied_envelope)
                 
                 # 3. Handle Implicit ACKs (ROUTING_APP errors with error_reason=NONE)
                 # This fixes the "Missing ACK" issue where the radio sends a routing packet instead of a formal ACK
@@ -90,6 +111,12 @@ class MQTTProxyMixin:
                         r = mesh_pb2.Routing()
                         r.ParseFromString(p.decoded.payload)
                         if r.error_reason == mesh_pb2.Routing.Error.NONE and p.decoded.request_id != 0:
+                            # The node reports the implicit ACK for its own packets as coming from itself,
+                            # so the tracker sees it before the self-echo filter below
+                            ack_tracker = getattr(self.proxy, 'ack_tracker', None) if getattr(self, 'proxy', None) else None
+                            if ack_tracker is not None:
+                                ack_tracker.on_ack(p.decoded.request_id)
+
                             # FIX: Ignore local routing confirmation (sender=0) and self-echoes
                             sender = getattr(p, "from", 0)
                             my_id = getattr(self, "myNodeNum", None)
@@ -114,9 +141,66 @@ class MQTTProxyMixin:
         except Exception as e:
             # Expected protobuf parsing errors - log at debug level
             logger.debug("⚠️ Error in MQTT proxy interception: %s", e)
+        finally:
+            tracer.end()
 
         # 5. Safe Super Call
         # Always call super to let the library maintain its state, but prevent crashes
+        self._super_handle_from_radio(fromRadio)
+
+        if channels_changed and hasattr(self, 'proxy') and self.proxy and hasattr(self.proxy, 'on_channel_config_changed'):
+            self.proxy.on_channel_config_changed(resubscribe=resubscribe)
+
+
+    def _publish_proxied(self, decoded, mqtt_msg, proxied_envelope):
+        """Publish a message the node handed us via mqttClientProxyMessage, unless it must stay off MQTT."""
+        # Skip packets the proxy itself just wrote to the radio from MQTT
+        if proxied_envelope is not None and self._is_injected_copy(proxied_envelope):
+            logger.debug("🔁 Not republishing packet injected from MQTT: %s", mqtt_msg.topic)
+            return
+
+        # Mark this sender as "seen" to prevent loops if we subscribe to this topic
+        try:
+            # Extract sender from packet if available
+            sender_id = None
+            packet_id = None
+
+            if decoded.packet:
+                # Extract sender from 'from' field (fromId doesn't exist in protobuf)
+                try:
+                    # FIX: Use 'from' (getattr handles reserved keyword conflict) and default to 0
+                    sender_val = getattr(decoded.packet, "from", 0)
+                    sender_id = f"{sender_val:08x}"
+                except:
+                    pass
+
+                if decoded.packet.id:
+                    packet_id = decoded.packet.id
+
+            if sender_id and packet_id and hasattr(self.proxy, 'deduplicator') and self.proxy.deduplicator:
+                self.proxy.deduplicator.mark_seen(sender_id, packet_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to track node/packet: {e}")
+
+        # 3. Check for uplink_enabled for this channel
+        channel_name = self.proxy._extract_channel_from_topic(mqtt_msg.topic)
+        if channel_name:
+            if not self.proxy._is_channel_uplink_enabled(channel_name):
+                logger.info("🛡️ Dropping Node->MQTT message (uplink_enabled=False for channel '%s'): %s", 
+                            channel_name, mqtt_msg.topic)
+                return
+
+        tracer.stamp("filter", direction=UPLINK)
+        self.proxy.mqtt_handler.publish(mqtt_msg.topic, mqtt_msg.data, retain=mqtt_msg.retained)
+
+        # Our own packets that asked for an ACK wait for their broker echo / implicit ACK
+        ack_tracker = getattr(self.proxy, 'ack_tracker', None)
+        if ack_tracker is not None and proxied_envelope is not None and proxied_envelope.packet.want_ack:
+            sender = getattr(proxied_envelope.packet, "from")
+            if sender and sender == getattr(self, "myNodeNum", None):
+                ack_tracker.track(proxied_envelope.packet.id)
+
+    def _super_handle_from_radio(self, fromRadio):
         try:
             super()._handleFromRadio(fromRadio)
         except DecodeError as e:
@@ -125,11 +209,73 @@ class MQTTProxyMixin:
         except Exception as e:
             logger.error("❌ Error in StreamInterface processing: %s", e)
 
+    def _sendToRadioImpl(self, toRadio):
+        """
+        Serialize writes to the stream: the message queue, the library's heartbeats and
+        radio mux clients all write from different threads.
+        """
+        write_lock = getattr(self, '_write_lock', None)
+        if write_lock is None:
+            return super()._sendToRadioImpl(toRadio)
+        with write_lock:
+            return super()._sendToRadioImpl(toRadio)
+
+    def _is_injected_copy(self, envelope):
+        """
+        True if a proxied uplink is the firmware handing back a packet we downlinked.
+        Our own node's packets are never suppressed: their broker echo drives implicit ACKs.
+        """
+        injected = getattr(self.proxy, 'injected_packets', None)
+        if injected is None or not len(injected):
+            return False
+        sender = getattr(envelope.packet, "from")
+        if sender == getattr(self, "myNodeNum", None) or not injected.contains(sender, envelope.packet.id):
+            return False
+        injected.suppressed += 1
+        return True
+
+    def _track_rf_sender(self, packet):
+        """Mark packet.from as heard on RF, unless the packet came in via MQTT or is our own."""
+        sender = getattr(packet, "from", 0)
+        if not sender or packet.via_mqtt or sender == getattr(self, "myNodeNum", None):
+            return
+        if getattr(self.proxy, 'rf_heard', None) is not None:
+            self.proxy.rf_heard.mark_heard(sender)
+        if getattr(self.proxy, 'reachable_nodes', None) is not None:
+            self.proxy.reachable_nodes.mark_heard(sender)
+
+    def _track_local_telemetry(self, packet):
+        """Pass the local node's channel utilization / air_util_tx readings to the proxy."""
+        if not (hasattr(self, 'proxy') and self.proxy and hasattr(self.proxy, 'on_local_telemetry')):
+            return
+        my_id = getattr(self, "myNodeNum", None)
+        if not my_id or getattr(packet, "from", 0) != my_id:
+            return
+        try:
+            telemetry = telemetry_pb2.Telemetry()
+            telemetry.ParseFromString(packet.decoded.payload)
+        except DecodeError:
+            return
+        if telemetry.HasField("device_metrics"):
+            # DeviceMetrics fields are optional: only report what the node actually filled in
+            metrics = telemetry.device_metrics
+            channel_util = metrics.channel_utilization if metrics.HasField("channel_utilization") else None
+            air_util_tx = metrics.air_util_tx if metrics.HasField("air_util_tx") else None
+        elif telemetry.HasField("local_stats"):
+            channel_util = telemetry.local_stats.channel_utilization
+            air_util_tx = telemetry.local_stats.air_util_tx
+        else:
+            return
+        if channel_util is None and air_util_tx is None:
+            return
+        self.proxy.on_local_telemetry(channel_util, air_util_tx)
 
 class RawTCPInterface(MQTTProxyMixin, TCPInterface):
     """TCP interface with MQTT proxy support and safe error handling"""
     def __init__(self, *args, **kwargs):
         self.proxy = kwargs.pop('proxy', None)
+        self.standby = kwargs.pop('standby', False)
+        self._write_lock = threading.Lock()
         try:
             super().__init__(*args, **kwargs)
         except Exception as e:
@@ -145,10 +291,85 @@ class RawTCPInterface(MQTTProxyMixin, TCPInterface):
             raise e
 
 
+class AsyncTCPInterface(RawTCPInterface):
+    """
+    TCP interface for the asyncio runtime: the radio connection is an asyncio stream read by a
+    task on the event loop instead of the library's socket and reader thread, and the heartbeat
+    is a loop timer. Created unconnected; open() connects and waits for the node to connect.
+    """
+    def __init__(self, hostname, loop, portNumber=4403, timeout=300, proxy=None):
+        self.loop = loop
+        self.closed = False
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        super().__init__(hostname, portNumber=portNumber, timeout=timeout, connectNow=False, proxy=proxy)
+
+    async def open(self, connect_timeout=30.0):
+        self._reader, self._writer = await asyncio.open_connection(self.hostname, self.portNumber)
+        # Wake a sleeping device and resync its parser, as StreamInterface.connect() does
+        self._writer.write(bytes([START2] * 32))
+        await asyncio.sleep(0.1)
+        self._read_task = self.loop.create_task(self._read_loop(FrameReader()))
+        self._startConfig()
+
+        deadline = time.time() + connect_timeout
+        while not self.isConnected.is_set():
+            if self.closed:
+                raise ConnectionError("Radio closed the connection during config")
+            if time.time() > deadline:
+                raise TimeoutError("Timed out waiting for connection completion")
+            await asyncio.sleep(0.05)
+        if self.failure:
+            raise self.failure
+
+    async def _read_loop(self, frames):
+        try:
+            while not self._wantExit:
+                data = await self._reader.read(4096)
+                if not data:
+                    break
+                for payload in frames.feed(data):
+                    try:
+                        self._handleFromRadio(payload)
+                    except Exception as e:
+                        logger.error("❌ Error handling frame from radio: %s", e)
+        except (ConnectionError, OSError) as e:
+            logger.warning("⚠️ Radio stream error: %s", e)
+        if not self._wantExit:
+            self.closed = True
+            self._disconnected()
+
+    def _writeBytes(self, b):
+        writer = self._writer
+        if writer is not None and not self.closed:
+            call_on_loop(self.loop, writer.write, b)
+
+    def _startHeartbeat(self):
+        def callback():
+            self.heartbeatTimer = self.loop.call_later(300, callback)
+            self.sendHeartbeat()
+        call_on_loop(self.loop, callback)
+
+    def close(self):
+        if self._wantExit:
+            return
+        self._wantExit = True
+        MeshInterface.close(self)
+        self.closed = True
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            call_on_loop(self.loop, writer.close)
+        if self._read_task is not None:
+            call_on_loop(self.loop, self._read_task.cancel)
+
+
 class RawSerialInterface(MQTTProxyMixin, SerialInterface):
     """Serial interface with MQTT proxy support and safe error handling"""
     def __init__(self, *args, **kwargs):
         self.proxy = kwargs.pop('proxy', None)
+        self.standby = kwargs.pop('standby', False)
+        self._write_lock = threading.Lock()
         try:
             super().__init__(*args, **kwargs)
         except Exception as e:
@@ -160,23 +381,27 @@ class RawSerialInterface(MQTTProxyMixin, SerialInterface):
             raise e
 
 
-def create_interface(config, proxy_instance):
+def create_interface(config, proxy_instance, standby=False):
     """
     Factory function to create the appropriate interface based on config.
+    A standby interface is kept connected but ignored by the proxy until promoted.
     """
+    extra = {"standby": True} if standby else {}
     if config.interface_type == "tcp":
         logger.info(f"🔌 Creating TCP interface ({config.tcp_node_host}:{config.tcp_node_port})...")
         return RawTCPInterface(
             config.tcp_node_host,
             portNumber=config.tcp_node_port,
             timeout=config.tcp_timeout,
-            proxy=proxy_instance
+            proxy=proxy_instance,
+            **extra
         )
     elif config.interface_type == "serial":
         logger.info(f"🔌 Creating Serial interface ({config.serial_port})...")
         return RawSerialInterface(
             config.serial_port,
-            proxy=proxy_instance
+            proxy=proxy_instance,
+            **extra
         )
     else:
         raise ValueError(f"Unknown interface type: {config.interface_type}")
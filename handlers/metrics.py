@@ -0,0 +1,163 @@
+"""Prometheus metrics endpoint for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import math
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger("mqtt-proxy.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "mqtt_proxy_"
+
+
+class MetricFamily:
+    """
+    One metric and its samples. Counter and gauge samples are (labels, value); histogram
+    samples are (labels, histogram) for anything with buckets(), sum and count, such as
+    LatencyHistogram.
+    """
+    def __init__(self, name, kind, help_text):
+        self.name = PREFIX + name
+        self.kind = kind
+        self.help = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        """Add a sample. Values that aren't numbers (unknown, or not collected) are skipped."""
+        if isinstance(value, bool):
+            value = int(value)
+        if self.kind == "histogram" or isinstance(value, (int, float)):
+            self.samples.append((labels, value))
+        return self
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def render(families):
+    """Text exposition format for the families that have samples."""
+    lines = []
+    for family in families:
+        if not family.samples:
+            continue
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for labels, value in family.samples:
+            if family.kind != "histogram":
+                lines.append(f"{family.name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, cumulative in value.buckets():
+                bucket_labels = dict(labels, le=_format_value(float(bound)))
+                lines.append(f"{family.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{family.name}_sum{_format_labels(labels)} {_format_value(float(value.sum))}")
+            # The +Inf bucket, so the count matches the buckets even if samples arrived meanwhile
+            lines.append(f"{family.name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(collections):
+    """
+    Combine several collect() results into one list of families, e.g. one per radio in
+    multi-radio mode. Each item is (extra_labels, families); samples keep their own labels
+    plus the extras.
+    """
+    merged = {}
+    for extra, families in collections:
+        for family in families:
+            target = merged.get(family.name)
+            if target is None:
+                target = merged[family.name] = MetricFamily(family.name[len(PREFIX):], family.kind, family.help)
+            target.samples.extend((dict(extra, **labels), value) for labels, value in family.samples)
+    return list(merged.values())
+
+
+def deduplicator_metrics(deduplicator):
+    """Families for a PacketDeduplicator's table size and lookups."""
+    return [
+        MetricFamily("dedup_entries", "gauge", "Packets in the loop-prevention table.")
+            .add(len(deduplicator.seen_packets)),
+        MetricFamily("dedup_marked_total", "counter", "Packets marked seen on the radio.").add(deduplicator.marked),
+        MetricFamily("dedup_checks_total", "counter", "Duplicate lookups.").add(deduplicator.checks),
+        MetricFamily("dedup_hits_total", "counter", "Lookups that found a duplicate.").add(deduplicator.hits),
+    ]
+
+
+def tracer_metrics(tracer):
+    """Per direction and stage latency histograms from a LatencyTracer."""
+    family = MetricFamily("stage_seconds", "histogram",
+                          "Time packets take to reach each pipeline stage from the previous one (stage=total: end to end).")
+    if tracer.enabled:
+        for (direction, stage), histogram in tracer.histograms.items():
+            family.add(histogram, direction=direction, stage=stage)
+    return [family]
+
+
+class MetricsServer:
+    """
+    Serves GET /metrics on its own thread.
+
+    Nothing is computed until a scrape: collect() reads the counters the pipeline already
+    keeps (plain integer attributes bumped under the GIL, and histograms whose per-thread
+    buckets are summed when read), so the hot paths carry no extra locking for the endpoint.
+    """
+    def __init__(self, collect, port, host="0.0.0.0"):
+        self.collect = collect
+        self.port = port
+        self.host = host
+        self.scrapes = 0
+        self._server = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render(owner.collect()).encode("utf-8")
+                except Exception as e:
+                    logger.error("❌ Error collecting metrics: %s", e)
+                    self.send_error(500)
+                    return
+                owner.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((self.host, self.port), Handler)
+        server.daemon_threads = True
+        self._server = server
+        self.port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        logger.info("📈 Metrics endpoint on http://%s:%d/metrics", self.host, self.port)
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
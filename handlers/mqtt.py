@@ -5,16 +5,97 @@
 import time
 import logging
 import ssl
+import threading
+from collections import OrderedDict
 import paho.mqtt.client as mqtt
-from meshtastic import mesh_pb2
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 from meshtastic.protobuf import mqtt_pb2
+from config import cfg as proxy_cfg
+from handlers.subscriptions import SubscriptionPlanner
+from handlers.uplink_buffer import UplinkBuffer
+from handlers.histogram import LatencyHistogram
+from handlers.topic_alias import TopicAliasMap
+from handlers.broker_pool import build_pool
+from handlers.ingress_pool import IngressPool
+from handlers.async_runtime import AsyncioMqttLoop
+from handlers.tracing import tracer, DOWNLINK, UPLINK
+from handlers.ingress import IngressChain, IngressContext, FilterStage, COST_TOPIC, COST_HEADER, COST_DECODE
 
 logger = logging.getLogger("mqtt-proxy.handlers.mqtt")
 
+# Upper bound on tracked in-flight message ids (paho's own window is normally far smaller)
+MAX_TRACKED_INFLIGHT = 10000
+# How long a completion that ran ahead of its publish() returning is kept for it. Completions of
+# untracked publishes (presence, ...) age out before paho's 16-bit mid can wrap back to them.
+EARLY_COMPLETION_TTL = 5.0
+
+
+class StatTopicFilter(FilterStage):
+    """Skip stat messages (online/offline presence)."""
+    name = "stat"
+    cost = COST_TOPIC
+
+    def accept(self, ctx):
+        return "/stat/" not in ctx.topic
+
+
+class RetainedFilter(FilterStage):
+    """
+    Skip retained messages by default - they're historical state, not new mesh traffic.
+    This prevents startup floods when connecting to broker with many retained messages.
+    """
+    name = "retained"
+    cost = COST_TOPIC
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+
+    def accept(self, ctx):
+        if ctx.retain and not (self.config and getattr(self.config, 'mqtt_forward_retained', False)):
+            logger.debug(f"⏭️ Skipping retained MQTT message: {ctx.topic}")
+            return False
+        return True
+
+
+class OwnTopicFilter(FilterStage):
+    """Topic check loop prevention (Bypass for echoes so firmware gets its ACK)."""
+    name = "own_topic"
+    cost = COST_HEADER
+
+    def accept(self, ctx):
+        # The suffix test is free; only our own topics pay for the envelope parse
+        if ctx.node_id and ctx.topic.endswith(ctx.prefixed_node_id) and not ctx.is_echo:
+            logger.debug("🛡️ Ignoring own MQTT message (Loop protection): %s", ctx.topic)
+            return False
+        return True
+
+
+class DuplicateFilter(FilterStage):
+    """Enhanced Loop Protection: Check for duplicate Packet ID from same Sender."""
+    name = "duplicate"
+    cost = COST_DECODE
+
+    def __init__(self, deduplicator):
+        super().__init__()
+        self.deduplicator = deduplicator
+
+    def accept(self, ctx):
+        if not self.deduplicator or ctx.is_echo:
+            return True
+        sender_node_id = ctx.sender_node_id
+        packet_id = ctx.packet_id
+        if sender_node_id and packet_id and self.deduplicator.is_duplicate(sender_node_id, packet_id):
+            logger.info(f"🛡️ Ignoring duplicate MQTT message from {sender_node_id} (PacketId={packet_id}) (Loop Prevention)")
+            return False
+        return True
+
+
 class MQTTHandler:
     """Handles MQTT connection and message processing."""
 
-    def __init__(self, config, node_id, on_message_callback=None, deduplicator=None):
+    def __init__(self, config, node_id, on_message_callback=None, deduplicator=None, channel_provider=None):
         self.config = config
         self.node_id = node_id
         self.deduplicator = deduplicator
@@ -25,13 +106,77 @@ class MQTTHandler:
         self.tx_count = 0
         self.tx_failures = 0
         self.rx_count = 0
+        self.connects = 0
+        self.reconnects = 0
+        # Event loop driving the client (asyncio runtime), else paho's network thread
+        self.event_loop = None
+        self._network = None
         
         # Callback for when an MQTT message is received that needs to go to the radio
         # Signature: (topic, payload, retained)
         self.on_message_callback = on_message_callback
         
+        # Callable returning the node's downlink-enabled channel names (or None if unknown).
+        # Used by the subscription planner to narrow subscriptions in selective mode.
+        self.channel_provider = channel_provider
+        self.planner = SubscriptionPlanner(config)
+        self.subscriptions = set()
+        self._subscriptions_lock = threading.Lock()  # Re-planned from the paho and radio threads
+        
+        # Other nodes sharing this connection in multi-radio mode: node_id -> (callback, channel_provider)
+        self.peers = {}
+        
         self.prefixed_node_id = f"!{node_id}" if node_id else None
         self.current_mqtt_cfg = None
+        
+        # Bounded buffer for uplinks published while the broker is unreachable (None = disabled)
+        self.uplink_buffer = None
+        buffer_size = proxy_cfg.mqtt_uplink_buffer_size
+        if buffer_size > 0:
+            self.uplink_buffer = UplinkBuffer(
+                buffer_size,
+                max_bytes=proxy_cfg.mqtt_uplink_buffer_bytes,
+                ttl=proxy_cfg.mqtt_uplink_buffer_ttl,
+            )
+        self.flush_rate = proxy_cfg.mqtt_uplink_flush_rate
+        self._flush_thread = None
+        
+        # Uplink QoS and publish completion tracking (mid -> publish time until on_publish)
+        qos = proxy_cfg.mqtt_uplink_qos
+        self.uplink_qos = qos if qos in (0, 1, 2) else 0
+        self._inflight = OrderedDict()
+        self._early_completions = OrderedDict()  # mid -> completion time
+        self._inflight_lock = threading.Lock()
+        self.publish_latency = LatencyHistogram()
+        self.publish_completed = 0
+        
+        # MQTT v5 mode: outbound topic aliases, session expiry and receive maximum
+        self.mqtt_v5 = proxy_cfg.mqtt_protocol == "5"
+        self.topic_aliases = TopicAliasMap()
+        
+        # Extra roots that live on other brokers get their own subscribe-only connections
+        self.brokers = build_pool(self, proxy_cfg.extra_mqtt_root_brokers)
+        self.pooled_roots = {root for broker in self.brokers for root in broker.roots}
+        
+        # Ingress filters, cheapest first. More stages can be plugged in with ingress.add_stage().
+        self.ingress = IngressChain([
+            StatTopicFilter(),
+            RetainedFilter(config),
+            OwnTopicFilter(),
+            DuplicateFilter(deduplicator),
+        ])
+        
+        # Optional worker processes running the checks above before messages reach ingress
+        self.ingress_pool = None
+        workers = proxy_cfg.ingress_workers
+        if workers > 0:
+            self.ingress_pool = IngressPool(
+                self,
+                workers=workers,
+                batch_size=proxy_cfg.ingress_batch_size,
+                batch_interval=proxy_cfg.ingress_batch_ms / 1000.0,
+                ring_bytes=proxy_cfg.ingress_ring_kb * 1024,
+            )
 
     def configure(self, node_mqtt_config):
         """Configure the MQTT client based on node settings."""
@@ -57,7 +202,11 @@ class MQTTHandler:
         client_id = f"MeshtasticPythonMqttProxy-{self.node_id}"
         logger.info("🆔 Setting MQTT Client ID: %s", client_id)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        if self.mqtt_v5:
+            logger.info("  📦 Protocol: MQTT v5")
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id, protocol=mqtt.MQTTv5)
+        else:
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
         if mqtt_username and mqtt_password:
             self.client.username_pw_set(mqtt_username, mqtt_password)
             
@@ -77,9 +226,19 @@ class MQTTHandler:
                  mqtt_port = 8883
                  logger.info("🔄 Switching to default SSL port: 8883")
         
+        # In-flight window (QoS > 0 messages awaiting PUBACK/PUBCOMP) and paho's outgoing queue bound
+        max_inflight = proxy_cfg.mqtt_max_inflight
+        max_queued = proxy_cfg.mqtt_max_queued
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(max_queued)
+        if self.uplink_qos:
+            logger.info("  📮 Uplink QoS %d (in-flight window %d, queue limit %s)",
+                        self.uplink_qos, max_inflight, max_queued or "none")
+        
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
+        self.client.on_publish = self._on_publish
         
         # Store for connection
         self.mqtt_address = mqtt_address
@@ -102,35 +261,210 @@ class MQTTHandler:
                self.client.will_set(topic_stat, payload="offline", retain=True)
             
             logger.info(f"🔌 Connecting to {self.mqtt_address}:{self.mqtt_port}...")
-            self.client.connect(self.mqtt_address, self.mqtt_port, 60)
-            self.client.loop_start()
+            if self.event_loop is not None:
+                # asyncio runtime: the event loop drives the socket and retries the connect
+                self._network = AsyncioMqttLoop(self.client, self.event_loop)
+                self._network.start(self._connect)
+            else:
+                self._connect()
+                self.client.loop_start()
             
         except Exception as e:
             logger.error("❌ Failed to connect to MQTT broker: %s", e)
+        
+        if self.ingress_pool is not None:
+            self.ingress_pool.start()
+        for broker in self.brokers:
+            broker.start()
+
+    def _connect(self):
+        if self.mqtt_v5:
+            self.client.connect(self.mqtt_address, self.mqtt_port, 60, properties=self._connect_properties())
+        else:
+            self.client.connect(self.mqtt_address, self.mqtt_port, 60)
+
+    def _connect_properties(self):
+        """CONNECT properties for MQTT v5: session expiry and receive maximum."""
+        props = Properties(PacketTypes.CONNECT)
+        session_expiry = proxy_cfg.mqtt_session_expiry
+        receive_maximum = proxy_cfg.mqtt_receive_maximum
+        if session_expiry > 0:
+            props.SessionExpiryInterval = int(session_expiry)
+        if receive_maximum > 0:
+            props.ReceiveMaximum = int(receive_maximum)
+        return props
 
     def stop(self):
         """Stop the MQTT loop and disconnect."""
+        for broker in self.brokers:
+            broker.stop()
         if self.client:
             try:
-                self.client.loop_stop()
-                self.client.disconnect()
+                if self._network is not None:
+                    self.client.disconnect()
+                    self._network.stop()
+                    self._network = None
+                else:
+                    self.client.loop_stop()
+                    self.client.disconnect()
             except Exception:
                 pass
+        if self.ingress_pool is not None:
+            self.ingress_pool.stop()
 
     def publish(self, topic, payload, retain=False):
         """Publish a message to MQTT."""
         if self.client:
-            result = self.client.publish(topic, payload, retain=retain)
+            if self.uplink_buffer is not None and \
+               ((self.health_check_enabled and not self.connected) or len(self.uplink_buffer)):
+                # Broker down, or older messages still flushing: keep the order
+                self.uplink_buffer.put(topic, payload, retain)
+                if self.connected:
+                    self._start_flush()
+                return False
+            result = self._client_publish(topic, payload, retain)
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                tracer.stamp("publish", direction=UPLINK)
+                self._track_publish(result.mid)
                 self.tx_count += 1
                 self.tx_failures = 0
                 return True
             else:
                 logger.warning("⚠️ MQTT publish failed: rc=%s", result.rc)
                 self.tx_failures += 1
+                if self._held_by_client(result):
+                    # paho resends it on reconnect; buffering it as well would deliver it twice
+                    self._track_publish(result.mid)
+                elif result.rc == mqtt.MQTT_ERR_NO_CONN and self.uplink_buffer is not None:
+                    self.uplink_buffer.put(topic, payload, retain)
                 return False
         return False
 
+    def _client_publish(self, topic, payload, retain):
+        """
+        Publish with the uplink QoS, using a v5 topic alias where possible. Aliases are only
+        used for QoS 0: paho resends unacknowledged QoS 1/2 packets on a new connection,
+        where an alias-only topic would no longer be valid.
+        """
+        if self.mqtt_v5 and self.uplink_qos == 0 and self.topic_aliases.maximum:
+            def send(publish_topic, alias):
+                if alias is None:
+                    return self.client.publish(publish_topic, payload, retain=retain, qos=0)
+                props = Properties(PacketTypes.PUBLISH)
+                props.TopicAlias = alias
+                return self.client.publish(publish_topic, payload, retain=retain, qos=0, properties=props)
+            return self.topic_aliases.publish(topic, send)
+        return self.client.publish(topic, payload, retain=retain, qos=self.uplink_qos)
+
+    def _start_flush(self):
+        """Replay the uplink buffer in the background after (re)connecting."""
+        if self.uplink_buffer is None or not len(self.uplink_buffer):
+            return
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        logger.info("📤 Flushing %d buffered uplink messages...", len(self.uplink_buffer))
+        self._flush_thread = threading.Thread(target=self._flush_uplink_buffer, daemon=True, name="MQTTUplinkFlush")
+        self._flush_thread.start()
+
+    def _flush_uplink_buffer(self):
+        """Publish buffered messages at flush_rate per second until empty or disconnected."""
+        interval = 1.0 / self.flush_rate if self.flush_rate > 0 else 0.0
+        while self.connected and self.client:
+            item = self.uplink_buffer.pop()
+            if item is None:
+                break
+            topic, payload, retain = item
+            result = self._client_publish(topic, payload, retain)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                logger.warning("⚠️ Uplink flush interrupted: rc=%s", result.rc)
+                if self._held_by_client(result):
+                    self._track_publish(result.mid)
+                else:
+                    self.uplink_buffer.requeue(topic, payload, retain)
+                break
+            self._track_publish(result.mid)
+            self.tx_count += 1
+            if interval:
+                time.sleep(interval)
+        stats = self.uplink_buffer.stats()
+        logger.info("📤 Uplink buffer flush done: %d left, %d flushed, %d expired, %d overflowed",
+                    stats["depth"], stats["flushed"], stats["expired"], stats["overflowed"])
+
+    def _held_by_client(self, result):
+        """A QoS 1/2 publish refused for lack of a connection is still queued by paho for resend."""
+        return result.rc == mqtt.MQTT_ERR_NO_CONN and self.uplink_qos > 0
+
+    def _track_publish(self, mid):
+        """Start the completion clock for a publish (QoS 0: written to the socket, 1/2: acknowledged)."""
+        if not isinstance(mid, int):
+            return
+        now = time.monotonic()
+        with self._inflight_lock:
+            completed = self._early_completions.pop(mid, None)
+            if completed is not None and now - completed <= EARLY_COMPLETION_TTL:
+                # on_publish ran on the network thread before publish() returned
+                self.publish_completed += 1
+                self.publish_latency.observe(0.0)
+                return
+            self._inflight[mid] = now
+            while len(self._inflight) > MAX_TRACKED_INFLIGHT:
+                self._inflight.popitem(last=False)
+
+    def _on_publish(self, client, userdata, mid, reason_code=None, props=None):
+        """paho completion callback: PUBACK (QoS 1), PUBCOMP (QoS 2) or socket write (QoS 0)."""
+        with self._inflight_lock:
+            sent = self._inflight.pop(mid, None)
+            if sent is None:
+                now = time.monotonic()
+                early = self._early_completions
+                while early and now - next(iter(early.values())) > EARLY_COMPLETION_TTL:
+                    early.popitem(last=False)
+                early.pop(mid, None)
+                if len(early) < MAX_TRACKED_INFLIGHT:
+                    early[mid] = now
+                return
+            self.publish_completed += 1
+        self.publish_latency.observe(time.monotonic() - sent)
+
+    def publish_stats(self):
+        """Uplink QoS, in-flight depth and publish-to-completion latency."""
+        return {
+            "qos": self.uplink_qos,
+            "inflight": len(self._inflight),
+            "completed": self.publish_completed,
+            "latency": self.publish_latency.summary(),
+            "alias_hits": self.topic_aliases.hits,
+            "alias_bytes_saved": self.topic_aliases.bytes_saved,
+        }
+
+    def add_peer(self, node_id, callback, channel_provider=None):
+        """Attach another local node to this connection (multi-radio mode)."""
+        self.peers[node_id] = (callback, channel_provider)
+        if self.ingress_pool is not None:
+            self.ingress_pool.update_nodes()
+        if self.connected and self.current_mqtt_cfg:
+            self.client.publish(f"{self.mqtt_root}/2/stat/!{node_id}", payload="online", retain=True)
+            self.replan()
+
+    def remove_peer(self, node_id):
+        """Detach a node. The connection's own node only loses its callback (the connection keeps its identity)."""
+        if node_id == self.node_id:
+            self.on_message_callback = None
+            self.channel_provider = None
+        self.peers.pop(node_id, None)
+        if self.ingress_pool is not None:
+            self.ingress_pool.update_nodes()
+        if self.client and self.connected and self.current_mqtt_cfg:
+            self.client.publish(f"{self.mqtt_root}/2/stat/!{node_id}", payload="offline", retain=True)
+            self.replan()
+
+    def has_nodes(self):
+        return bool(self.peers) or self.on_message_callback is not None
+
+    def broker_stats(self):
+        """Per-connection stats for extra roots served by other brokers."""
+        return [broker.stats() for broker in self.brokers]
+
     def _compute_virtual_channel_hash(self, channel_name):
         """
         Compute a synthetic PSK hash for a virtual channel name.
@@ -190,6 +524,16 @@ class MQTTHandler:
             self.connected = True
             self.health_check_enabled = True
             self.last_activity = time.time()
+            if self.connects:
+                self.reconnects += 1
+            self.connects += 1
+            
+            if self.mqtt_v5:
+                # Aliases are per connection: use at most what both sides allow
+                broker_max = getattr(props, 'TopicAliasMaximum', 0) if props is not None else 0
+                wanted = proxy_cfg.mqtt_topic_aliases
+                self.topic_aliases.reset(min(wanted, broker_max or 0))
+                logger.info("  🏷️ Topic aliases: %d (broker allows %s)", self.topic_aliases.maximum, broker_max or 0)
             
             if self.current_mqtt_cfg:
                 root_topic = self.mqtt_root
@@ -197,24 +541,85 @@ class MQTTHandler:
                 # Publish Online Presence
                 topic_stat = f"{root_topic}/2/stat/{self.prefixed_node_id}"
                 client.publish(topic_stat, payload="online", retain=True)
+                for peer_id in list(self.peers):
+                    client.publish(f"{root_topic}/2/stat/!{peer_id}", payload="online", retain=True)
                 
-                # Subscribe to ALL Encrypted Traffic
-                topic_enc = f"{root_topic}/2/e/#"
-                logger.info("📥 Subscribing to Encrypted Wildcard: %s", topic_enc)
-                client.subscribe(topic_enc)
+                # Clean session: the broker has forgotten our filters, subscribe the full plan again.
+                # A resumed v5 session keeps them, so only the difference is applied.
+                self._apply_subscription_plan(client, clean=not getattr(flags, 'session_present', False))
                 
-                # Subscribe to extra MQTT root topics
-                subscribed_roots = {root_topic}
-                for extra_root, _ in getattr(self.config, 'extra_mqtt_roots', []):
-                    if extra_root not in subscribed_roots:
-                        extra_topic = f"{extra_root}/2/e/#"
-                        logger.info("📥 Subscribing to Extra Root: %s", extra_topic)
-                        client.subscribe(extra_topic)
-                        subscribed_roots.add(extra_root)
+                # Replay what the node sent while we were offline
+                self._start_flush()
         else:
             self.connected = False
             logger.error("❌ MQTT Connect failed: %s", rc)
 
+    def _planned_topics(self):
+        """Compute the topic filters we should currently be subscribed to."""
+        providers = [self.channel_provider] + [provider for _, provider in self.peers.values()]
+        providers = [provider for provider in providers if provider]
+        channels = [] if providers else None
+        for provider in providers:
+            try:
+                node_channels = provider()
+            except Exception as e:
+                logger.warning("⚠️ Failed to read node channels for subscription plan: %s", e)
+                node_channels = None
+            if node_channels is None:
+                # A node with unknown channels needs the wildcard, which covers everyone
+                channels = None
+                break
+            channels.extend(c for c in node_channels if c not in channels)
+        return self.planner.plan(self.mqtt_root, channels, exclude_roots=self.pooled_roots)
+
+    def _apply_subscription_plan(self, client, clean=False):
+        """
+        Subscribe/unsubscribe incrementally so the broker matches the current plan.
+        With clean=True the broker holds no filters, so the whole plan is subscribed.
+        """
+        planned = self._planned_topics()
+        with self._subscriptions_lock:
+            if clean:
+                self.subscriptions = set()
+            to_subscribe, to_unsubscribe = self.planner.diff(self.subscriptions, planned)
+
+            for topic in to_unsubscribe:
+                logger.info("📤 Unsubscribing: %s", topic)
+                client.unsubscribe(topic)
+                self.subscriptions.discard(topic)
+
+            for topic in to_subscribe:
+                logger.info("📥 Subscribing: %s", topic)
+                client.subscribe(topic)
+                self.subscriptions.add(topic)
+
+    def replan(self):
+        """Re-plan subscriptions after a channel/config change (no-op while disconnected)."""
+        if self.client and self.connected and self.current_mqtt_cfg:
+            self._apply_subscription_plan(self.client)
+
+    def _attribute_to_node(self, ctx):
+        """
+        With several nodes on one connection, check echo and own-topic rules against the
+        node whose gateway published the message rather than the connection's own node.
+        """
+        envelope = ctx.envelope
+        gateway = envelope.gateway_id.lstrip("!") if envelope is not None else ""
+        if gateway in self.peers:
+            ctx.node_id = gateway
+            ctx.prefixed_node_id = f"!{gateway}"
+
+    def _recipients(self, ctx):
+        """Callbacks a message that passed ingress is delivered to. Echoes only go back to their own node."""
+        if not self.peers:
+            return [self.on_message_callback] if self.on_message_callback else []
+        if ctx.is_echo:
+            if ctx.node_id in self.peers:
+                return [self.peers[ctx.node_id][0]]
+            return [self.on_message_callback] if self.on_message_callback else []
+        callbacks = [self.on_message_callback] if self.on_message_callback else []
+        return callbacks + [callback for callback, _ in self.peers.values()]
+
     def _on_disconnect(self, client, userdata, flags, rc, props=None):
         self.connected = False
         if rc != 0:
@@ -224,76 +629,37 @@ class MQTTHandler:
 
     def _on_message(self, client, userdata, message):
         """Handle incoming MQTT messages."""
-        try:
-            # Check if this is an echo of our own message (Firmware needs this to generate Implicit ACKs)
-            is_echo = False
-            try:
-                envelope = mqtt_pb2.ServiceEnvelope()
-                envelope.ParseFromString(message.payload)
-                if envelope.gateway_id:
-                    if self.node_id and (envelope.gateway_id == self.node_id or envelope.gateway_id == self.prefixed_node_id):
-                        packet = envelope.packet
-                        # Only allow echo bypass for packets that are eligible for Implicit ACKs
-                        if packet.HasField("encrypted") or \
-                           (packet.HasField("decoded") and packet.decoded.request_id):
-                            is_echo = True
-            except Exception:
-                pass
+        self.receive(message, self)
 
-            # Skip stat messages
-            if "/stat/" in message.topic:
-                return
+    def receive(self, message, source):
+        """Entry point for received messages: prefiltered by the ingress pool when enabled."""
+        tracer.begin(DOWNLINK)
+        try:
+            if self.ingress_pool is not None and self.ingress_pool.running:
+                self.ingress_pool.submit(message, source)
+            else:
+                self.handle_incoming(message, source)
+        finally:
+            tracer.end()
 
-            # Topic check loop prevention (Bypass for echoes so firmware gets its ACK)
-            if self.node_id and message.topic.endswith(self.prefixed_node_id) and not is_echo:
-                 logger.debug("🛡️ Ignoring own MQTT message (Loop protection): %s", message.topic)
-                 return
-
-            # Enhanced Loop Protection: Check for duplicate Packet ID from same Sender
-            if not is_echo:
-                try:
-                    sender_node_id = None
-                    packet_id = None
-                    
-                    # Attempt to parse as ServiceEnvelope
-                    try:
-                        envelope = mqtt_pb2.ServiceEnvelope()
-                        envelope.ParseFromString(message.payload)
-                        packet = envelope.packet
-                        
-                        sender_val = getattr(packet, "from")
-                        if sender_val:
-                             sender_node_id = f"{sender_val:08x}"
-                        
-                        if packet.id:
-                             packet_id = packet.id
-                    except Exception:
-                        # Fallback? Maybe it's a raw MeshPacket?
-                        try:
-                            packet = mesh_pb2.MeshPacket()
-                            packet.ParseFromString(message.payload)
-                            sender_val = getattr(packet, "from")
-                            if sender_val:
-                                 sender_node_id = f"{sender_val:08x}"
-                            
-                            if packet.id:
-                                 packet_id = packet.id
-                        except:
-                            pass
-                    
-                    if self.deduplicator and sender_node_id and packet_id:
-                         if self.deduplicator.is_duplicate(sender_node_id, packet_id):
-                             logger.info(f"🛡️ Ignoring duplicate MQTT message from {sender_node_id} (PacketId={packet_id}) (Loop Prevention)")
-                             return
-
-                except Exception as e:
-                    logger.debug(f"⚠️ Error checking loop tracker: {e}")
-             
-            # Skip retained messages by default - they're historical state, not new mesh traffic
-            # This prevents startup floods when connecting to broker with many retained messages
-            if message.retain and not (self.config and getattr(self.config, 'mqtt_forward_retained', False)):
-                logger.debug(f"⏭️ Skipping retained MQTT message: {message.topic}")
+    def handle_incoming(self, message, source):
+        """
+        Run a received message through ingress and forward it to the radio. Shared by the
+        primary client and the broker pool so dedup and rules see every root; source is the
+        connection whose rx_count/last_activity the message counts towards.
+        """
+        # Messages coming back from the ingress pool start their trace here
+        traced_here = tracer.current() is None
+        if traced_here:
+            tracer.begin(DOWNLINK)
+        try:
+            ctx = IngressContext(message.topic, message.payload, message.retain,
+                                 node_id=self.node_id, prefixed_node_id=self.prefixed_node_id)
+            if self.peers:
+                self._attribute_to_node(ctx)
+            if self.ingress.process(ctx) is not None:
                 return
+            tracer.stamp("filter", direction=DOWNLINK)
               
             modified_topic = message.topic
             modified_payload = message.payload
@@ -330,13 +696,21 @@ class MQTTHandler:
                                         channel_name, new_channel_name, er_root)
                     break
 
-            self.last_activity = time.time()
-            self.rx_count += 1
+            source.last_activity = time.time()
+            source.rx_count += 1
             
             logger.info("📥 MQTT->Node: Topic=%s Size=%d bytes Retained=%s", modified_topic, len(modified_payload), message.retain)
             
-            if self.on_message_callback:
-                self.on_message_callback(modified_topic, modified_payload, message.retain)
+            recipients = self._recipients(ctx)
+            trace = tracer.current()
+            for callback in recipients:
+                if trace is not None and len(recipients) > 1:
+                    # Each node's queue item carries its own copy of the trace
+                    tracer.fork(trace)
+                callback(modified_topic, modified_payload, message.retain)
                 
         except Exception as e:
             logger.error("❌ Error handling MQTT message: %s", e)
+        finally:
+            if traced_here:
+                tracer.end()
@@ -0,0 +1,354 @@
+"""Run the MQTT client in its own process for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import json
+import time
+import struct
+import logging
+import threading
+import multiprocessing
+from handlers.shm_ring import ShmRing, RingChannel
+from handlers import tracing
+
+logger = logging.getLogger("mqtt-proxy.mqtt_process")
+
+# Radio process -> MQTT process
+PUBLISH = 1     # topic, payload, retain
+SEEN = 2        # node_id, packet_id (uint32) seen on the radio
+CONFIGURE = 3   # node_id, serialized ModuleConfig.MQTTConfig, downlink channel names (JSON)
+CHANNELS = 4    # downlink channel names (JSON), re-plans subscriptions
+RELEASE = 5     # stop the node's MQTT client
+STOP = 6        # exit the process
+# MQTT process -> radio process
+DOWNLINK = 16   # topic, payload, retain
+STATUS = 17     # handler state and stats (JSON)
+
+STATUS_INTERVAL = 1.0
+_PACKET_ID = struct.Struct("<I")
+
+
+def _retain_flag(retain):
+    return b"\x01" if retain else b""
+
+
+def _mqtt_process_main(to_mqtt_name, to_radio_name, capacity, to_mqtt_bell, to_radio_bell):
+    """Entry point of the MQTT process: owns the MQTTHandler and its deduplicator."""
+    from config import cfg
+    from meshtastic.protobuf import module_config_pb2
+    from handlers.mqtt import MQTTHandler
+    from handlers.node_tracker import PacketDeduplicator
+
+    inbox = RingChannel(ShmRing(capacity, name=to_mqtt_name), to_mqtt_bell)
+    outbox = RingChannel(ShmRing(capacity, name=to_radio_name), to_radio_bell)
+    parent = multiprocessing.parent_process()
+    deduplicator = PacketDeduplicator()
+    state = {"handler": None, "channels": None}
+
+    def on_message(topic, payload, retained):
+        outbox.send(DOWNLINK, topic.encode("utf-8"), bytes(payload), _retain_flag(retained))
+
+    def release():
+        if state["handler"] is not None:
+            state["handler"].stop()
+            state["handler"] = None
+
+    last_status = 0
+    try:
+        while parent is None or parent.is_alive():
+            frame = inbox.recv(timeout=STATUS_INTERVAL)
+            if frame is not None:
+                kind, fields = frame
+                handler = state["handler"]
+                if kind == PUBLISH:
+                    if handler is not None:
+                        handler.publish(fields[0].decode("utf-8"), fields[1], retain=bool(fields[2]))
+                elif kind == SEEN:
+                    deduplicator.mark_seen(fields[0].decode("utf-8"), _PACKET_ID.unpack(fields[1])[0])
+                elif kind == CONFIGURE:
+                    release()
+                    state["channels"] = json.loads(fields[2])
+                    mqtt_cfg = module_config_pb2.ModuleConfig.MQTTConfig()
+                    mqtt_cfg.ParseFromString(fields[1])
+                    handler = MQTTHandler(cfg, fields[0].decode("utf-8"), on_message, deduplicator=deduplicator,
+                                          channel_provider=lambda: state["channels"])
+                    handler.configure(mqtt_cfg)
+                    handler.start()
+                    state["handler"] = handler
+                elif kind == CHANNELS:
+                    state["channels"] = json.loads(fields[0])
+                    if handler is not None:
+                        handler.replan()
+                elif kind == RELEASE:
+                    release()
+                elif kind == STOP:
+                    break
+            now = time.time()
+            if now - last_status >= STATUS_INTERVAL:
+                last_status = now
+                outbox.send(STATUS, json.dumps(_handler_status(state["handler"])).encode("utf-8"))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        release()
+        inbox.ring.close()
+        outbox.ring.close()
+
+
+def _handler_status(handler):
+    if handler is None:
+        return None
+    pool = handler.ingress_pool
+    latency = handler.publish_latency.buckets()
+    return {
+        "connected": handler.connected,
+        "health_check_enabled": handler.health_check_enabled,
+        "last_activity": handler.last_activity,
+        "tx_count": handler.tx_count,
+        "rx_count": handler.rx_count,
+        "tx_failures": handler.tx_failures,
+        "reconnects": handler.reconnects,
+        "publish": handler.publish_stats(),
+        # The +Inf bucket is left out (JSON has no infinity): its cumulative count is the total
+        "publish_latency": {"buckets": latency[:-1], "count": latency[-1][1], "sum": handler.publish_latency.sum},
+        "brokers": handler.broker_stats(),
+        "ingress": handler.ingress.stats(),
+        "uplink_buffer": handler.uplink_buffer.stats() if handler.uplink_buffer is not None else None,
+        "ingress_pool": pool.stats() if pool is not None and pool.running else None,
+    }
+
+
+class _StatsView:
+    """Stands in for a component living in the MQTT process, answering stats() with its last report."""
+    running = True
+
+    def __init__(self, stats):
+        self._stats = stats
+
+    def stats(self):
+        return self._stats
+
+
+class _HistogramView:
+    """Stands in for a LatencyHistogram living in the MQTT process, with the buckets of its last report."""
+    def __init__(self, report):
+        self._buckets = [(bound, cumulative) for bound, cumulative in report["buckets"]]
+        self._buckets.append((float("inf"), report["count"]))
+        self.count = report["count"]
+        self.sum = report["sum"]
+
+    def buckets(self):
+        return self._buckets
+
+
+class RemoteMQTTHandler:
+    """
+    The radio process's view of the MQTTHandler running in the MQTT process.
+
+    Offers the parts of MQTTHandler the proxy and interface use: publish(), configure()
+    and start(), stop(), replan(), and the connection state and stats, which are
+    refreshed from the MQTT process's status reports.
+    """
+    def __init__(self, process, node_id, channel_provider=None):
+        self.process = process
+        self.node_id = node_id
+        self.channel_provider = channel_provider
+        self.current_mqtt_cfg = None
+        self.connected = False
+        self.health_check_enabled = False
+        self.last_activity = 0
+        self.tx_count = 0
+        self.rx_count = 0
+        self.tx_failures = 0
+        self.reconnects = 0
+        self.ingress = None
+        self.uplink_buffer = None
+        self.ingress_pool = None
+        self.publish_latency = None
+        self._status = {}
+
+    def configure(self, node_mqtt_config):
+        self.current_mqtt_cfg = node_mqtt_config
+
+    def start(self):
+        self.process.configure(self)
+
+    def stop(self):
+        self.process.release(self)
+
+    def publish(self, topic, payload, retain=False):
+        # Uplink traces end at the hand-off to the MQTT process
+        if self.process.send(PUBLISH, topic.encode("utf-8"), bytes(payload), _retain_flag(retain)):
+            tracing.tracer.stamp("publish", direction=tracing.UPLINK)
+
+    def replan(self):
+        self.process.send(CHANNELS, self.channels_json())
+
+    def channels_json(self):
+        channels = self.channel_provider() if self.channel_provider else None
+        return json.dumps(channels).encode("utf-8")
+
+    def update(self, status):
+        """Apply a status report from the MQTT process."""
+        if status is None:
+            self.connected = False
+            return
+        self._status = status
+        self.connected = status["connected"]
+        self.health_check_enabled = status["health_check_enabled"]
+        self.last_activity = status["last_activity"]
+        self.tx_count = status["tx_count"]
+        self.rx_count = status["rx_count"]
+        self.tx_failures = status["tx_failures"]
+        self.reconnects = status.get("reconnects", 0)
+        self.ingress = _StatsView(status["ingress"])
+        self.uplink_buffer = _StatsView(status["uplink_buffer"]) if status["uplink_buffer"] is not None else None
+        self.ingress_pool = _StatsView(status["ingress_pool"]) if status["ingress_pool"] is not None else None
+        self.publish_latency = _HistogramView(status["publish_latency"]) if "publish_latency" in status else None
+
+    def publish_stats(self):
+        return self._status.get("publish")
+
+    def broker_stats(self):
+        return self._status.get("brokers")
+
+
+class MQTTProcess:
+    """
+    Runs the MQTT client in a separate process so MQTT ingress load can't delay radio reads
+    or sends to the radio, which stay in this process with the interface and message queue.
+
+    The two processes talk through a pair of shared memory rings (one per direction) with
+    compact frames: uplink publishes, packets seen on the radio for loop prevention, and
+    config/channel updates go one way; downlink messages and periodic status reports come
+    back and are handed to on_message (the proxy's downlink path). If the MQTT process
+    dies it is restarted and the current node's MQTT config is sent again.
+    """
+    def __init__(self, on_message, deduplicator=None, ring_bytes=1024 * 1024):
+        self.on_message = on_message
+        self.deduplicator = deduplicator
+        self.ring_bytes = max(4096, int(ring_bytes))
+        self.handler = None
+        self.process = None
+        self.running = False
+        self.restarts = 0
+        self.received = 0
+        self._mp = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._to_mqtt = None
+        self._to_radio = None
+        self._thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._spawn()
+        if self.deduplicator is not None:
+            self.deduplicator.add_listener(self.mark_seen)
+        self._thread = threading.Thread(target=self._read_loop, name="mqtt-process", daemon=True)
+        self._thread.start()
+        logger.info("🧩 MQTT client running in process %d", self.process.pid)
+
+    def _spawn(self):
+        to_mqtt = RingChannel(ShmRing(self.ring_bytes), self._mp.Semaphore(0))
+        to_radio = RingChannel(ShmRing(self.ring_bytes), self._mp.Semaphore(0))
+        process = self._mp.Process(target=_mqtt_process_main, name="mqtt-proxy-mqtt",
+                                   args=(to_mqtt.ring.name, to_radio.ring.name, self.ring_bytes,
+                                         to_mqtt.doorbell, to_radio.doorbell))
+        process.start()
+        # Under the lock, so no send() is still writing into the rings being released
+        with self._lock:
+            for channel in (self._to_mqtt, self._to_radio):
+                if channel is not None:
+                    channel.ring.close(unlink=True)
+            self._to_mqtt, self._to_radio, self.process = to_mqtt, to_radio, process
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.deduplicator is not None:
+            self.deduplicator.remove_listener(self.mark_seen)
+        self.send(STOP)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        with self._lock:
+            for channel in (self._to_mqtt, self._to_radio):
+                channel.ring.close(unlink=True)
+            self._to_mqtt = None
+
+    def send(self, kind, *fields):
+        # The channel is used under the lock: a restart releases the old rings
+        with self._lock:
+            channel = self._to_mqtt
+            return channel is not None and channel.send(kind, *fields)
+
+    def handler_for(self, node_id, channel_provider=None):
+        """A handler for the proxy's node, in place of a local MQTTHandler."""
+        return RemoteMQTTHandler(self, node_id, channel_provider)
+
+    def configure(self, handler):
+        """Start handler's node on the MQTT process (replacing the previous node's client)."""
+        self.handler = handler
+        self._send_config(handler)
+
+    def _send_config(self, handler):
+        if handler.current_mqtt_cfg is None:
+            return
+        self.send(CONFIGURE, handler.node_id.encode("utf-8"), handler.current_mqtt_cfg.SerializeToString(),
+                  handler.channels_json())
+
+    def release(self, handler):
+        if handler is self.handler:
+            self.handler = None
+            self.send(RELEASE)
+
+    def mark_seen(self, node_id, packet_id):
+        """Deduplicator listener: the MQTT process's ingress drops the broker copies of these packets."""
+        self.send(SEEN, node_id.encode("utf-8"), _PACKET_ID.pack(packet_id & 0xFFFFFFFF))
+
+    def _read_loop(self):
+        while self.running:
+            channel = self._to_radio
+            frame = channel.recv(timeout=1.0)
+            if frame is None:
+                if self.running and not self.process.is_alive():
+                    self._restart()
+                continue
+            kind, fields = frame
+            if kind == DOWNLINK:
+                self.received += 1
+                # Downlink traces start when the message reaches this process (ingress ran over there)
+                tracing.tracer.begin(tracing.DOWNLINK)
+                try:
+                    self.on_message(fields[0].decode("utf-8"), fields[1], bool(fields[2]))
+                except Exception as e:
+                    logger.error("❌ Error handling MQTT message from MQTT process: %s", e)
+                finally:
+                    tracing.tracer.end()
+            elif kind == STATUS and self.handler is not None:
+                self.handler.update(json.loads(fields[0]))
+
+    def _restart(self):
+        logger.warning("⚠️ MQTT process exited (code %s), restarting", self.process.exitcode)
+        self.restarts += 1
+        if self.handler is not None:
+            self.handler.update(None)
+        self._spawn()
+        if self.handler is not None:
+            self._send_config(self.handler)
+
+    def stats(self):
+        to_mqtt = self._to_mqtt
+        return {
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.process is not None and self.process.is_alive(),
+            "restarts": self.restarts,
+            "sent": to_mqtt.sent if to_mqtt is not None else 0,
+            "dropped": to_mqtt.dropped if to_mqtt is not None else 0,
+            "received": self.received,
+        }
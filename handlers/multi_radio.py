@@ -0,0 +1,181 @@
+"""Multi-radio mode for MQTT Proxy: several Meshtastic nodes served by one process."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import os
+import copy
+import time
+import signal
+import logging
+import threading
+
+from handlers.mqtt import MQTTHandler
+from handlers.node_tracker import PacketDeduplicator
+from handlers.metrics import MetricsServer, merge, deduplicator_metrics, tracer_metrics
+from handlers.tracing import tracer
+
+logger = logging.getLogger("mqtt-proxy.multi_radio")
+
+
+def target_label(target):
+    """Short display name for a (interface_type, address, port) radio target."""
+    interface_type, address, port = target
+    return f"{interface_type}:{address}" + (f":{port}" if port else "")
+
+
+def target_config(config, target):
+    """A copy of config whose interface settings point at one radio target."""
+    interface_type, address, port = target
+    node_config = copy.copy(config)
+    node_config.interface_type = interface_type
+    if interface_type == "serial":
+        node_config.serial_port = address
+    else:
+        node_config.tcp_node_host = address
+        node_config.tcp_node_port = port
+    return node_config
+
+
+def broker_key(mqtt_cfg):
+    """Nodes whose MQTT settings produce the same key can share one broker connection."""
+    return (
+        getattr(mqtt_cfg, 'address', None),
+        int(getattr(mqtt_cfg, 'port', 1883) or 1883),
+        getattr(mqtt_cfg, 'username', None),
+        getattr(mqtt_cfg, 'password', None),
+        bool(getattr(mqtt_cfg, 'tlsEnabled', False)),
+        getattr(mqtt_cfg, 'root', 'msh'),
+    )
+
+
+class SharedBrokers:
+    """
+    Hands out one MQTTHandler per broker configuration to the nodes of a multi-radio process.
+
+    The first node to attach owns the connection (client ID, LWT); later nodes with the
+    same broker, credentials and root are added as peers. Subscriptions, ingress filtering
+    and deduplication then run once per message for all of them. The connection is
+    stopped when its last node detaches.
+    """
+    def __init__(self, config, deduplicator, handler_factory=MQTTHandler):
+        self.config = config
+        self.deduplicator = deduplicator
+        self.handler_factory = handler_factory
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def attach(self, node_id, mqtt_cfg, callback, channel_provider):
+        key = broker_key(mqtt_cfg)
+        with self._lock:
+            handler = self._handlers.get(key)
+            if handler is not None:
+                logger.info("🔗 Node !%s sharing the MQTT connection of !%s", node_id, handler.node_id)
+                handler.add_peer(node_id, callback, channel_provider)
+                return handler
+            handler = self.handler_factory(self.config, node_id, callback, deduplicator=self.deduplicator,
+                                           channel_provider=channel_provider)
+            handler.configure(mqtt_cfg)
+            handler.start()
+            self._handlers[key] = handler
+            return handler
+
+    def detach(self, handler, node_id):
+        with self._lock:
+            handler.remove_peer(node_id)
+            if handler.has_nodes():
+                return
+            for key, existing in list(self._handlers.items()):
+                if existing is handler:
+                    del self._handlers[key]
+        handler.stop()
+
+    def __len__(self):
+        return len(self._handlers)
+
+
+class MultiRadioSupervisor:
+    """
+    Runs one proxy per radio target, each in its own thread with its own interface, queue
+    and channel index, sharing the deduplicator and broker connections.
+
+    A node whose health check fails is restarted on its own instead of exiting the
+    process. The container heartbeat stays healthy while every node has reported
+    healthy within health_check_activity_timeout.
+    """
+    RESTART_DELAY = 5
+
+    def __init__(self, config, targets, proxy_factory):
+        self.config = config
+        self.running = True
+        self.deduplicator = PacketDeduplicator()
+        self.brokers = SharedBrokers(config, self.deduplicator)
+        self.proxies = [proxy_factory(target=target, deduplicator=self.deduplicator, brokers=self.brokers)
+                        for target in targets]
+        self.threads = []
+        # One /metrics endpoint for all radios, samples labelled by radio
+        self.metrics_server = None
+        if config.metrics_port > 0:
+            self.metrics_server = MetricsServer(self.collect_metrics, config.metrics_port, host=config.metrics_host)
+
+    def start(self):
+        logger.info("🚀 Multi-radio mode: %d nodes (%s)", len(self.proxies),
+                    ", ".join(proxy.label for proxy in self.proxies))
+        signal.signal(signal.SIGINT, self.handle_sigint)
+        signal.signal(signal.SIGTERM, self.handle_sigint)
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                logger.error("❌ Metrics endpoint could not listen on port %d: %s", self.metrics_server.port, e)
+                self.metrics_server = None
+
+        for proxy in self.proxies:
+            thread = threading.Thread(target=self._run_proxy, args=(proxy,), name=f"radio-{proxy.label}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        started = time.time()
+        while self.running:
+            time.sleep(1)
+            self._update_heartbeat(time.time(), started)
+
+    def _run_proxy(self, proxy):
+        while self.running:
+            try:
+                proxy.start()
+            except SystemExit:
+                logger.warning("🔁 Node %s stopped after a failed health check, restarting in %ds...",
+                               proxy.label, self.RESTART_DELAY)
+            except Exception as e:
+                logger.error("❌ Node %s crashed: %s", proxy.label, e)
+            if not self.running:
+                return
+            time.sleep(self.RESTART_DELAY)
+            proxy.running = True
+
+    def healthy(self, current_time, started):
+        timeout = self.config.health_check_activity_timeout
+        return all(current_time - max(proxy.last_healthy, started) <= timeout for proxy in self.proxies)
+
+    def collect_metrics(self):
+        families = merge([({"radio": proxy.label}, proxy.collect_metrics()) for proxy in self.proxies])
+        return families + deduplicator_metrics(self.deduplicator) + tracer_metrics(tracer)
+
+    def _update_heartbeat(self, current_time, started):
+        try:
+            if self.healthy(current_time, started):
+                with open("/tmp/healthy", "w") as f:
+                    f.write(str(current_time))
+            elif os.path.exists("/tmp/healthy"):
+                os.remove("/tmp/healthy")
+        except OSError:
+            pass
+
+    def handle_sigint(self, sig, frame):
+        logger.info("🛑 Received Ctrl+C, shutting down...")
+        self.running = False
+        for proxy in self.proxies:
+            proxy.running = False
+            proxy._cleanup()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
@@ -5,6 +5,7 @@
 import time
 import logging
 import threading
+from collections import OrderedDict
 
 logger = logging.getLogger("mqtt-proxy.packet_deduplicator")
 
@@ -17,6 +18,19 @@ class PacketDeduplicator:
         self.seen_packets = {}
         self.timeout = timeout_seconds
         self.lock = threading.Lock()
+        # Called with (node_id, packet_id) for every packet marked seen (e.g. ingress workers' copies)
+        self.listeners = []
+        # Packets marked seen, lookups, and lookups that found a duplicate
+        self.marked = 0
+        self.checks = 0
+        self.hits = 0
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
 
     def mark_seen(self, node_id, packet_id):
         """Mark a (node_id, packet_id) pair as seen on the mesh interface."""
@@ -27,9 +41,12 @@ class PacketDeduplicator:
         key = (clean_id, packet_id)
         
         with self.lock:
+            self.marked += 1
             self.seen_packets[key] = time.time()
             # logger.debug(f"🔄 Marked packet {key} as seen on mesh.")
             self._cleanup()
+        for listener in self.listeners:
+            listener(clean_id, packet_id)
 
     def is_duplicate(self, node_id, packet_id):
         """Check if a (node_id, packet_id) pair was recently seen on the mesh."""
@@ -40,9 +57,11 @@ class PacketDeduplicator:
         key = (clean_id, packet_id)
         
         with self.lock:
+            self.checks += 1
             if key in self.seen_packets:
                 last_seen = self.seen_packets[key]
                 if time.time() - last_seen < self.timeout:
+                    self.hits += 1
                     return True
                 else:
                     del self.seen_packets[key]
@@ -59,3 +78,163 @@ class PacketDeduplicator:
             keys_to_remove = [k for k, t in self.seen_packets.items() if now - t > self.timeout]
             for k in keys_to_remove:
                 del self.seen_packets[k]
+
+
+class RFHeardTable:
+    """
+    Bounded table of sender node numbers recently heard on the radio side (not via MQTT),
+    with their last-seen time.
+
+    If our node hears a sender directly, the MQTT copies of that sender's packets are
+    redundant for our mesh. Entries are kept in LRU order; the least recently heard
+    sender is evicted when the table is full, and entries older than the window are
+    dropped as they reach the cold end.
+    """
+    def __init__(self, window_seconds, max_senders=4096):
+        self.window = window_seconds
+        self.max_senders = max(1, int(max_senders))
+        self._heard = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def mark_heard(self, sender, now=None):
+        """Record that sender was heard on RF."""
+        if not sender:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if sender in self._heard:
+                self._heard.move_to_end(sender)
+            else:
+                self._expire(now)
+                while len(self._heard) >= self.max_senders:
+                    self._heard.popitem(last=False)
+            self._heard[sender] = now
+
+    def heard_recently(self, sender, now=None):
+        """True if sender was heard on RF within the window."""
+        if not sender:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_seen = self._heard.get(sender)
+            return last_seen is not None and now - last_seen < self.window
+
+    def _expire(self, now):
+        while self._heard:
+            _, oldest = next(iter(self._heard.items()))
+            if now - oldest < self.window:
+                break
+            self._heard.popitem(last=False)
+
+    def __len__(self):
+        return len(self._heard)
+
+
+class ReachableNodeIndex:
+    """
+    Integer set of node numbers reachable through our node: the local NodeDB plus
+    senders heard on the radio stream within the last heard_hours.
+
+    Lookups are a plain set membership test. The index is refreshed incrementally:
+    radio senders are added as they are heard, and expired heard-only entries are
+    swept at most once a minute.
+    """
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, heard_hours=24):
+        self.horizon = heard_hours * 3600
+        self._nodes = set()
+        self._nodedb = set()
+        self._heard = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.dropped = 0
+
+    def sync_nodedb(self, nodes_by_num):
+        """
+        Load node numbers from the interface's nodesByNum. Nodes the node only
+        knows from MQTT (viaMqtt) are not reachable over our RF and are skipped.
+        """
+        nodedb = set()
+        for num, info in (nodes_by_num or {}).items():
+            if not isinstance(num, int):
+                continue
+            if isinstance(info, dict) and info.get("viaMqtt"):
+                continue
+            nodedb.add(num)
+        with self._lock:
+            self._nodedb = nodedb
+            self._nodes = nodedb | set(self._heard)
+        logger.debug(f"📇 Reachable node index: {len(nodedb)} NodeDB entries, {len(self._heard)} heard")
+
+    def mark_heard(self, node_num, now=None):
+        """Add a node heard on the radio stream."""
+        if not node_num:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._heard[node_num] = now
+            self._nodes.add(node_num)
+            if now - self._last_sweep >= self.SWEEP_INTERVAL:
+                self._sweep(now)
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        expired = [num for num, seen in self._heard.items() if now - seen > self.horizon]
+        for num in expired:
+            del self._heard[num]
+            if num not in self._nodedb:
+                self._nodes.discard(num)
+
+    def __contains__(self, node_num):
+        return node_num in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class InjectedPacketSet:
+    """
+    Bounded, expiring set of (from, id) pairs the proxy wrote to the radio.
+
+    The firmware may hand a downlinked packet straight back via mqttClientProxyMessage;
+    the uplink path uses this set to avoid republishing it. Entries are kept in insertion
+    order, so expiry and capacity eviction both pop from the front.
+    """
+    def __init__(self, ttl_seconds=120, max_entries=4096):
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def add(self, sender, packet_id, now=None):
+        if not sender or not packet_id:
+            return
+        now = time.monotonic() if now is None else now
+        key = (sender, packet_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._expire(now)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = now
+
+    def contains(self, sender, packet_id, now=None):
+        if not sender or not packet_id:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            added = self._entries.get((sender, packet_id))
+            return added is not None and now - added < self.ttl
+
+    def _expire(self, now):
+        while self._entries:
+            _, oldest = next(iter(self._entries.items()))
+            if now - oldest < self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -3,10 +3,18 @@
 # This software is licensed under the MIT License. See LICENSE file for details.
 
 import time
+import asyncio
 import logging
 import threading
 from collections import deque
 from meshtastic import mesh_pb2
+from meshtastic.protobuf import mqtt_pb2
+from google.protobuf.message import DecodeError
+from config import cfg as proxy_cfg
+from handlers.airtime import DutyCycleBudget, estimate_airtime, frame_bytes, lora_params
+from handlers.congestion import CongestionPacer
+from handlers.histogram import LatencyHistogram
+from handlers.tracing import tracer, DOWNLINK
 
 logger = logging.getLogger("mqtt-proxy.queue")
 
@@ -14,16 +22,22 @@ class MessageQueue:
     """
     Thread-safe queue for buffering and rate-limiting outgoing messages to the radio.
     """
-    def __init__(self, config, interface_provider):
+    def __init__(self, config, interface_provider, is_rf_bound=None, injected=None):
         """
         Initialize the message queue.
         
         Args:
             config: Config object containing mesh_transmit_delay.
             interface_provider: Callable that returns the current Meshtastic interface (or None).
+            is_rf_bound: Optional callable(topic) -> bool telling whether the node will actually
+                transmit a message on air (virtual channels are not). Used for airtime accounting.
+            injected: Optional InjectedPacketSet; the (from, id) of every packet written to the
+                radio is recorded there so the uplink path can skip the firmware's copy of it.
         """
         self.config = config
         self.get_interface = interface_provider
+        self.is_rf_bound = is_rf_bound
+        self.injected = injected
         
         # Ensure max_size is an integer, especially in tests where config might be a MagicMock
         raw_max_size = getattr(config, 'mesh_max_queue_size', 100)
@@ -39,8 +53,35 @@ class MessageQueue:
         self._lock = threading.Lock()
         self._event = threading.Event()
         self._eviction_count = 0
+        # Messages written to the radio and how long they waited in the queue
+        self.sent = 0
+        self.wait_latency = LatencyHistogram()
+        
+        # Duty-cycle budget (e.g. 10% per hour in the EU). Disabled when the limit is 0.
+        duty_percent = proxy_cfg.mesh_duty_cycle_percent
+        self.duty_budget = None
+        if duty_percent > 0:
+            self.duty_budget = DutyCycleBudget(duty_percent, proxy_cfg.mesh_duty_cycle_window)
+        self.airtime_sent = 0.0
+        self.last_airtime = 0.0
+        
+        # Congestion pacing from the node's channel utilization telemetry. Disabled when the ceiling is 0.
+        ceiling = proxy_cfg.mesh_congestion_ceiling
+        self.pacer = None
+        if ceiling > 0:
+            self.pacer = CongestionPacer(
+                ceiling,
+                max_factor=proxy_cfg.mesh_congestion_max_factor,
+                air_util_tx_ceiling=proxy_cfg.mesh_congestion_tx_ceiling,
+                base_delay=proxy_cfg.mesh_congestion_base_delay,
+                half_life=proxy_cfg.mesh_congestion_recovery,
+            )
+        
         self.running = False
         self.thread = None
+        # Set while run_async() drives the queue from an event loop instead of the worker thread
+        self._loop = None
+        self._wakeup = None
 
     def start(self):
         """Start the queue processing thread."""
@@ -55,6 +96,7 @@ class MessageQueue:
         """Stop the queue processing."""
         self.running = False
         self._event.set()
+        self._wake_async()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1.0)
         logger.info("🛑 Message queue stopped.")
@@ -74,17 +116,25 @@ class MessageQueue:
     def _get(self):
         """Get the next item from the deque, or None if empty."""
         with self._lock:
-            if self._deque:
-                return self._deque.popleft()
-            return None
+            item = self._deque.popleft() if self._deque else None
+        if item is not None and item.get('trace') is not None:
+            tracer.stamp("dequeue", item['trace'])
+        return item
 
     def put(self, topic, payload, retained):
         """Enqueue a message. If full, evict the oldest message."""
+        # The latency trace of the MQTT message being handled on this thread continues with the item
+        trace = tracer.current()
+        if trace is not None and trace.direction == DOWNLINK:
+            tracer.stamp("enqueue", trace)
+        else:
+            trace = None
         item = {
             'topic': topic,
             'payload': payload,
             'retained': retained,
-            'timestamp': time.time()
+            'timestamp': time.time(),
+            'trace': trace,
         }
 
         evicted_topic = None
@@ -102,6 +152,7 @@ class MessageQueue:
             logger.debug(f"Evicted message for topic: {evicted_topic}")
 
         self._event.set()
+        self._wake_async()
 
         if size >= (self.max_size * 0.8) and size < self.max_size:
             logger.warning(f"⚠️ Queue nearly full: {size}/{self.max_size} messages pending")
@@ -125,15 +176,13 @@ class MessageQueue:
                     continue
 
                 try:
-                    queue_duration = time.time() - item['timestamp']
-                    send_start = time.time()
-                    self._send_to_radio(iface, item)
-                    send_duration = time.time() - send_start
-                    
-                    queue_size = self.qsize()
-                    logger.info(f"✅ Message processed. Queue: {queue_size}/{self.max_size}, Wait: {queue_duration:.3f}s, Send: {send_duration:.3f}s")
-                    
-                    time.sleep(self.config.mesh_transmit_delay)
+                    airtime = 0.0
+                    if self.duty_budget:
+                        airtime = self._estimate_airtime(iface, item)
+                        if not self._wait_for_budget(airtime):
+                            continue
+
+                    time.sleep(self._dispatch(iface, item, airtime))
                     
                 except Exception as e:
                     logger.error(f"❌ Failed to send to radio: {e}")
@@ -142,6 +191,163 @@ class MessageQueue:
                 logger.error(f"❌ Error in queue processing loop: {e}")
                 time.sleep(1)
 
+    def _dispatch(self, iface, item, airtime):
+        """Send one item and account for it. Returns the delay before the next send."""
+        queue_duration = time.time() - item['timestamp']
+        send_start = time.time()
+        self._send_to_radio(iface, item)
+        send_duration = time.time() - send_start
+        if item.get('trace') is not None:
+            tracer.stamp("write", item['trace'])
+        self.sent += 1
+        self.wait_latency.observe(queue_duration)
+
+        if self.duty_budget:
+            self.duty_budget.record(airtime)
+            self.airtime_sent += airtime
+            self.last_airtime = airtime
+        
+        queue_size = self.qsize()
+        logger.info(f"✅ Message processed. Queue: {queue_size}/{self.max_size}, Wait: {queue_duration:.3f}s, Send: {send_duration:.3f}s")
+        
+        return self.config.mesh_transmit_delay + self._pacing_delay()
+
+    async def run_async(self):
+        """
+        The worker loop as a coroutine, for the asyncio runtime: same pacing, duty-cycle
+        and congestion handling, with the waits on the event loop instead of a thread.
+        Runs until stop() is called or the task is cancelled.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.running = True
+        logger.info("📦 Message queue started (event loop).")
+        try:
+            while self.running:
+                self._wakeup.clear()
+                item = self._get()
+                if item is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                iface = self.get_interface()
+                while not iface and self.running:
+                    await asyncio.sleep(1)
+                    iface = self.get_interface()
+                if not iface or not self.running:
+                    logger.debug(f"Dropping message during shutdown: {item['topic']}")
+                    continue
+
+                try:
+                    airtime = 0.0
+                    if self.duty_budget:
+                        airtime = self._estimate_airtime(iface, item)
+                        wait = self._budget_wait(airtime)
+                        while wait > 0 and self.running:
+                            await asyncio.sleep(min(wait, 1.0))
+                            wait = self.duty_budget.wait_time(airtime)
+                        if not self.running:
+                            continue
+
+                    await asyncio.sleep(self._dispatch(iface, item, airtime))
+                except Exception as e:
+                    logger.error(f"❌ Failed to send to radio: {e}")
+        finally:
+            self._loop = None
+            self._wakeup = None
+
+    def _wake_async(self):
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                wakeup.set()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(wakeup.set)
+
+    def _estimate_airtime(self, iface, item):
+        """Estimated LoRa time on air (seconds) for the node to transmit this item."""
+        if self.is_rf_bound and not self.is_rf_bound(item['topic']):
+            return 0.0
+        lora_cfg = None
+        try:
+            lora_cfg = iface.localNode.localConfig.lora
+        except AttributeError:
+            pass
+        sf, bw, cr = lora_params(lora_cfg)
+        return estimate_airtime(frame_bytes(item['payload']), sf, bw, cr)
+
+    def _budget_wait(self, airtime):
+        """Seconds until the duty-cycle budget has room for airtime (logged and counted when > 0)."""
+        wait = self.duty_budget.wait_time(airtime)
+        if wait > 0:
+            logger.info(f"⏳ Duty-cycle budget exhausted, holding next message for {wait:.1f}s "
+                        f"(remaining {self.duty_budget.remaining():.1f}s of {self.duty_budget.budget:.0f}s)")
+            self.duty_budget.total_wait += wait
+        return wait
+
+    def _wait_for_budget(self, airtime):
+        """Hold the worker until the duty-cycle budget has room. Returns False on shutdown."""
+        wait = self._budget_wait(airtime)
+        while wait > 0 and self.running:
+            time.sleep(min(wait, 1.0))
+            wait = self.duty_budget.wait_time(airtime)
+        return self.running
+
+    def _pacing_delay(self):
+        """Extra delay between sends while the mesh is congested."""
+        if not self.pacer:
+            return 0.0
+        delay = self.pacer.extra_delay()
+        if delay > 0:
+            logger.debug(f"🐢 Mesh congested, pacing factor {self.pacer.factor():.2f} (+{delay:.2f}s)")
+        return delay
+
+    def update_congestion(self, channel_utilization, air_util_tx):
+        """Feed the node's channel utilization telemetry into the pacer."""
+        if self.pacer:
+            self.pacer.update(channel_utilization, air_util_tx)
+
+    def pacing_factor(self):
+        """Current pacing factor (1.0 = full rate, or when pacing is disabled)."""
+        return self.pacer.factor() if self.pacer else 1.0
+
+    def congestion_stats(self):
+        """Congestion pacing state for status reporting, or None if pacing is disabled."""
+        if not self.pacer:
+            return None
+        return self.pacer.stats()
+
+    def stats(self):
+        """Depth, throughput and wait time for status reporting and metrics."""
+        return {
+            "depth": self.qsize(),
+            "capacity": self.max_size,
+            "sent": self.sent,
+            "evictions": self._eviction_count,
+            "wait": self.wait_latency,
+        }
+
+    def airtime_stats(self):
+        """Duty-cycle accounting for status reporting, or None if no budget is configured."""
+        if not self.duty_budget:
+            return None
+        return {
+            "budget": self.duty_budget.budget,
+            "window": self.duty_budget.window,
+            "used": self.duty_budget.used(),
+            "remaining": self.duty_budget.remaining(),
+            "airtime_sent": self.airtime_sent,
+            "last_airtime": self.last_airtime,
+            "waited": self.duty_budget.total_wait,
+        }
+
     def _wait_for_interface(self):
         """Blocks until an interface is available or running is False."""
         while self.running:
@@ -174,3 +380,15 @@ class MessageQueue:
              iface._sendToRadioImpl(to_radio)
              
         logger.debug(f"📤 Sent to radio: {item['topic']} ({size} bytes)")
+
+        if self.injected is not None:
+            self._record_injected(item['payload'])
+
+    def _record_injected(self, payload):
+        """Remember the (from, id) of a packet we wrote to the radio."""
+        try:
+            envelope = mqtt_pb2.ServiceEnvelope()
+            envelope.ParseFromString(payload)
+        except DecodeError:
+            return
+        self.injected.add(getattr(envelope.packet, "from"), envelope.packet.id)
@@ -0,0 +1,248 @@
+"""Radio connection multiplexer for MQTT Proxy: share the node's stream with local TCP clients."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import queue
+import socket
+import logging
+import threading
+from meshtastic import mesh_pb2
+from google.protobuf.message import DecodeError
+from handlers.config_cache import changes_config
+
+logger = logging.getLogger("mqtt-proxy.radio_mux")
+
+START1 = 0x94
+START2 = 0xC3
+MAX_FRAME = 512
+
+
+def frame(payload):
+    """Wrap a protobuf payload in the stream API header (0x94 0xC3, 16-bit big-endian length)."""
+    return bytes((START1, START2, (len(payload) >> 8) & 0xFF, len(payload) & 0xFF)) + payload
+
+
+class FrameReader:
+    """Incremental parser for the framed stream a client writes. Skips garbage until the next header."""
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Add received bytes and return the complete frame payloads now available."""
+        self._buf += data
+        frames = []
+        while True:
+            start = self._buf.find(bytes((START1, START2)))
+            if start < 0:
+                # Keep a trailing START1 that may be the first half of a header
+                del self._buf[:-1 if self._buf[-1:] == bytes((START1,)) else len(self._buf)]
+                return frames
+            del self._buf[:start]
+            if len(self._buf) < 4:
+                return frames
+            length = (self._buf[2] << 8) | self._buf[3]
+            if length > MAX_FRAME:
+                del self._buf[:2]  # Not a real header, resync
+                continue
+            if len(self._buf) < 4 + length:
+                return frames
+            frames.append(bytes(self._buf[4:4 + length]))
+            del self._buf[:4 + length]
+
+
+class MuxClient:
+    """One local client: a bounded queue of outgoing frames and a writer/reader thread pair."""
+    def __init__(self, mux, sock, address, queue_size):
+        self.mux = mux
+        self.sock = sock
+        self.address = address
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self.sent = 0
+        self.received = 0
+
+    def start(self):
+        threading.Thread(target=self._write_loop, name=f"mux-tx-{self.address}", daemon=True).start()
+        threading.Thread(target=self._read_loop, name=f"mux-rx-{self.address}", daemon=True).start()
+
+    def offer(self, data):
+        """Queue a frame; False if the client has fallen too far behind."""
+        try:
+            self.frames.put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.frames.put_nowait(None)
+        except queue.Full:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _write_loop(self):
+        while not self.closed:
+            data = self.frames.get()
+            if data is None:
+                break
+            try:
+                self.sock.sendall(data)
+                self.sent += 1
+            except OSError:
+                break
+        self.mux.remove(self)
+
+    def _read_loop(self):
+        reader = FrameReader()
+        while not self.closed:
+            try:
+                data = self.sock.recv(4096)
+            except OSError:
+                break
+            if not data:
+                break
+            for payload in reader.feed(data):
+                to_radio = mesh_pb2.ToRadio()
+                try:
+                    to_radio.ParseFromString(payload)
+                except DecodeError:
+                    continue
+                self.received += 1
+                if to_radio.HasField("disconnect"):
+                    # The client is leaving, the radio session stays up for everyone else
+                    self.mux.remove(self)
+                    return
+                if to_radio.HasField("heartbeat"):
+                    continue  # The proxy keeps the session alive itself
+                if to_radio.HasField("want_config_id") and self.mux.serve_config(self, to_radio.want_config_id):
+                    continue
+                self.mux.on_to_radio(to_radio, self)
+        self.mux.remove(self)
+
+
+class RadioMux:
+    """
+    Serves the node's FromRadio stream to local TCP clients (MeshMonitor, scripts) so they
+    share the proxy's single radio session instead of competing for the node's TCP port.
+
+    Each frame is wrapped once and the same buffer is queued to every client. Clients get
+    a bounded queue; one that falls behind is disconnected rather than slowing the others.
+    Clients' ToRadio messages are handed to on_to_radio, which writes them through the
+    proxy's serialized radio write path. With a config_cache, want_config requests are
+    answered from memory instead of making the node stream its config again.
+    """
+    def __init__(self, port, on_to_radio, host="0.0.0.0", queue_size=256, max_clients=8, config_cache=None):
+        self.port = port
+        self.host = host
+        self._on_to_radio = on_to_radio
+        self.config_cache = config_cache
+        self.queue_size = max(1, int(queue_size))
+        self.max_clients = max(1, int(max_clients))
+        self.clients = []
+        self._lock = threading.Lock()
+        self._server = None
+        self.frames = 0
+        self.dropped_clients = 0
+        self.accepted = 0
+
+    def start(self):
+        if self._server is not None:
+            return
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(self.max_clients)
+        self._server = server
+        self.port = server.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="radio-mux", daemon=True).start()
+        logger.info("🔀 Radio mux listening on %s:%d", self.host, self.port)
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+        with self._lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
+
+    def _accept_loop(self):
+        while self._server is not None:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                if len(self.clients) >= self.max_clients:
+                    logger.warning("⚠️ Radio mux full (%d clients), refusing %s", self.max_clients, address[0])
+                    sock.close()
+                    continue
+                client = MuxClient(self, sock, f"{address[0]}:{address[1]}", self.queue_size)
+                self.clients.append(client)
+                self.accepted += 1
+            logger.info("🔀 Radio mux client connected: %s", client.address)
+            client.start()
+
+    def remove(self, client, slow=False):
+        with self._lock:
+            if client not in self.clients:
+                return
+            self.clients.remove(client)
+        if slow:
+            self.dropped_clients += 1
+            logger.warning("⚠️ Radio mux client %s too slow, disconnecting", client.address)
+        else:
+            logger.info("🔀 Radio mux client disconnected: %s", client.address)
+        client.close()
+
+    def on_to_radio(self, to_radio, client):
+        if self.config_cache is not None and changes_config(to_radio):
+            self.config_cache.invalidate(f"admin request from {client.address}")
+        self._on_to_radio(to_radio, client)
+
+    def serve_config(self, client, nonce):
+        """Answer a client's want_config from the cache. False if it must go to the node."""
+        if self.config_cache is None:
+            return False
+        frames = self.config_cache.replay(nonce)
+        if frames is None:
+            return False
+        logger.info("🗂️ Served config to mux client %s from cache (%d frames)", client.address, len(frames))
+        if not client.offer(b"".join(frame(payload) for payload in frames)):
+            self.remove(client, slow=True)
+        return True
+
+    def broadcast(self, payload, decoded=None):
+        """Send one FromRadio frame payload (as read from the node) to every client."""
+        if self.config_cache is not None:
+            if decoded is None:
+                decoded = mesh_pb2.FromRadio()
+                try:
+                    decoded.ParseFromString(payload)
+                except DecodeError:
+                    decoded = None
+            if decoded is not None:
+                self.config_cache.observe(decoded, payload)
+        if not self.clients:
+            return
+        data = frame(payload)
+        self.frames += 1
+        for client in list(self.clients):
+            if not client.offer(data):
+                self.remove(client, slow=True)
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "accepted": self.accepted,
+            "frames": self.frames,
+            "dropped_clients": self.dropped_clients,
+        }
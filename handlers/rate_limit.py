@@ -0,0 +1,85 @@
+"""Per-sender downlink rate limiting for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("mqtt-proxy.rate_limit")
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "throttled")
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+        self.throttled = 0
+
+
+class SenderRateLimiter:
+    """
+    Token bucket per packet.from node number on the MQTT->radio path.
+
+    Buckets live in a bounded LRU table: when it is full the least recently seen
+    sender is evicted, and buckets idle for longer than idle_timeout are dropped
+    as they reach the cold end of the table. Memory therefore stays fixed no
+    matter how many distinct senders the broker carries.
+    """
+    def __init__(self, rate_per_minute, burst, max_senders=10000, idle_timeout=600):
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.burst = max(1.0, float(burst))
+        self.max_senders = max(1, int(max_senders))
+        self.idle_timeout = idle_timeout
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+        self.evictions = 0
+
+    def allow(self, sender, now=None):
+        """Consume one token for sender. Returns False if the sender is over its rate."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(sender)
+            if bucket is None:
+                self._evict(now)
+                bucket = _Bucket(self.burst, now)
+                self._buckets[sender] = bucket
+            else:
+                self._buckets.move_to_end(sender)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                self.allowed += 1
+                return True
+            bucket.throttled += 1
+            self.throttled += 1
+            return False
+
+    def _evict(self, now):
+        """Drop idle buckets from the cold end, then make room for one more entry."""
+        while self._buckets:
+            _, oldest = next(iter(self._buckets.items()))
+            if now - oldest.updated <= self.idle_timeout:
+                break
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        while len(self._buckets) >= self.max_senders:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def top_throttled(self, n=5):
+        """Return [(sender, throttled_count), ...] for the n most throttled tracked senders."""
+        with self._lock:
+            items = [(sender, b.throttled) for sender, b in self._buckets.items() if b.throttled]
+        return heapq.nlargest(n, items, key=lambda item: item[1])
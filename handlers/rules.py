@@ -0,0 +1,224 @@
+"""Declarative downlink filter rules for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import json
+import logging
+from meshtastic.protobuf import portnums_pb2
+
+logger = logging.getLogger("mqtt-proxy.rules")
+
+# Match fields that need the ServiceEnvelope decoded. Rule sets that only use
+# root/channel/size never pay for a protobuf parse.
+PACKET_FIELDS = {"from", "to", "hop_start", "hop_limit", "hops_away", "via_mqtt", "portnum"}
+SET_FIELDS = {"from", "to", "root", "channel", "portnum"}
+RANGE_FIELDS = {"hop_start", "hop_limit", "hops_away", "size"}
+BOOL_FIELDS = {"via_mqtt"}
+ACTIONS = ("drop", "allow")
+
+
+class RuleError(ValueError):
+    """Raised when a rules file cannot be compiled."""
+
+
+def _node_num(value):
+    """Accept 123, "123", "!0000007b" or "0x7b" and return the integer node number."""
+    if isinstance(value, bool):
+        raise RuleError(f"Invalid node number: {value!r}")
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().lower()
+    if text.startswith("!"):
+        return int(text[1:], 16)
+    if text.startswith("0x"):
+        return int(text, 16)
+    return int(text)
+
+
+def _portnum(value):
+    """Accept 1, "1" or "TEXT_MESSAGE_APP" and return the integer portnum."""
+    if isinstance(value, bool):
+        raise RuleError(f"Invalid portnum: {value!r}")
+    if isinstance(value, int):
+        return value
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    try:
+        return portnums_pb2.PortNum.Value(text.upper())
+    except ValueError:
+        raise RuleError(f"Unknown portnum: {value!r}")
+
+
+def _field_value(ctx, field):
+    """Read a match field from an IngressContext."""
+    if field == "from":
+        return ctx.sender
+    if field == "to":
+        return ctx.dest
+    if field == "size":
+        return ctx.size
+    if field == "root":
+        root = ctx.root
+        return root.lower() if root else None
+    if field == "channel":
+        channel = ctx.channel
+        return channel.lower() if channel else None
+    if field == "portnum":
+        return ctx.portnum
+    packet = ctx.packet
+    if packet is None:
+        return None
+    if field == "hop_start":
+        return packet.hop_start
+    if field == "hop_limit":
+        return packet.hop_limit
+    if field == "hops_away":
+        # Only meaningful when the sender's firmware fills in hop_start
+        return packet.hop_start - packet.hop_limit if packet.hop_start else None
+    if field == "via_mqtt":
+        return packet.via_mqtt
+    return None
+
+
+class DownlinkRule:
+    """A compiled rule: every condition must hold for the rule to match."""
+    __slots__ = ("name", "action", "shadow", "conditions", "needs_portnum", "matches")
+
+    def __init__(self, name, action, shadow, conditions):
+        self.name = name
+        self.action = action
+        self.shadow = shadow
+        # List of (field, kind, operand): kind is "set" (frozenset), "range" (lo, hi) or "bool"
+        self.conditions = conditions
+        self.needs_portnum = any(field == "portnum" for field, _, _ in conditions)
+        self.matches = 0
+
+    def match(self, ctx):
+        for field, kind, operand in self.conditions:
+            value = _field_value(ctx, field)
+            if value is None:
+                return False
+            if kind == "set":
+                if value not in operand:
+                    return False
+            elif kind == "range":
+                lo, hi = operand
+                if value < lo or value > hi:
+                    return False
+            elif value != operand:
+                return False
+        return True
+
+
+def compile_rule(raw, position):
+    """Compile one rule dict into a DownlinkRule."""
+    if not isinstance(raw, dict):
+        raise RuleError(f"Rule #{position} must be an object")
+    name = str(raw.get("name") or f"rule-{position}")
+    action = raw.get("action", "drop")
+    if action not in ACTIONS:
+        raise RuleError(f"Rule '{name}': unknown action {action!r} (expected one of {ACTIONS})")
+    match = raw.get("match") or {}
+    if not isinstance(match, dict) or not match:
+        raise RuleError(f"Rule '{name}': 'match' must be a non-empty object")
+
+    conditions = []
+    for field, spec in match.items():
+        if field in SET_FIELDS:
+            values = spec if isinstance(spec, list) else [spec]
+            if field in ("from", "to"):
+                try:
+                    operand = frozenset(_node_num(v) for v in values)
+                except (TypeError, ValueError) as e:
+                    raise RuleError(f"Rule '{name}': invalid node number in '{field}': {e}")
+            elif field == "portnum":
+                try:
+                    operand = frozenset(_portnum(v) for v in values)
+                except RuleError as e:
+                    raise RuleError(f"Rule '{name}': {e}")
+            else:
+                operand = frozenset(str(v).lower() for v in values)
+            conditions.append((field, "set", operand))
+        elif field in RANGE_FIELDS:
+            if isinstance(spec, dict):
+                lo = spec.get("min", float("-inf"))
+                hi = spec.get("max", float("inf"))
+            elif isinstance(spec, list) and len(spec) == 2:
+                lo, hi = spec
+            elif isinstance(spec, int) and not isinstance(spec, bool):
+                lo = hi = spec
+            else:
+                raise RuleError(f"Rule '{name}': '{field}' must be a number, [min, max] or {{min, max}}")
+            for bound in (lo, hi):
+                if not isinstance(bound, (int, float)) or isinstance(bound, bool):
+                    raise RuleError(f"Rule '{name}': '{field}' bounds must be numbers, got {bound!r}")
+            if lo > hi:
+                raise RuleError(f"Rule '{name}': '{field}' minimum {lo!r} is greater than maximum {hi!r}")
+            conditions.append((field, "range", (lo, hi)))
+        elif field in BOOL_FIELDS:
+            if not isinstance(spec, bool):
+                raise RuleError(f"Rule '{name}': '{field}' must be true or false")
+            conditions.append((field, "bool", spec))
+        else:
+            raise RuleError(f"Rule '{name}': unknown match field '{field}'")
+
+    # Cheap topic/size conditions first so most non-matches never decode the packet,
+    # and portnum (which may need a decrypt) last
+    conditions.sort(key=lambda c: (c[0] in PACKET_FIELDS) + (c[0] == "portnum"))
+    return DownlinkRule(name, action, bool(raw.get("shadow", False)), conditions)
+
+
+class DownlinkRuleSet:
+    """
+    Ordered downlink filter rules, evaluated first-match-wins.
+
+    A matching "drop" rule drops the packet, a matching "allow" rule accepts it
+    without evaluating later rules. Rules in shadow mode (or every rule, when the
+    whole set is in shadow mode) only count their matches and never decide.
+    """
+    def __init__(self, rules, shadow=False):
+        self.rules = list(rules)
+        self.shadow = shadow
+        self.needs_portnum = any(rule.needs_portnum for rule in self.rules)
+        self.dropped = 0
+
+    @classmethod
+    def from_dict(cls, data, shadow=False):
+        if isinstance(data, list):
+            data = {"rules": data}
+        if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+            raise RuleError("Rules file must be a list of rules or an object with a 'rules' list")
+        rules = [compile_rule(raw, i) for i, raw in enumerate(data.get("rules", []))]
+        return cls(rules, shadow=shadow or bool(data.get("shadow", False)))
+
+    @classmethod
+    def load(cls, path, shadow=False):
+        """Load and compile a JSON rules file."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise RuleError(f"Cannot read rules file {path}: {e}")
+        return cls.from_dict(data, shadow=shadow)
+
+    def evaluate(self, ctx):
+        """
+        Evaluate the rules against an IngressContext.
+        Returns the DownlinkRule that drops the packet, or None to let it through.
+        """
+        for rule in self.rules:
+            if not rule.match(ctx):
+                continue
+            rule.matches += 1
+            if rule.shadow or self.shadow:
+                continue
+            if rule.action == "allow":
+                return None
+            self.dropped += 1
+            return rule
+        return None
+
+    def stats(self):
+        """Per-rule match counters."""
+        return {rule.name: rule.matches for rule in self.rules}
@@ -0,0 +1,142 @@
+"""Shared memory ring buffer for MQTT Proxy's worker processes."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import struct
+import threading
+from multiprocessing import shared_memory
+
+_HEADER = 16  # uint64 head (bytes written) + uint64 tail (bytes read)
+_LENGTH = struct.Struct("<I")
+
+
+class ShmRing:
+    """
+    Single-producer single-consumer ring of length-prefixed records in shared memory.
+
+    The producer only advances head and the consumer only advances tail, both monotonic
+    byte counters in the header, so no lock is needed between the two processes. A record
+    that doesn't fit in the free space is refused rather than overwriting unread data.
+    """
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER + capacity)
+            self.shm.buf[:_HEADER] = bytes(_HEADER)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def _counters(self):
+        return struct.unpack_from("<QQ", self.shm.buf, 0)
+
+    def used(self):
+        head, tail = self._counters()
+        return head - tail
+
+    def write(self, data):
+        """Append one record. False if the ring doesn't have room for it."""
+        head, tail = self._counters()
+        size = _LENGTH.size + len(data)
+        if self.capacity - (head - tail) < size:
+            return False
+        self._copy_in(head, _LENGTH.pack(len(data)))
+        self._copy_in(head + _LENGTH.size, data)
+        struct.pack_into("<Q", self.shm.buf, 0, head + size)
+        return True
+
+    def read(self):
+        """Pop the oldest record, or None if the ring is empty."""
+        head, tail = self._counters()
+        if head == tail:
+            return None
+        length = _LENGTH.unpack(self._copy_out(tail, _LENGTH.size))[0]
+        data = self._copy_out(tail + _LENGTH.size, length)
+        struct.pack_into("<Q", self.shm.buf, 8, tail + _LENGTH.size + length)
+        return data
+
+    def _copy_in(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.shm.buf[_HEADER + start:_HEADER + start + first] = data[:first]
+        if first < len(data):
+            self.shm.buf[_HEADER:_HEADER + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, length):
+        start = position % self.capacity
+        first = min(length, self.capacity - start)
+        data = bytes(self.shm.buf[_HEADER + start:_HEADER + start + first])
+        if first < length:
+            data += bytes(self.shm.buf[_HEADER:_HEADER + length - first])
+        return data
+
+    def close(self, unlink=False):
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except (OSError, BufferError):
+            pass
+
+
+_FIELD = struct.Struct("<I")
+
+
+def pack_frame(kind, *fields):
+    """Compact frame: one type byte, a field count byte, then length-prefixed byte fields."""
+    parts = [bytes((kind, len(fields)))]
+    for field in fields:
+        parts.append(_FIELD.pack(len(field)))
+        parts.append(field)
+    return b"".join(parts)
+
+
+def unpack_frame(data):
+    """Inverse of pack_frame: (kind, [fields])."""
+    kind, count = data[0], data[1]
+    fields = []
+    offset = 2
+    for _ in range(count):
+        length = _FIELD.unpack_from(data, offset)[0]
+        offset += _FIELD.size
+        fields.append(data[offset:offset + length])
+        offset += length
+    return kind, fields
+
+
+class RingChannel:
+    """
+    One direction of a link between two processes: a ShmRing plus a semaphore that is
+    released once per frame written, so the reader can block instead of polling.
+
+    Writers in the same process are serialized with a lock, which keeps the ring
+    single-producer. A frame that doesn't fit within send_timeout is dropped.
+    """
+    def __init__(self, ring, doorbell, send_timeout=0.1):
+        self.ring = ring
+        self.doorbell = doorbell
+        self.send_timeout = send_timeout
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, kind, *fields):
+        data = pack_frame(kind, *fields)
+        deadline = time.monotonic() + self.send_timeout
+        with self._lock:
+            while not self.ring.write(data):
+                if len(data) + _LENGTH.size > self.ring.capacity or time.monotonic() >= deadline:
+                    self.dropped += 1
+                    return False
+                time.sleep(0.001)
+            self.sent += 1
+        self.doorbell.release()
+        return True
+
+    def recv(self, timeout=None):
+        """Next (kind, fields), or None if nothing arrived within timeout."""
+        if not self.doorbell.acquire(timeout=timeout):
+            return None
+        data = self.ring.read()
+        return unpack_frame(data) if data is not None else None
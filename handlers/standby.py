@@ -0,0 +1,123 @@
+"""Warm standby radio for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+from pubsub import pub
+from handlers.multi_radio import target_label
+
+logger = logging.getLogger("mqtt-proxy.standby")
+
+
+def config_loaded(iface):
+    """True once an interface has received its node's config."""
+    node = getattr(iface, "localNode", None)
+    return bool(node and node.nodeNum != -1 and node.moduleConfig)
+
+
+class StandbyRadio:
+    """
+    Keeps a second radio connected, with its config loaded, so the proxy can switch to
+    it as soon as the active radio's connection is lost.
+
+    connect(target) opens an interface marked as standby: the proxy ignores its frames
+    and connection events until promote() hands it over. After a failover the proxy
+    retargets the standby at the radio that failed, so it becomes the new standby once
+    it is back.
+    """
+    def __init__(self, target, connect, config_timeout=60, retry_delay=10):
+        self.target = target
+        self._connect = connect
+        self.config_timeout = config_timeout
+        self.retry_delay = retry_delay
+        self.iface = None
+        self.ready = False
+        self.running = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.running = True
+        pub.subscribe(self.on_connection_lost, "meshtastic.connection.lost")
+        self._thread = threading.Thread(target=self._run, name="standby-radio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        self._drop()
+
+    def _run(self):
+        while self.running:
+            if self.iface is None:
+                self._open()
+            self._wake.wait(timeout=1.0 if self.iface is not None else self.retry_delay)
+            self._wake.clear()
+
+    def _open(self):
+        target = self.target
+        try:
+            logger.info("🔌 Connecting standby radio %s...", target_label(target))
+            iface = self._connect(target)
+        except Exception as e:
+            logger.warning("⚠️ Standby radio %s unavailable: %s", target_label(target), e)
+            return
+        deadline = time.time() + self.config_timeout
+        while self.running and not config_loaded(iface) and time.time() < deadline:
+            time.sleep(0.5)
+        with self._lock:
+            if not self.running or target != self.target or not config_loaded(iface):
+                ready = False
+            else:
+                self.iface = iface
+                self.ready = ready = True
+        if not ready:
+            logger.warning("⚠️ Standby radio %s did not load its config, retrying", target_label(target))
+            _close(iface)
+            return
+        logger.info("✅ Standby radio %s ready (node !%08x)", target_label(target), iface.localNode.nodeNum)
+
+    def on_connection_lost(self, interface, **kwargs):
+        if interface is not None and interface is self.iface:
+            logger.warning("⚠️ Standby radio %s connection lost", target_label(self.target))
+            self._drop()
+            self._wake.set()
+
+    def _drop(self):
+        with self._lock:
+            iface, self.iface = self.iface, None
+            self.ready = False
+        if iface is not None:
+            _close(iface)
+
+    def promote(self):
+        """Hand over the connected standby interface, or None if it isn't ready."""
+        with self._lock:
+            if not self.ready or self.iface is None:
+                return None
+            iface, self.iface = self.iface, None
+            self.ready = False
+        iface.standby = False
+        return iface
+
+    def retarget(self, target):
+        """Make another radio the standby (e.g. the one that just failed)."""
+        with self._lock:
+            self.target = target
+        self._drop()
+        self._wake.set()
+
+    def stats(self):
+        return {"target": target_label(self.target), "ready": self.ready}
+
+
+def _close(iface):
+    try:
+        iface.close()
+    except Exception:
+        pass
@@ -0,0 +1,82 @@
+"""MQTT Subscription Planner for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import logging
+from config import cfg as proxy_cfg
+
+logger = logging.getLogger("mqtt-proxy.subscriptions")
+
+# MQTT topic channel used by the firmware for PKI-encrypted direct messages / traceroutes
+PKI_CHANNEL = "PKI"
+
+
+class SubscriptionPlanner:
+    """
+    Computes the set of MQTT topic filters the proxy needs.
+
+    By default this is the <root>/2/e/# wildcard for the node's root and each extra root.
+    With MQTT_SELECTIVE_SUBSCRIBE enabled the node's root is narrowed to one filter per
+    downlink-enabled channel plus PKI, and extra roots are narrowed to their channel
+    allowlist (EXTRA_MQTT_ROOT_CHANNELS) when one is configured.
+    """
+    def __init__(self, config):
+        self.config = config
+
+    def plan(self, root, downlink_channels=None, exclude_roots=()):
+        """
+        Return an ordered list of topic filters.
+
+        Args:
+            root: The node's MQTT root topic.
+            downlink_channels: Iterable of downlink-enabled channel names on the node,
+                or None if unknown (falls back to the wildcard).
+            exclude_roots: Extra roots served by another broker connection.
+        """
+        selective = proxy_cfg.mqtt_selective_subscribe
+        topics = []
+
+        if selective and downlink_channels is not None:
+            for channel in downlink_channels:
+                topics.append(f"{root}/2/e/{channel}/#")
+            topics.append(f"{root}/2/e/{PKI_CHANNEL}/#")
+        else:
+            topics.append(f"{root}/2/e/#")
+
+        subscribed_roots = {root}
+        for extra_root, _ in getattr(self.config, 'extra_mqtt_roots', []):
+            if extra_root in subscribed_roots or extra_root in exclude_roots:
+                continue
+            subscribed_roots.add(extra_root)
+            topics.extend(self._extra_root_topics(extra_root, selective))
+
+        return self._unique(topics)
+
+    def plan_roots(self, roots):
+        """Topic filters for a broker connection that only serves the given extra roots."""
+        selective = proxy_cfg.mqtt_selective_subscribe
+        topics = []
+        for extra_root in roots:
+            topics.extend(self._extra_root_topics(extra_root, selective))
+        return self._unique(topics)
+
+    def _extra_root_topics(self, extra_root, selective):
+        allowlists = proxy_cfg.extra_mqtt_root_channels
+        channels = allowlists.get(extra_root) if selective else None
+        if channels:
+            return [f"{extra_root}/2/e/{channel}/#" for channel in channels]
+        return [f"{extra_root}/2/e/#"]
+
+    @staticmethod
+    def _unique(topics):
+        # Preserve order but drop duplicates (e.g. two channels with the same name)
+        seen = set()
+        return [t for t in topics if not (t in seen or seen.add(t))]
+
+    @staticmethod
+    def diff(current, planned):
+        """Return (to_subscribe, to_unsubscribe) lists to move from current to planned."""
+        planned_set = set(planned)
+        to_subscribe = [t for t in planned if t not in current]
+        to_unsubscribe = sorted(t for t in current if t not in planned_set)
+        return to_subscribe, to_unsubscribe
@@ -0,0 +1,76 @@
+"""MQTT v5 outbound topic alias map for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import threading
+from collections import OrderedDict
+
+
+class TopicAliasMap:
+    """
+    LRU map from uplink topic to MQTT v5 topic alias (1..maximum).
+
+    The first publish of a topic sends the full topic together with its alias, so the
+    broker learns the mapping. Later publishes send an empty topic plus the alias. When
+    every alias is taken, the least recently used topic gives up its number. Aliases
+    only live for one network connection, so the map is reset on every (re)connect.
+
+    Publishing goes through publish(), which keeps the map locked until the registering
+    publish is queued: otherwise another thread could send the empty-topic form of a new
+    alias before the broker has seen the topic for it.
+    """
+    def __init__(self, maximum=0):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.bytes_saved = 0
+        self.reset(maximum)
+
+    def reset(self, maximum):
+        """Start a new connection with the alias maximum negotiated with the broker."""
+        with self._lock:
+            self.maximum = max(0, int(maximum))
+            self._aliases = OrderedDict()  # topic -> alias
+            self._free = []  # Aliases given back by failed registrations
+
+    def resolve(self, topic):
+        """
+        Return (publish_topic, alias) for a topic: ("", alias) when the broker already
+        knows the alias, (topic, alias) to (re)register it, or (topic, None) if aliasing is off.
+        """
+        with self._lock:
+            return self._resolve(topic)
+
+    def publish(self, topic, send):
+        """
+        Resolve topic and call send(publish_topic, alias) under the lock, returning its
+        result. If a registering publish fails (result.rc != 0), the alias is given back,
+        so the next publish of the topic registers it again.
+        """
+        with self._lock:
+            publish_topic, alias = self._resolve(topic)
+            result = send(publish_topic, alias)
+            if publish_topic and alias is not None and result.rc != 0:
+                del self._aliases[topic]
+                self._free.append(alias)
+            return result
+
+    def _resolve(self, topic):
+        if not self.maximum:
+            return topic, None
+        alias = self._aliases.get(topic)
+        if alias is not None:
+            self._aliases.move_to_end(topic)
+            self.hits += 1
+            self.bytes_saved += len(topic.encode("utf-8"))
+            return "", alias
+        if self._free:
+            alias = self._free.pop()
+        elif len(self._aliases) < self.maximum:
+            alias = len(self._aliases) + 1
+        else:
+            _, alias = self._aliases.popitem(last=False)
+        self._aliases[topic] = alias
+        return topic, alias
+
+    def __len__(self):
+        return len(self._aliases)
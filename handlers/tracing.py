@@ -0,0 +1,115 @@
+"""Per-packet latency tracing through the proxy's pipeline stages."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import threading
+from handlers.histogram import LatencyHistogram, log_bounds
+
+# MQTT -> radio: received from the broker, passed the ingress filters, queued for the radio,
+# taken by the queue worker, written to the radio
+DOWNLINK = "downlink"
+DOWNLINK_STAGES = ("receive", "filter", "enqueue", "dequeue", "write")
+# Radio -> MQTT: received from the radio, passed the uplink checks, handed to the MQTT client
+UPLINK = "uplink"
+UPLINK_STAGES = ("receive", "filter", "publish")
+
+STAGES = {DOWNLINK: DOWNLINK_STAGES, UPLINK: UPLINK_STAGES}
+TOTAL = "total"
+
+# 10 µs to 100 s, 8 buckets per decade (each bucket 1.33x the previous)
+TRACE_BOUNDS = log_bounds(1e-5, 100.0, 8)
+
+
+class Trace:
+    """Monotonic stamps of one packet: when it started and when it crossed the last stage boundary."""
+    __slots__ = ("direction", "start", "last")
+
+    def __init__(self, direction, now):
+        self.direction = direction
+        self.start = now
+        self.last = now
+
+
+class LatencyTracer:
+    """
+    Records, per direction and stage, the time a packet spent since the previous stage
+    boundary, plus the end-to-end time at the last stage.
+
+    The trace of the packet being handled is kept per thread, so the stages along one call
+    chain (paho callback -> ingress -> queue.put, or _handleFromRadio -> publish) can stamp
+    it without threading it through every signature. Where a packet changes threads (the
+    radio queue) the trace travels with it. Memory is fixed: one log-bucket histogram per
+    stage, whatever the traffic.
+    """
+    def __init__(self, enabled=True, bounds=TRACE_BOUNDS):
+        self.enabled = enabled
+        self.histograms = {
+            (direction, stage): LatencyHistogram(bounds)
+            for direction, stages in STAGES.items()
+            for stage in stages[1:] + (TOTAL,)
+        }
+        self._local = threading.local()
+
+    def begin(self, direction):
+        """Start tracing a packet received on this thread (replacing any unfinished trace)."""
+        if not self.enabled:
+            return None
+        trace = Trace(direction, time.monotonic())
+        self._local.trace = trace
+        return trace
+
+    def current(self):
+        """The trace of the packet this thread is handling, if any."""
+        return getattr(self._local, "trace", None)
+
+    def fork(self, trace):
+        """
+        Continue a copy of trace on this thread, for a packet handed to one of several
+        recipients: each then records its own stages and end-to-end time.
+        """
+        copy = Trace(trace.direction, trace.start)
+        copy.last = trace.last
+        self._local.trace = copy
+        return copy
+
+    def end(self):
+        """Forget this thread's trace (the packet was dropped or handed elsewhere)."""
+        self._local.trace = None
+
+    def stamp(self, stage, trace=None, direction=None):
+        """
+        Record that a packet crossed stage: this thread's trace unless one is given, and only
+        if it belongs to direction (when given). The last stage of a direction also records
+        the end-to-end time and ends the trace.
+        """
+        if trace is None:
+            trace = self.current()
+        if trace is None or (direction is not None and trace.direction != direction):
+            return
+        now = time.monotonic()
+        histogram = self.histograms.get((trace.direction, stage))
+        if histogram is None:
+            return
+        histogram.observe(now - trace.last)
+        trace.last = now
+        if stage == STAGES[trace.direction][-1]:
+            self.histograms[(trace.direction, TOTAL)].observe(now - trace.start)
+            if self.current() is trace:
+                self.end()
+
+    def histogram(self, direction, stage):
+        """The histogram for time spent reaching stage (or TOTAL) in direction."""
+        return self.histograms[(direction, stage)]
+
+    def summary(self):
+        """{direction: {stage: LatencyHistogram.summary()}} for stages that have samples."""
+        result = {}
+        for (direction, stage), histogram in self.histograms.items():
+            if histogram.count:
+                result.setdefault(direction, {})[stage] = histogram.summary()
+        return result
+
+
+# Shared by the MQTT handler, message queue and radio interface; enabled by LATENCY_TRACING
+tracer = LatencyTracer(enabled=False)
@@ -0,0 +1,106 @@
+"""Bounded Node->MQTT uplink buffer for MQTT Proxy."""
+# Copyright (c) 2026 LN4CY
+# This software is licensed under the MIT License. See LICENSE file for details.
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+
+logger = logging.getLogger("mqtt-proxy.uplink_buffer")
+
+
+def is_state_topic(topic, retain):
+    """Stat topics and retained messages carry state: only the latest value per topic matters."""
+    return retain or "/2/stat/" in topic
+
+
+class UplinkBuffer:
+    """
+    Holds Node->MQTT messages while the broker is unreachable.
+
+    Mesh traffic goes into a FIFO bounded by entry count and total payload bytes
+    (oldest dropped first) and expires after ttl seconds. Stat and retained messages
+    are kept separately, coalesced to the latest payload per topic and never expire,
+    and are flushed first so the broker state is current before the backlog replays.
+    """
+    def __init__(self, max_entries=1000, max_bytes=1024 * 1024, ttl=300):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = ttl
+        self._messages = deque()  # (timestamp, topic, payload, retain)
+        self._state = OrderedDict()  # topic -> (timestamp, payload, retain)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.buffered = 0
+        self.flushed = 0
+        self.expired = 0
+        self.overflowed = 0
+        self.coalesced = 0
+
+    def put(self, topic, payload, retain, now=None):
+        now = time.time() if now is None else now
+        size = len(payload)
+        with self._lock:
+            self.buffered += 1
+            if is_state_topic(topic, retain):
+                previous = self._state.pop(topic, None)
+                if previous is not None:
+                    self._bytes -= len(previous[1])
+                    self.coalesced += 1
+                self._state[topic] = (now, payload, retain)
+                self._bytes += size
+                return
+            self._messages.append((now, topic, payload, retain))
+            self._bytes += size
+            while self._messages and (len(self._messages) > self.max_entries or self._bytes > self.max_bytes):
+                _, _, dropped, _ = self._messages.popleft()
+                self._bytes -= len(dropped)
+                self.overflowed += 1
+
+    def pop(self, now=None):
+        """Next (topic, payload, retain) to publish, or None when empty. Expired messages are skipped."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._state:
+                topic, (_, payload, retain) = self._state.popitem(last=False)
+                self._bytes -= len(payload)
+                self.flushed += 1
+                return topic, payload, retain
+            while self._messages:
+                timestamp, topic, payload, retain = self._messages.popleft()
+                self._bytes -= len(payload)
+                if now - timestamp > self.ttl:
+                    self.expired += 1
+                    continue
+                self.flushed += 1
+                return topic, payload, retain
+            return None
+
+    def requeue(self, topic, payload, retain, now=None):
+        """Put back a message that could not be flushed, at the front of the queue."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.flushed -= 1
+            if is_state_topic(topic, retain):
+                if topic not in self._state:
+                    self._state[topic] = (now, payload, retain)
+                    self._state.move_to_end(topic, last=False)
+                    self._bytes += len(payload)
+                return
+            self._messages.appendleft((now, topic, payload, retain))
+            self._bytes += len(payload)
+
+    def __len__(self):
+        return len(self._messages) + len(self._state)
+
+    def stats(self):
+        return {
+            "depth": len(self),
+            "bytes": self._bytes,
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "expired": self.expired,
+            "overflowed": self.overflowed,
+            "coalesced": self.coalesced,
+        }
@@ -7,14 +7,29 @@ import signal
 import sys
 import os
 import argparse
+import threading
 from pubsub import pub
 
 from config import cfg
 from version import __version__
 from handlers.mqtt import MQTTHandler
 from handlers.meshtastic import create_interface
-from handlers.node_tracker import PacketDeduplicator
+from handlers.node_tracker import PacketDeduplicator, RFHeardTable, ReachableNodeIndex, InjectedPacketSet
 from handlers.queue import MessageQueue
+from handlers.channels import ChannelIndex
+from handlers.ingress import IngressContext
+from handlers.rules import DownlinkRuleSet, RuleError
+from handlers.rate_limit import SenderRateLimiter
+from handlers.ack_tracker import AckTracker
+from handlers.classify import ChannelKeyCache, PacketClassifier, parse_extra_keys
+from handlers.multi_radio import MultiRadioSupervisor, target_config, target_label
+from handlers.radio_mux import RadioMux
+from handlers.config_cache import ConfigCache
+from handlers.standby import StandbyRadio
+from handlers.mqtt_process import MQTTProcess
+from handlers.async_runtime import AsyncProxyRuntime
+from handlers.metrics import MetricFamily, MetricsServer, deduplicator_metrics, tracer_metrics
+from handlers.tracing import tracer, STAGES, DOWNLINK, UPLINK, TOTAL
 
 # Force unbuffered standard output and utf-8 encoding for real-time logging when run via spawn/exec
 if sys.stdout and not sys.stdout.isatty():
@@ -30,69 +45,153 @@ logging.basicConfig(
 )
 logger = logging.getLogger("mqtt-proxy")
 
+BROADCAST_NUM = 0xFFFFFFFF
+
+def _fmt_seconds(value):
+    return "n/a" if value is None else f"{value:.2f}s"
+
+def _fmt_duration(value):
+    """Like _fmt_seconds, in units that suit sub-millisecond stage latencies."""
+    if value is None:
+        return "n/a"
+    if value < 0.001:
+        return f"{value * 1e6:.0f}µs"
+    if value < 1:
+        return f"{value * 1e3:.1f}ms"
+    return f"{value:.2f}s"
+
 class MQTTProxy:
     """
     Main application class for MQTT Proxy.
     Orchestrates the connection between Meshtastic and MQTT.
     """
-    def __init__(self):
+    def __init__(self, target=None, deduplicator=None, brokers=None):
         self.running = True
         self.iface = None
         self.mqtt_handler = None
+        self.mqtt_node_id = None
+        # Set when running under the asyncio runtime (AsyncProxyRuntime)
+        self.event_loop = None
+        
+        # Multi-radio mode: this proxy serves one of several radio targets, under a supervisor
+        # that shares the deduplicator and broker connections between them
+        self.target = target
+        self.brokers = brokers
+        self.supervised = target is not None
+        self.label = target_label(target) if target is not None else None
+        self.last_healthy = 0
         
         # Initialize Packet Deduplicator (Loop Prevention)
-        self.deduplicator = PacketDeduplicator()
+        self.deduplicator = deduplicator if deduplicator is not None else PacketDeduplicator()
+        
+        # Channel permission lookup table (rebuilt when the node's channel config changes)
+        self.channel_index = ChannelIndex()
+        
+        # Downlink filter rules (optional)
+        self.downlink_rules = self._load_downlink_rules()
+        
+        # Portnum classification (decrypts a copy of the payload), only when something uses it
+        self.classifier = self._build_classifier()
+        
+        # Per-sender downlink rate limiting (optional)
+        self.sender_limiter = None
+        if cfg.downlink_sender_rate > 0:
+            self.sender_limiter = SenderRateLimiter(
+                cfg.downlink_sender_rate,
+                cfg.downlink_sender_burst,
+                max_senders=cfg.downlink_sender_table_size,
+                idle_timeout=cfg.downlink_sender_idle_timeout,
+            )
+        
+        # Senders heard on RF, whose MQTT copies are redundant for our mesh (optional)
+        self.rf_heard = None
+        if cfg.downlink_rf_heard_window > 0:
+            self.rf_heard = RFHeardTable(cfg.downlink_rf_heard_window, max_senders=cfg.rf_heard_table_size)
+        
+        # Destinations reachable through our node, for PKI downlink filtering (optional)
+        self.reachable_nodes = None
+        if cfg.downlink_pki_reachable_only:
+            self.reachable_nodes = ReachableNodeIndex(cfg.pki_reachable_hours)
+        
+        # Packets written to the radio, so their uplink copies are not republished
+        self.injected_packets = None
+        if cfg.uplink_suppress_injected:
+            self.injected_packets = InjectedPacketSet(cfg.injected_packet_ttl)
+        
+        # Correlates our node's uplinked packets with their broker echoes and implicit ACKs
+        self.ack_tracker = None
+        if cfg.ack_track_timeout > 0:
+            self.ack_tracker = AckTracker(cfg.ack_track_timeout)
         
         # Initialize Message Queue
         # We pass a lambda to always get the current interface instance
-        self.message_queue = MessageQueue(cfg, lambda: self.iface)
+        self.message_queue = MessageQueue(cfg, lambda: self.iface, is_rf_bound=self._is_rf_bound,
+                                          injected=self.injected_packets)
+        
+        # Local TCP clients sharing our radio session (optional, single-radio mode only)
+        self.radio_mux = None
+        if cfg.radio_mux_port > 0 and target is None:
+            config_cache = ConfigCache() if cfg.radio_mux_config_cache else None
+            self.radio_mux = RadioMux(cfg.radio_mux_port, self._send_client_to_radio, host=cfg.radio_mux_host,
+                                      queue_size=cfg.radio_mux_queue, max_clients=cfg.radio_mux_max_clients,
+                                      config_cache=config_cache)
+        
+        # MQTT client in a separate process, so MQTT load can't delay radio I/O (optional, single-radio mode only)
+        self.mqtt_process = None
+        if cfg.split_processes and target is None:
+            self.mqtt_process = MQTTProcess(self.on_mqtt_message_to_radio, deduplicator=self.deduplicator,
+                                            ring_bytes=cfg.split_ring_kb * 1024)
+        
+        # Per-stage packet latency (shared by all radios in multi-radio mode)
+        tracer.enabled = cfg.latency_tracing
+        
+        # Prometheus /metrics endpoint (optional; the supervisor serves it in multi-radio mode)
+        self.metrics_server = None
+        if cfg.metrics_port > 0 and target is None:
+            self.metrics_server = MetricsServer(self.collect_metrics, cfg.metrics_port, host=cfg.metrics_host)
+        
+        # Warm standby radio, promoted when the active radio's connection is lost (single-radio mode only)
+        self.standby = None
+        self.active_target = None
+        self.failovers = 0
+        self.last_failover_duration = None
+        if cfg.standby_target and target is None:
+            if cfg.interface_type == "serial":
+                self.active_target = ("serial", cfg.serial_port, None)
+            else:
+                self.active_target = (cfg.interface_type, cfg.tcp_node_host, cfg.tcp_node_port)
+            self.standby = StandbyRadio(cfg.standby_target, self._connect_standby,
+                                        config_timeout=cfg.config_wait_timeout)
         
         # State
         self.last_radio_activity = 0
         self.connection_lost_time = 0
         self.last_probe_time = 0
         self.last_status_log_time = 0
+        self.radio_connects = 0
+        self.downlink_disabled_drops = 0  # MQTT->Node messages on channels with downlink disabled
 
     def start(self):
-        logger.info("🚀 MQTT Proxy v%s starting (interface: %s)...", __version__, cfg.interface_type.upper())
-        if not getattr(cfg, "mesh_allow_pki_uplink", True):
-            logger.info("🛡️ PKI uplink disabled (MESH_ALLOW_PKI_UPLINK=false)")
-
-        # Subscribe to events
-        pub.subscribe(self.on_connection, "meshtastic.connection.established")
-        pub.subscribe(self.on_connection_lost, "meshtastic.connection.lost")
-        
-        # Signal handling
-        signal.signal(signal.SIGINT, self.handle_sigint)
-        signal.signal(signal.SIGTERM, self.handle_sigint)
+        self._start_services()
 
         while self.running:
             self.iface = None
             try:
                 # Create interface (this connects to the radio)
-                self.iface = create_interface(cfg, self)
+                self.iface = create_interface(self._interface_config(), self)
                 logger.info("🔌 TCP/Serial connection initiated...")
                 
                 # Wait for node configuration (connection + config packet)
                 self._wait_for_config()
-                
-                # Initialize MQTT after config is fully loaded
-                self._init_mqtt()
-                
-                logger.info("✅ Node config fully loaded. Proxy active.")
+                self._activate()
                 
                 # Start (or restart) the message queue
                 self.message_queue.start()
                 
                 # Main Loop
-                last_heartbeat = 0
                 while self.running and self.iface:
                     time.sleep(1)
-                    current_time = time.time()
-                    
-                    self._log_status(current_time)
-                    health_ok, reasons = self._perform_health_check(current_time)
-                    self._update_heartbeat(current_time, health_ok, reasons)
+                    self._tick(time.time())
                     
             except Exception as e:
                 logger.error("❌ Connection error: %s", e)
@@ -103,6 +202,117 @@ class MQTTProxy:
                 logger.info("⏳ Reconnecting in 5 seconds...")
                 time.sleep(5)
 
+    def _start_services(self, signals=True):
+        """Start-up shared by the threaded loop and the asyncio runtime, which owns signals itself."""
+        logger.info("🚀 MQTT Proxy v%s starting (interface: %s)...", __version__,
+                    self.label or self._interface_config().interface_type.upper())
+        if not getattr(cfg, "mesh_allow_pki_uplink", True):
+            logger.info("🛡️ PKI uplink disabled (MESH_ALLOW_PKI_UPLINK=false)")
+
+        # Subscribe to events
+        pub.subscribe(self.on_connection, "meshtastic.connection.established")
+        pub.subscribe(self.on_connection_lost, "meshtastic.connection.lost")
+        
+        # The mux outlives radio reconnects, so clients keep their connection to the proxy
+        if self.radio_mux is not None:
+            try:
+                self.radio_mux.start()
+            except OSError as e:
+                logger.error("❌ Radio mux could not listen on port %d: %s", self.radio_mux.port, e)
+                self.radio_mux = None
+        
+        if self.mqtt_process is not None:
+            self.mqtt_process.start()
+        
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                logger.error("❌ Metrics endpoint could not listen on port %d: %s", self.metrics_server.port, e)
+                self.metrics_server = None
+        
+        # Signal handling (the supervisor owns signals in multi-radio mode)
+        if signals and not self.supervised:
+            signal.signal(signal.SIGINT, self.handle_sigint)
+            signal.signal(signal.SIGTERM, self.handle_sigint)
+        
+        if self.standby is not None:
+            self.standby.start()
+
+    def _activate(self):
+        """The radio's config is loaded: refresh what depends on it and bring up MQTT."""
+        self.channel_index.invalidate()
+        if self.reachable_nodes is not None:
+            self.reachable_nodes.sync_nodedb(getattr(self.iface, "nodesByNum", None))
+        
+        # Initialize MQTT after config is fully loaded
+        self._init_mqtt()
+        
+        logger.info("✅ Node config fully loaded. Proxy active.")
+
+    def _tick(self, current_time):
+        """Once-a-second housekeeping while connected: failover, ACK expiry, status log, health check, heartbeat."""
+        if self.standby is not None and self.connection_lost_time > 0:
+            self._failover(current_time)
+        
+        if self.ack_tracker is not None:
+            self.ack_tracker.expire()
+        
+        self._log_status(current_time)
+        health_ok, reasons = self._perform_health_check(current_time)
+        self._update_heartbeat(current_time, health_ok, reasons)
+
+    def _interface_config(self):
+        """Config for the radio this proxy should connect to (its multi-radio target, or the active one)."""
+        target = self.target if self.target is not None else self.active_target
+        return target_config(cfg, target) if target is not None else cfg
+
+    def _connect_standby(self, target):
+        return create_interface(target_config(cfg, target), self, standby=True)
+
+    def _failover(self, current_time):
+        """Switch to the warm standby radio after the active one was lost. Returns True on success."""
+        new_iface = self.standby.promote()
+        if new_iface is None:
+            return False
+        lost_at = self.connection_lost_time
+        old_iface, old_target = self.iface, self.active_target
+        logger.warning("🔀 Radio %s lost, failing over to standby %s", target_label(old_target),
+                       target_label(self.standby.target))
+
+        # Silence the failed interface before anything else can read from it
+        if old_iface is not None:
+            old_iface.standby = True
+        self.iface = new_iface
+        self.active_target = self.standby.target
+        self.connection_lost_time = 0
+        self.last_radio_activity = current_time
+        self.last_probe_time = 0
+        self.channel_index.invalidate()
+        if self.classifier is not None:
+            self.classifier.key_cache.invalidate()
+        if self.reachable_nodes is not None:
+            self.reachable_nodes.sync_nodedb(getattr(new_iface, "nodesByNum", None))
+        self._init_mqtt()
+
+        # The failed radio becomes the standby once it is back
+        self.standby.retarget(old_target)
+        if old_iface is not None:
+            threading.Thread(target=self._close_quietly, args=(old_iface,), daemon=True).start()
+
+        self.failovers += 1
+        self.last_failover_duration = time.time() - lost_at
+        logger.info("✅ Failover complete in %.1fs, active radio %s", self.last_failover_duration,
+                    target_label(self.active_target))
+        return True
+
+    @staticmethod
+    def _close_quietly(iface):
+        try:
+            iface.close()
+        except Exception:
+            pass
+
     def _wait_for_config(self):
         """Wait for the node to provide its configuration."""
         wait_start = time.time()
@@ -116,8 +326,23 @@ class MQTTProxy:
             
             time.sleep(cfg.poll_interval)
 
+    def _is_other_radio(self, interface):
+        """
+        Connection events of interfaces that aren't our active radio are ignored: the warm
+        standby, a radio we just failed over from, and other nodes in multi-radio mode.
+        """
+        if interface is None:
+            return False
+        if getattr(interface, "standby", False) is True:
+            return True
+        if self.standby is not None and self.iface is not None and interface is not self.iface:
+            return True
+        return self.supervised and getattr(interface, "proxy", self) is not self
+
     def on_connection(self, interface, **kwargs):
         """Callback when Meshtastic connection is established."""
+        if self._is_other_radio(interface):
+            return
         node = interface.localNode
         if not node:
             logger.warning("⚠️ No localNode available")
@@ -125,6 +350,7 @@ class MQTTProxy:
 
         self.last_radio_activity = time.time()
         self.connection_lost_time = 0
+        self.radio_connects += 1
 
         # Node ID
         try:
@@ -158,20 +384,41 @@ class MQTTProxy:
         # Cleanup existing handler if any
         if self.mqtt_handler:
             logger.info("🛑 Stopping old MQTT handler before restart...")
-            self.mqtt_handler.stop()
+            self._release_mqtt()
             self.mqtt_handler = None
 
         # Initialize MQTT if config exists
         if node.moduleConfig and node.moduleConfig.mqtt:
             logger.info("🌐 Initializing MQTT Handler for node !%s...", node_id)
-            self.mqtt_handler = MQTTHandler(cfg, node_id, self.on_mqtt_message_to_radio, deduplicator=self.deduplicator)
+            self.mqtt_node_id = node_id
+            if self.brokers is not None:
+                self.mqtt_handler = self.brokers.attach(node_id, node.moduleConfig.mqtt, self.on_mqtt_message_to_radio,
+                                                        self._downlink_channel_names)
+                return
+            if self.mqtt_process is not None:
+                self.mqtt_handler = self.mqtt_process.handler_for(node_id, self._downlink_channel_names)
+            else:
+                self.mqtt_handler = MQTTHandler(cfg, node_id, self.on_mqtt_message_to_radio, deduplicator=self.deduplicator,
+                                                channel_provider=self._downlink_channel_names)
+                self.mqtt_handler.event_loop = self.event_loop
             self.mqtt_handler.configure(node.moduleConfig.mqtt)
             self.mqtt_handler.start()
         else:
             logger.warning("⚠️ No MQTT configuration found on node !%s!", node_id)
 
+    def _release_mqtt(self):
+        """Stop our MQTT handler, or detach from the shared connection in multi-radio mode."""
+        if self.brokers is not None:
+            # Detaching twice would drop the node's presence from a connection it re-joined
+            self.brokers.detach(self.mqtt_handler, self.mqtt_node_id)
+            self.mqtt_handler = None
+        else:
+            self.mqtt_handler.stop()
+
     def on_connection_lost(self, interface, **kwargs):
         """Callback when connection to radio is lost."""
+        if self._is_other_radio(interface):
+            return
         if self.connection_lost_time > 0 and (time.time() - self.connection_lost_time < 2):
             return # Debounce
 
@@ -182,19 +429,119 @@ class MQTTProxy:
 
     def on_mqtt_message_to_radio(self, topic, payload, retained):
         """Callback from MQTT Handler to send message to Radio."""
+        # Packet fields are decoded lazily, once, by whichever check needs them first
+        ctx = IngressContext(topic, payload, retained, classifier=self.classifier)
+        
+        # Broker echo of our own uplink: the packet made it through the broker
+        if self.ack_tracker is not None and self._is_own_echo(ctx):
+            self.ack_tracker.on_echo(ctx.packet_id)
+        
         # 1. Extract channel name from topic
         channel_name = self._extract_channel_from_topic(topic)
         
         # 2. Check if downlink is enabled for this channel
         if channel_name:
             if not self._is_channel_downlink_enabled(channel_name):
+                self.downlink_disabled_drops += 1
                 logger.info("🛡️ Dropping MQTT->Node message (downlink_enabled=False for channel '%s'): %s", 
                             channel_name, topic)
                 return
         
+        # 3. Declarative downlink rules
+        if self.downlink_rules:
+            rule = self.downlink_rules.evaluate(ctx)
+            if rule is not None:
+                logger.info("🛡️ Dropping MQTT->Node message (rule '%s'): %s", rule.name, topic)
+                return
+        
+        # 4. PKI direct messages for nodes that can't be reached through our node
+        if self.reachable_nodes is not None and channel_name and channel_name.lower() == "pki":
+            dest = ctx.dest
+            if dest and dest != BROADCAST_NUM and dest != self._local_node_num() and dest not in self.reachable_nodes:
+                self.reachable_nodes.dropped += 1
+                logger.debug("🛡️ Dropping MQTT->Node PKI message (destination !%08x not reachable): %s", dest, topic)
+                return
+        
+        # 5. Senders our node hears on RF (broker echoes of our own uplinks still pass for implicit ACKs)
+        if self.rf_heard is not None and self.rf_heard.heard_recently(ctx.sender):
+            if not self._is_own_echo(ctx):
+                self.rf_heard.suppressed += 1
+                logger.debug("🛡️ Dropping MQTT->Node message (sender !%08x heard on RF): %s", ctx.sender, topic)
+                return
+        
+        # 6. Per-sender rate limit (never throttle our own node, its echoes drive implicit ACKs)
+        if self.sender_limiter is not None:
+            sender = ctx.sender
+            if sender and sender != self._local_node_num() and not self.sender_limiter.allow(sender):
+                logger.debug("🛡️ Dropping MQTT->Node message (sender !%08x over rate limit): %s", sender, topic)
+                return
+        
         # Queue the message instead of sending directly
         self.message_queue.put(topic, payload, retained)
 
+    def _send_client_to_radio(self, to_radio, client):
+        """Write a radio mux client's ToRadio message through the interface's send path."""
+        iface = self.iface
+        if not iface:
+            logger.debug("📻 No radio connected, dropping ToRadio from mux client %s", client.address)
+            return
+        try:
+            iface._sendToRadio(to_radio)
+        except Exception as e:
+            logger.warning("⚠️ Failed to forward ToRadio from mux client %s: %s", client.address, e)
+
+    def _is_own_echo(self, ctx):
+        """True if ctx is the broker echo of a message our own node published."""
+        envelope = ctx.envelope
+        local = self._local_node_num()
+        return envelope is not None and local is not None and envelope.gateway_id == f"!{local:08x}"
+
+    def _is_rf_bound(self, topic):
+        """
+        Whether the node will transmit a downlinked message on air. Virtual/unconfigured channels
+        can't be decrypted by the node, so they only reach connected clients and cost no airtime.
+        """
+        channel_name = self._extract_channel_from_topic(topic)
+        if not channel_name or channel_name.lower() == "pki":
+            return True
+        if not self.iface or not self.iface.localNode:
+            return True
+        return self._lookup_channel(channel_name) is not None
+
+    def _local_node_num(self):
+        """Return the connected node's number, or None."""
+        if self.iface and self.iface.localNode:
+            num = getattr(self.iface.localNode, "nodeNum", None)
+            if isinstance(num, int) and num != -1:
+                return num
+        return None
+
+    def _load_downlink_rules(self):
+        """Load the downlink rules file, if configured. Invalid files are logged and ignored."""
+        path = cfg.downlink_rules_file
+        if not path:
+            return None
+        try:
+            rules = DownlinkRuleSet.load(path, shadow=cfg.downlink_rules_shadow)
+        except RuleError as e:
+            logger.error("❌ Downlink rules disabled: %s", e)
+            return None
+        logger.info("📜 Loaded %d downlink rules from %s%s", len(rules.rules), path,
+                    " (shadow mode)" if rules.shadow else "")
+        return rules
+
+    def _build_classifier(self):
+        """Create the packet classifier if any downlink rule matches on portnum."""
+        if not (self.downlink_rules and self.downlink_rules.needs_portnum):
+            return None
+        key_cache = ChannelKeyCache(parse_extra_keys(cfg.classify_channel_keys))
+        return PacketClassifier(key_cache, self._node_channels)
+
+    def _node_channels(self):
+        if self.iface and self.iface.localNode:
+            return self.iface.localNode.channels
+        return None
+
     def _extract_channel_from_topic(self, topic):
         """
         Extract the channel name from a Meshtastic MQTT topic.
@@ -210,31 +557,42 @@ class MQTTProxy:
             pass
         return None
 
+    def on_channel_config_changed(self, resubscribe=True):
+        """
+        Called when the node's channel configuration may have changed (admin responses, config stream).
+        Subscriptions are only re-planned with resubscribe, i.e. not for each channel slot of the stream.
+        """
+        self.channel_index.invalidate()
+        if self.classifier is not None:
+            self.classifier.key_cache.invalidate()
+        if resubscribe and self.mqtt_handler:
+            self.mqtt_handler.replan()
+
+    def on_local_telemetry(self, channel_utilization, air_util_tx):
+        """Called with the connected node's own channel utilization / air_util_tx telemetry."""
+        if self.message_queue:
+            self.message_queue.update_congestion(channel_utilization, air_util_tx)
+
+    def _downlink_channel_names(self):
+        """Return the names of downlink-enabled channels on the node, or None if not connected."""
+        if not self.iface or not self.iface.localNode:
+            return None
+        table = self.channel_index.get_table(self.iface.localNode.channels)
+        return [entry.name for entry in sorted(table.values(), key=lambda e: e.index) if entry.downlink]
+
+    def _lookup_channel(self, channel_name):
+        """Return the ChannelEntry for a channel name on the connected node, or None."""
+        return self.channel_index.lookup(self.iface.localNode.channels, channel_name)
+
     def _is_channel_downlink_enabled(self, channel_name):
         """Check if a specific channel has downlink enabled."""
         if not self.iface or not self.iface.localNode:
             return True # Conservative default
             
         # Case-insensitive comparison because MQTT topics might vary
-        search_name = channel_name.lower()
-        
-        for i, ch in enumerate(self.iface.localNode.channels):
-            if ch.role == 0: # DISABLED
-                continue
-                
-            # Determine channel name
-            ch_name = ch.settings.name
-            if not ch_name:
-                if i == 0:
-                    ch_name = "LongFast"
-                else:
-                    ch_name = f"CH{i}"
-            
-            if ch_name.lower() == search_name:
-                # We found the channel, check its settings
-                # Note: Meshtastic protobuf might use default values if field is not present
-                enabled = getattr(ch.settings, "downlink_enabled", True)
-                return enabled
+        entry = self._lookup_channel(channel_name)
+        if entry is not None:
+            return entry.downlink
                 
         # Virtual Channel Pass-Through:
         # If the channel is not defined on the physical radio, we still
@@ -263,16 +621,9 @@ class MQTTProxy:
         if search_name == "pki":
             return getattr(cfg, "mesh_allow_pki_uplink", True)
 
-        for i, ch in enumerate(self.iface.localNode.channels):
-            if ch.role == 0: continue
-            
-            ch_name = ch.settings.name
-            if not ch_name:
-                ch_name = "LongFast" if i == 0 else f"CH{i}"
-                
-            if ch_name.lower() == search_name:
-                enabled = getattr(ch.settings, "uplink_enabled", True)
-                return enabled
+        entry = self._lookup_channel(search_name)
+        if entry is not None:
+            return entry.uplink
                 
         # CRITICAL LOOP PREVENTION: If the channel is unknown (like a Virtual Channel
         # e.g., US-LongFast), we MUST NOT publish it back to MQTT!
@@ -340,13 +691,208 @@ class MQTTProxy:
                 if isinstance(mqtt_active, (int, float)) and mqtt_active > 0:
                     time_since_mqtt = current_time - mqtt_active
             
-            logger.info("📊 === MQTT Proxy Status ===")
+            logger.info("📊 === MQTT Proxy Status%s ===", f" ({self.label})" if self.label else "")
             logger.info("  MQTT Connected: %s", mqtt_connected)
             logger.info("  Radio Activity: %s ago", f"{int(time_since_radio)}s" if time_since_radio >= 0 else "never")
             logger.info("  MQTT Activity:  %s ago", f"{int(time_since_mqtt)}s" if time_since_mqtt >= 0 else "never")
+            publish_stats = self.mqtt_handler.publish_stats() if self.mqtt_handler else None
+            if isinstance(publish_stats, dict) and publish_stats["completed"]:
+                latency = publish_stats["latency"]
+                logger.info("  MQTT Publish:   QoS %d, %d in flight, %d completed, latency p50 %s p95 %s max %s%s",
+                            publish_stats["qos"], publish_stats["inflight"], publish_stats["completed"],
+                            _fmt_seconds(latency["p50"]), _fmt_seconds(latency["p95"]), _fmt_seconds(latency["max"]),
+                            f", topic aliases saved {publish_stats['alias_bytes_saved']} bytes"
+                            if publish_stats["alias_hits"] else "")
+            broker_stats = self.mqtt_handler.broker_stats() if self.mqtt_handler else None
+            for broker in broker_stats if isinstance(broker_stats, list) else []:
+                idle = current_time - broker["last_activity"] if broker["last_activity"] else -1
+                logger.info("  Extra Broker:   %s (%s) connected=%s, %d received, %d reconnects, active %s ago",
+                            broker["url"], ", ".join(broker["roots"]), broker["connected"], broker["rx"],
+                            broker["reconnects"], f"{int(idle)}s" if idle >= 0 else "never")
+            uplink_buffer = getattr(self.mqtt_handler, 'uplink_buffer', None) if self.mqtt_handler else None
+            if uplink_buffer is not None and hasattr(uplink_buffer, 'stats'):
+                buffered = uplink_buffer.stats()
+                if isinstance(buffered, dict) and (buffered["depth"] or buffered["buffered"]):
+                    logger.info("  Uplink Buffer:  %d pending (%d bytes), %d flushed, %d expired, %d overflowed",
+                                buffered["depth"], buffered["bytes"], buffered["flushed"],
+                                buffered["expired"], buffered["overflowed"])
+            airtime = self.message_queue.airtime_stats() if self.message_queue else None
+            if isinstance(airtime, dict):
+                logger.info("  Duty Cycle:     %.1fs used, %.1fs remaining of %.0fs per %ds (last frame %.3fs)",
+                            airtime["used"], airtime["remaining"], airtime["budget"], airtime["window"],
+                            airtime["last_airtime"])
+            congestion = self.message_queue.congestion_stats() if self.message_queue else None
+            if isinstance(congestion, dict):
+                logger.info("  Congestion:     channel util %s, air util tx %s, pacing factor %.2f",
+                            "n/a" if congestion["channel_utilization"] is None else f"{congestion['channel_utilization']:.1f}%",
+                            "n/a" if congestion["air_util_tx"] is None else f"{congestion['air_util_tx']:.1f}%",
+                            congestion["factor"])
+            if self.ack_tracker is not None:
+                acks = self.ack_tracker.stats()
+                if acks["tracked"]:
+                    rate = acks["success_rate"]
+                    ack_lat = acks["ack_latency"]
+                    echo_lat = acks["echo_latency"]
+                    logger.info("  Implicit ACKs:  %d/%d acked (%s), %d pending, RTT p50 %s p95 %s; echo p50 %s",
+                                acks["acked"], acks["acked"] + acks["expired"],
+                                "n/a" if rate is None else f"{rate * 100:.1f}%", acks["outstanding"],
+                                _fmt_seconds(ack_lat["p50"]), _fmt_seconds(ack_lat["p95"]),
+                                _fmt_seconds(echo_lat["p50"]))
+            if self.downlink_rules:
+                logger.info("  Downlink Rules: %s%s", ", ".join(
+                    f"{name}={count}" for name, count in self.downlink_rules.stats().items()),
+                    " (shadow)" if self.downlink_rules.shadow else "")
+            if self.standby is not None:
+                standby = self.standby.stats()
+                logger.info("  Radio Failover: active %s, standby %s (%s), %d failovers%s",
+                            target_label(self.active_target), standby["target"],
+                            "ready" if standby["ready"] else "not ready", self.failovers,
+                            "" if self.last_failover_duration is None
+                            else f", last took {self.last_failover_duration:.1f}s")
+            if self.mqtt_process is not None:
+                proc = self.mqtt_process.stats()
+                logger.info("  MQTT Process:   pid %s (%s), %d restarts, %d frames sent (%d dropped), %d downlinks received",
+                            proc["pid"], "running" if proc["alive"] else "not running", proc["restarts"],
+                            proc["sent"], proc["dropped"], proc["received"])
+            if self.radio_mux is not None:
+                mux = self.radio_mux.stats()
+                logger.info("  Radio Mux:      %d clients (%d accepted), %d frames, %d slow clients dropped",
+                            mux["clients"], mux["accepted"], mux["frames"], mux["dropped_clients"])
+                if self.radio_mux.config_cache is not None:
+                    cache = self.radio_mux.config_cache.stats()
+                    logger.info("  Config Cache:   %s, %d nodes, %d served from cache, %d forwarded, %d invalidations",
+                                "valid" if cache["valid"] else "not built", cache["nodes"], cache["hits"],
+                                cache["misses"], cache["invalidations"])
+            if self.rf_heard is not None:
+                logger.info("  RF Heard:       %d senders, %d MQTT copies suppressed",
+                            len(self.rf_heard), self.rf_heard.suppressed)
+            if self.classifier is not None:
+                classify = self.classifier.stats()
+                logger.info("  Classifier:     %d classified, %d unknown%s", classify["classified"], classify["unknown"],
+                            "" if classify["us_per_packet"] is None else f", {classify['us_per_packet']:.0f}µs/packet")
+            if self.reachable_nodes is not None:
+                logger.info("  PKI Reachable:  %d nodes, %d PKI messages dropped",
+                            len(self.reachable_nodes), self.reachable_nodes.dropped)
+            if self.injected_packets is not None and self.injected_packets.suppressed:
+                logger.info("  Uplink Loops:   %d injected packets not republished", self.injected_packets.suppressed)
+            if self.sender_limiter is not None:
+                top = self.sender_limiter.top_throttled()
+                logger.info("  Rate Limited:   %d packets from %d tracked senders%s", self.sender_limiter.throttled,
+                            len(self.sender_limiter),
+                            (" (top: " + ", ".join(f"!{s:08x}={n}" for s, n in top) + ")") if top else "")
+            if self.mqtt_handler and getattr(self.mqtt_handler, 'ingress', None):
+                stages = self.mqtt_handler.ingress.stats()
+                if isinstance(stages, list) and stages:
+                    logger.info("  Ingress Drops:  %s", ", ".join(
+                        f"{st['name']}={st['drops']}/{st['hits']} ({st['time_ms']:.1f}ms)" for st in stages))
+            latency = self.latency_stats()
+            for direction, label in ((DOWNLINK, "Latency Down:   "), (UPLINK, "Latency Up:     ")):
+                stages = latency.get(direction)
+                if stages:
+                    logger.info("  %s%s", label, ", ".join(
+                        f"{stage} p50 {_fmt_duration(st['p50'])} p99 {_fmt_duration(st['p99'])}"
+                        for stage, st in stages.items()))
+            pool = getattr(self.mqtt_handler, 'ingress_pool', None) if self.mqtt_handler else None
+            if pool is not None and pool.running:
+                pool_stats = pool.stats()
+                logger.info("  Ingress Pool:   %d workers, %d messages in %d batches, %d passed, %d checked in-process%s",
+                            pool_stats["workers"], pool_stats["messages"], pool_stats["batches"],
+                            pool_stats["passed"], pool_stats["overflow"],
+                            "".join(f", {name}={count}" for name, count in sorted(pool_stats["drops"].items())))
             self.last_status_log_time = current_time
 
+    def latency_stats(self):
+        """
+        Per-stage latency percentiles: {direction: {stage: summary}}, stages in pipeline order
+        and each measured from the previous stage boundary, then "total" end to end.
+        """
+        summary = tracer.summary()
+        return {direction: {stage: summary[direction][stage]
+                            for stage in STAGES[direction][1:] + (TOTAL,) if stage in summary[direction]}
+                for direction in STAGES if direction in summary}
+
+    def collect_metrics(self):
+        """
+        Metric families for the /metrics endpoint, read from the counters the pipeline
+        keeps anyway. Runs on the scrape only.
+        """
+        handler = self.mqtt_handler
+        radio_connected = self.iface is not None and self.radio_connects > 0 and self.connection_lost_time == 0
+        families = [
+            MetricFamily("radio_connected", "gauge", "1 while the radio connection is up.").add(radio_connected),
+            MetricFamily("radio_reconnects_total", "counter", "Radio connections after the first.")
+                .add(max(0, self.radio_connects - 1)),
+            MetricFamily("radio_failovers_total", "counter", "Failovers to the standby radio.").add(self.failovers),
+            MetricFamily("mqtt_connected", "gauge", "1 while the MQTT connection is up.")
+                .add(getattr(handler, "connected", False) is True),
+        ]
+        if handler is not None:
+            families += [
+                MetricFamily("mqtt_reconnects_total", "counter", "MQTT connections after the first.")
+                    .add(getattr(handler, "reconnects", None)),
+                MetricFamily("mqtt_rx_total", "counter", "Messages received from the broker.")
+                    .add(getattr(handler, "rx_count", None)),
+                MetricFamily("mqtt_tx_total", "counter", "Messages published to the broker.")
+                    .add(getattr(handler, "tx_count", None)),
+                MetricFamily("mqtt_tx_failures", "gauge", "Consecutive failed publishes.")
+                    .add(getattr(handler, "tx_failures", None)),
+            ]
+            publish_latency = getattr(handler, "publish_latency", None)
+            if hasattr(publish_latency, "buckets"):
+                families.append(MetricFamily("mqtt_publish_seconds", "histogram",
+                                             "Time from publish to broker acknowledgement.").add(publish_latency))
+
+        drops = MetricFamily("ingress_dropped_total", "counter", "MQTT messages dropped, by filter.")
+        checked = MetricFamily("ingress_checked_total", "counter", "MQTT messages checked, by filter.")
+        ingress = getattr(handler, "ingress", None)
+        stages = ingress.stats() if ingress is not None else None
+        pool = getattr(handler, "ingress_pool", None)
+        pool_drops = pool.stats()["drops"] if pool is not None and pool.running else {}
+        for stage in stages if isinstance(stages, list) else []:
+            drops.add(stage["drops"] + pool_drops.get(stage["name"], 0), stage=stage["name"])
+            checked.add(stage["hits"], stage=stage["name"])
+        families += [drops, checked]
+
+        downlink = MetricFamily("downlink_dropped_total", "counter", "Downlinked messages dropped, by reason.")
+        downlink.add(self.downlink_disabled_drops, reason="channel_disabled")
+        if self.downlink_rules:
+            downlink.add(self.downlink_rules.dropped, reason="rule")
+        if self.reachable_nodes is not None:
+            downlink.add(self.reachable_nodes.dropped, reason="pki_unreachable")
+        if self.rf_heard is not None:
+            downlink.add(self.rf_heard.suppressed, reason="rf_heard")
+        if self.sender_limiter is not None:
+            downlink.add(self.sender_limiter.throttled, reason="rate_limit")
+        if self.injected_packets is not None:
+            downlink.add(self.injected_packets.suppressed, reason="injected_echo")
+        families.append(downlink)
+
+        if self.message_queue is not None:
+            queue = self.message_queue.stats()
+            families += [
+                MetricFamily("queue_depth", "gauge", "Messages waiting to be sent to the radio.").add(queue["depth"]),
+                MetricFamily("queue_capacity", "gauge", "Radio queue size limit.").add(queue["capacity"]),
+                MetricFamily("queue_sent_total", "counter", "Messages written to the radio.").add(queue["sent"]),
+                MetricFamily("queue_evictions_total", "counter", "Messages evicted from a full queue.")
+                    .add(queue["evictions"]),
+                MetricFamily("queue_wait_seconds", "histogram", "Time messages waited in the queue.").add(queue["wait"]),
+            ]
+
+        # Shared between radios in multi-radio mode, where the supervisor reports them once
+        if not self.supervised:
+            if self.deduplicator is not None:
+                families += deduplicator_metrics(self.deduplicator)
+            families += tracer_metrics(tracer)
+        return families
+
     def _update_heartbeat(self, current_time, health_ok, reasons):
+        if self.supervised:
+            # The supervisor writes the heartbeat; exiting here only restarts this node
+            if health_ok:
+                self.last_healthy = current_time
+                return
+            logger.error("❌ Health check FAILED (%s): %s. Restarting node...", self.label, ", ".join(reasons))
+            sys.exit(1)
         try:
             if health_ok:
                 with open("/tmp/healthy", "w") as f:
@@ -361,7 +907,7 @@ class MQTTProxy:
 
     def _cleanup(self):
         if self.mqtt_handler:
-            self.mqtt_handler.stop()
+            self._release_mqtt()
         if self.iface:
             try:
                 self.iface.close()
@@ -373,6 +919,14 @@ class MQTTProxy:
         logger.info("🛑 Received Ctrl+C, shutting down...")
         self.running = False
         self._cleanup()
+        if self.radio_mux is not None:
+            self.radio_mux.stop()
+        if self.standby is not None:
+            self.standby.stop()
+        if self.mqtt_process is not None:
+            self.mqtt_process.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
 
 if __name__ == "__main__":
     # If the user explicitly asks for help on the main script, show full usage
@@ -387,5 +941,10 @@ if __name__ == "__main__":
     # We don't need to save the args here, config.py already parsed them using parse_known_args
     parser.parse_known_args()
 
-    app = MQTTProxy()
-    app.start()
+    if cfg.radio_targets:
+        MultiRadioSupervisor(cfg, cfg.radio_targets, MQTTProxy).start()
+    elif cfg.async_runtime:
+        AsyncProxyRuntime(MQTTProxy()).run()
+    else:
+        app = MQTTProxy()
+        app.start()
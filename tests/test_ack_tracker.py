@@ -0,0 +1,148 @@
+"""Test implicit ACK correlation and latency histograms."""
+import os
+import gc
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.ack_tracker import AckTracker
+from handlers.histogram import LatencyHistogram
+from handlers.meshtastic import MQTTProxyMixin
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import mqtt_pb2, portnums_pb2
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def test_histogram_percentiles():
+    hist = LatencyHistogram(bounds=(1.0, 2.0, 4.0))
+    assert hist.percentile(50) is None
+    for value in (0.5, 0.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.count == 4
+    assert 0.0 < hist.percentile(50) <= 1.0
+    assert 2.0 < hist.percentile(99) <= 3.0
+    assert hist.buckets() == [(1.0, 2), (2.0, 3), (4.0, 4), (float("inf"), 4)]
+
+    # Samples from other threads land in their own buckets and are summed when read
+    workers = [threading.Thread(target=lambda: [hist.observe(1.5) for _ in range(1000)]) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert hist.count == 4004
+    assert hist.buckets()[1] == (2.0, 4003)
+    assert hist.max == 3.0 and abs(hist.sum - 6005.5) < 1e-6
+    # Exited threads' counts are folded into the base: only this thread keeps a shard
+    gc.collect()
+    assert len(hist._shards) == 1 and hist.count == 4004
+
+
+def test_tracker_ack_echo_and_expiry():
+    tracker = AckTracker(timeout=10)
+    tracker.track(1, now=0.0)
+    tracker.track(2, now=0.0)
+    tracker.on_echo(1, now=0.2)
+    assert tracker.on_ack(1, now=1.5) == 1.5
+    assert tracker.on_ack(1, now=2.0) is None  # Already resolved
+    assert tracker.on_ack(99, now=2.0) is None  # Not ours
+
+    tracker.expire(now=11.0)
+    stats = tracker.stats()
+    assert stats["acked"] == 1 and stats["expired"] == 1 and stats["echoed"] == 1
+    assert stats["success_rate"] == 0.5
+    assert stats["outstanding"] == 0
+    assert abs(stats["echo_latency"]["max"] - 0.2) < 1e-9
+
+
+def test_tracker_is_bounded():
+    tracker = AckTracker(timeout=60, max_entries=2)
+    for packet_id in (1, 2, 3):
+        tracker.track(packet_id, now=0.0)
+    assert len(tracker) == 2
+    assert tracker.expired == 1
+
+
+class _Parent:
+    def _handleFromRadio(self, fr):
+        pass
+
+
+class _Mixin(MQTTProxyMixin, _Parent):
+    def __init__(self, proxy, my_node):
+        self.proxy = proxy
+        self.myNodeNum = my_node
+
+
+def _envelope(sender, packet_id, gateway="!00001111", want_ack=False):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = packet_id
+    envelope.packet.want_ack = want_ack
+    envelope.packet.encrypted = b"\x01\x02"
+    envelope.gateway_id = gateway
+    return envelope.SerializeToString()
+
+
+def test_mixin_tracks_own_uplinks_and_resolves_implicit_acks():
+    proxy = MagicMock()
+    proxy.ack_tracker = AckTracker()
+    proxy.injected_packets = None
+    mixin = _Mixin(proxy, 0x1111)
+
+    for sender, packet_id, want_ack in ((0x1111, 500, True), (0x1111, 502, False), (0x2222, 501, True)):
+        fr = mesh_pb2.FromRadio()
+        fr.mqttClientProxyMessage.topic = "msh/2/e/LongFast/!00001111"
+        fr.mqttClientProxyMessage.data = _envelope(sender, packet_id, want_ack=want_ack)
+        mixin._handleFromRadio(fr)
+    # Only our own node's packet that asked for an ACK (no ACK ever comes for the others)
+    assert proxy.ack_tracker.tracked == 1
+
+    # The node reports the implicit ACK for its own packet as coming from itself
+    ack = mesh_pb2.FromRadio()
+    setattr(ack.packet, "from", 0x1111)
+    ack.packet.decoded.portnum = portnums_pb2.ROUTING_APP
+    ack.packet.decoded.request_id = 500
+    ack.packet.decoded.payload = mesh_pb2.Routing(error_reason=mesh_pb2.Routing.Error.NONE).SerializeToString()
+    with patch('pubsub.pub.sendMessage') as send:
+        mixin._handleFromRadio(ack)
+    assert proxy.ack_tracker.acked == 1
+    assert proxy.ack_tracker.ack_latency.count == 1
+    # Still not republished as a library ACK event
+    assert not any(c.args and c.args[0] == "meshtastic.ack" for c in send.call_args_list)
+
+
+def test_proxy_records_broker_echo():
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    proxy.ack_tracker = AckTracker()
+    proxy.ack_tracker.track(500)
+    proxy.iface = MagicMock()
+    proxy.iface.localNode.channels = []
+    proxy.iface.localNode.nodeNum = 0x1111
+
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!00001111", _envelope(0x1111, 500), False)
+    assert proxy.ack_tracker.echoed == 1
+    proxy.message_queue.put.assert_called_once()
+
+
+def test_proxy_expires_acks_on_tick():
+    proxy = MQTTProxy()
+    proxy.ack_tracker = MagicMock()
+    with patch.object(proxy, "_log_status") as log_status, \
+         patch.object(proxy, "_perform_health_check", return_value=(True, [])), \
+         patch.object(proxy, "_update_heartbeat"):
+        proxy._tick(100.0)
+    proxy.ack_tracker.expire.assert_called_once_with()
+    log_status.assert_called_once_with(100.0)
@@ -0,0 +1,96 @@
+"""Test LoRa airtime estimation and the duty-cycle budget."""
+import os
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg
+from handlers.airtime import (DutyCycleBudget, estimate_airtime, frame_bytes, lora_params,
+                              MODEM_PRESETS, MESH_HEADER_BYTES)
+from handlers.queue import MessageQueue
+from meshtastic.protobuf import config_pb2, mqtt_pb2
+
+
+def test_airtime_grows_with_spreading_factor_and_size():
+    long_fast = estimate_airtime(50, *MODEM_PRESETS[0])
+    short_fast = estimate_airtime(50, *MODEM_PRESETS[6])
+    long_slow = estimate_airtime(50, *MODEM_PRESETS[1])
+    assert short_fast < long_fast < long_slow
+    assert estimate_airtime(200, *MODEM_PRESETS[0]) > long_fast
+    # LongFast, ~50 byte frame is a bit over half a second on air
+    assert 0.5 < long_fast < 0.8
+
+
+def test_lora_params_from_config():
+    lora = config_pb2.Config.LoRaConfig()
+    lora.use_preset = True
+    lora.modem_preset = config_pb2.Config.LoRaConfig.ModemPreset.SHORT_FAST
+    assert lora_params(lora) == (7, 250.0, 5)
+
+    lora.use_preset = False
+    lora.spread_factor = 10
+    lora.bandwidth = 62
+    lora.coding_rate = 6
+    assert lora_params(lora) == (10, 62.5, 6)
+
+    lora.spread_factor = 0  # Incomplete custom settings fall back to LongFast
+    assert lora_params(lora) == MODEM_PRESETS[0]
+    assert lora_params(None) == MODEM_PRESETS[0]
+
+
+def test_frame_bytes_uses_encrypted_payload():
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.channel_id = "LongFast"
+    envelope.gateway_id = "!12345678"
+    envelope.packet.encrypted = b"x" * 30
+    assert frame_bytes(envelope.SerializeToString()) == MESH_HEADER_BYTES + 30
+
+
+def test_budget_sliding_window():
+    budget = DutyCycleBudget(limit_percent=10, window_seconds=100)  # 10 s per 100 s
+    assert budget.wait_time(4.0, now=0.0) == 0.0
+    budget.record(4.0, now=0.0)
+    budget.record(4.0, now=10.0)
+    assert budget.remaining(now=10.0) == pytest.approx(2.0)
+    # 3 s more needs the first send to age out at t=100
+    assert budget.wait_time(3.0, now=20.0) == pytest.approx(80.0)
+    assert budget.wait_time(2.0, now=20.0) == 0.0
+    assert budget.remaining(now=100.0) == pytest.approx(6.0)
+
+
+class BudgetConfig:
+    mesh_transmit_delay = 0.0
+
+
+def test_queue_holds_messages_over_budget(monkeypatch):
+    monkeypatch.setattr(cfg, "mesh_duty_cycle_percent", 50.0)
+    monkeypatch.setattr(cfg, "mesh_duty_cycle_window", 1)
+    iface = MagicMock()
+    iface.localNode.localConfig.lora = config_pb2.Config.LoRaConfig()  # LongFast, ~0.3-0.6 s per frame
+    q = MessageQueue(BudgetConfig(), lambda: iface)
+    q.start()
+    try:
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.encrypted = b"x" * 30
+        payload = envelope.SerializeToString()
+        q.put("msh/2/e/LongFast/!a", payload, False)
+        q.put("msh/2/e/LongFast/!a", payload, False)
+        time.sleep(0.3)
+        # Budget is 0.5 s per 1 s window: only one frame fits right away
+        assert iface._sendToRadio.call_count == 1
+        stats = q.airtime_stats()
+        assert stats["last_airtime"] > 0.3
+        assert stats["remaining"] < 0.5
+    finally:
+        q.stop()
+
+
+def test_queue_skips_airtime_for_virtual_channels():
+    iface = MagicMock()
+    iface.localNode.localConfig.lora = config_pb2.Config.LoRaConfig()
+    q = MessageQueue(BudgetConfig(), lambda: iface, is_rf_bound=lambda topic: "OH-" not in topic)
+    item = {"topic": "msh/US/OH/2/e/OH-LongFast/!a", "payload": b"", "retained": False}
+    assert q._estimate_airtime(iface, item) == 0.0
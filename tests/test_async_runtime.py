@@ -0,0 +1,115 @@
+"""Test the asyncio runtime: queue on the event loop, stream radio interface, paho socket hooks."""
+import os
+import sys
+import socket
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.queue import MessageQueue
+from handlers.meshtastic import AsyncTCPInterface
+from handlers.async_runtime import AsyncioMqttLoop
+
+
+async def _until(predicate, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_queue_runs_on_event_loop():
+    config = SimpleNamespace(mesh_transmit_delay=0.05)
+    iface = MagicMock()
+    queue = MessageQueue(config, lambda: iface)
+    queue._pacing_delay = MagicMock(return_value=0)
+
+    async def main():
+        task = asyncio.create_task(queue.run_async())
+        await asyncio.sleep(0.05)
+        # A put from another thread wakes the idle loop
+        threading.Thread(target=queue.put, args=("msh/2/e/LongFast/!1", b"a", False)).start()
+        queue.put("msh/2/e/LongFast/!1", b"b", False)
+        assert await _until(lambda: iface._sendToRadio.call_count == 2)
+        queue.stop()
+        await asyncio.wait_for(task, timeout=2)
+
+    asyncio.run(main())
+    assert queue.qsize() == 0 and queue._loop is None
+
+
+def test_async_tcp_interface_reads_frames_and_detects_close():
+    received = []
+
+    async def main():
+        clients = []
+
+        async def serve(reader, writer):
+            clients.append(writer)
+            received.append(await reader.readexactly(32))
+            payload = b"\x0a\x02\x08\x01"
+            writer.write(b"\x94\xc3\x00" + bytes([len(payload)]) + payload)
+            await writer.drain()
+
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        iface = AsyncTCPInterface("127.0.0.1", loop, portNumber=port, proxy=MagicMock())
+        iface._handleFromRadio = MagicMock()
+        iface._disconnected = MagicMock()
+        with patch.object(AsyncTCPInterface, "_startConfig", lambda self: self.isConnected.set()):
+            await iface.open(connect_timeout=2)
+        assert await _until(lambda: iface._handleFromRadio.called)
+        iface._handleFromRadio.assert_called_once_with(b"\x0a\x02\x08\x01")
+
+        # The radio going away marks the interface closed and reports the lost connection
+        clients[0].close()
+        assert await _until(lambda: iface.closed)
+        iface._disconnected.assert_called_once()
+        iface.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
+    assert received == [bytes([0xC3] * 32)]
+
+
+def test_mqtt_loop_follows_paho_socket_hooks():
+    client = MagicMock()
+    ours, theirs = socket.socketpair()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        network = AsyncioMqttLoop(client, loop)
+        connected = threading.Event()
+
+        def connect():
+            # paho opens its socket (and queues CONNECT) from the executor thread
+            client.on_socket_open(client, None, ours)
+            client.on_socket_register_write(client, None, ours)
+            connected.set()
+
+        network.start(connect)
+        assert await _until(connected.is_set)
+        assert await _until(lambda: client.loop_write.called)
+        client.on_socket_unregister_write(client, None, ours)
+
+        theirs.send(b"\x20\x02\x00\x00")
+        assert await _until(lambda: client.loop_read.called)
+        ours.recv(16)
+        assert client.loop_misc.called
+
+        network.stop()
+        await asyncio.sleep(0)
+        assert not loop.remove_reader(ours)
+        client.connect.assert_not_called()
+
+    try:
+        asyncio.run(main())
+    finally:
+        ours.close()
+        theirs.close()
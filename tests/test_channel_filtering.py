@@ -137,3 +137,45 @@ class TestChannelFiltering:
         proxy.iface = MagicMock()
         proxy.iface.localNode.channels = []
         assert proxy._is_channel_uplink_enabled("PKI") == False
+
+    def test_channel_index_rebuilt_on_invalidate(self):
+        proxy = MQTTProxy()
+        proxy.iface = MagicMock()
+        proxy.iface.localNode.channels = [
+            MockChannel("", 1, uplink=True, downlink=True)
+        ]
+        assert proxy._is_channel_downlink_enabled("LongFast") == True
+
+        # In-place mutation (e.g. admin set-channel response) is only seen after invalidation
+        proxy.iface.localNode.channels[0].settings.downlink_enabled = False
+        assert proxy._is_channel_downlink_enabled("LongFast") == True
+        proxy.on_channel_config_changed()
+        assert proxy._is_channel_downlink_enabled("LongFast") == False
+
+    def test_channel_index_rebuilt_on_new_channel_list(self):
+        proxy = MQTTProxy()
+        proxy.iface = MagicMock()
+        proxy.iface.localNode.channels = [MockChannel("Alpha", 1, uplink=False)]
+        assert proxy._is_channel_uplink_enabled("alpha") == False
+
+        # A reconnect or config download replaces the list object entirely
+        proxy.iface.localNode.channels = [MockChannel("Alpha", 1, uplink=True)]
+        assert proxy._is_channel_uplink_enabled("alpha") == True
+
+    def test_channel_index_entries(self):
+        from handlers.channels import ChannelIndex
+        index = ChannelIndex()
+        channels = [
+            MockChannel("", 1, uplink=True, downlink=False),
+            MockChannel("", 0),
+            MockChannel("", 2, uplink=False, downlink=True),
+            MockChannel("longfast", 2, uplink=False, downlink=True),
+        ]
+        table = index.get_table(channels)
+        # Disabled slots are skipped, defaults are named, first slot wins on name collisions
+        assert set(table.keys()) == {"longfast", "ch2"}
+        assert table["longfast"].index == 0
+        assert table["longfast"].downlink == False
+        assert table["ch2"].name == "CH2"
+        with pytest.raises(TypeError):
+            table["new"] = None
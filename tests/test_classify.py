@@ -0,0 +1,113 @@
+"""Test decrypt-and-classify of downlink packets."""
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.classify import (ChannelKeyCache, PacketClassifier, DEFAULT_KEY, channel_hash,
+                               decrypt, expand_psk, parse_extra_keys)
+from handlers.ingress import IngressContext
+from handlers.rules import DownlinkRuleSet, RuleError
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import channel_pb2, mqtt_pb2, portnums_pb2
+
+
+def _channel(name, psk, role=channel_pb2.Channel.Role.PRIMARY):
+    ch = channel_pb2.Channel()
+    ch.role = role
+    ch.settings.name = name
+    ch.settings.psk = psk
+    return ch
+
+
+def test_psk_expansion_and_channel_hash():
+    assert expand_psk(b"") is None
+    assert expand_psk(b"\x00") is None
+    assert expand_psk(b"\x01") == DEFAULT_KEY
+    assert expand_psk(b"\x02")[-1] == DEFAULT_KEY[-1] + 1
+    assert len(expand_psk(b"short")) == 16
+    assert len(expand_psk(bytes(20))) == 32
+    # The public LongFast channel hashes to 8
+    assert channel_hash("LongFast", DEFAULT_KEY) == 8
+    assert parse_extra_keys("Ohio=AQ==, bad, Plain=AA==") == {"Ohio": DEFAULT_KEY}
+
+
+def test_key_cache_candidates_and_invalidation():
+    channels = [_channel("", b"\x01"), _channel("Secret", bytes(range(16)), role=channel_pb2.Channel.Role.SECONDARY)]
+    cache = ChannelKeyCache(extra_keys={"Ohio": DEFAULT_KEY})
+    assert cache.candidates(channels, ["longfast"], 0) == [DEFAULT_KEY]
+    # Unknown topic channel: fall back to the hash (LongFast and Ohio share a key but not a hash)
+    assert cache.candidates(channels, [None], 8) == [DEFAULT_KEY]
+    assert cache.candidates(channels, ["Secret"], 0) == [bytes(range(16))]
+
+    channels[1].settings.psk = bytes(16)
+    assert cache.candidates(channels, ["Secret"], 0) == [bytes(range(16))]  # Not rebuilt yet
+    cache.invalidate()
+    assert cache.candidates(channels, ["Secret"], 0) == [bytes(16)]
+
+
+def _cleartext(portnum):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", 0x1234)
+    envelope.packet.id = 42
+    envelope.packet.decoded.portnum = portnum
+    return envelope.SerializeToString()
+
+
+def test_portnum_rules_use_classifier_lazily():
+    classifier = PacketClassifier(ChannelKeyCache(), lambda: [])
+    rules = DownlinkRuleSet.from_dict([
+        {"name": "small", "match": {"size": {"max": 1}}},
+        {"name": "telemetry", "match": {"portnum": ["TELEMETRY_APP", 3]}},
+    ])
+    assert rules.needs_portnum
+
+    telemetry = IngressContext("msh/2/c/LongFast/!gw", _cleartext(portnums_pb2.TELEMETRY_APP), False,
+                               classifier=classifier)
+    assert rules.evaluate(telemetry).name == "telemetry"
+    text = IngressContext("msh/2/c/LongFast/!gw", _cleartext(portnums_pb2.TEXT_MESSAGE_APP), False,
+                          classifier=classifier)
+    assert rules.evaluate(text) is None
+    assert classifier.stats()["classified"] == 2
+
+    # Without a classifier the portnum is unknown and portnum rules never match
+    assert IngressContext("t", _cleartext(portnums_pb2.TELEMETRY_APP), False).portnum is None
+
+    with pytest.raises(RuleError):
+        DownlinkRuleSet.from_dict([{"match": {"portnum": "NOT_A_PORT"}}])
+
+
+def test_encrypted_packet_classified_without_modification():
+    data = mesh_pb2.Data()
+    data.portnum = portnums_pb2.TEXT_MESSAGE_APP
+    data.payload = b"hello mesh"
+    envelope = mqtt_pb2.ServiceEnvelope()
+    packet = envelope.packet
+    setattr(packet, "from", 0x1234)
+    packet.id = 0x55667788
+    packet.channel = 8
+    # AES-CTR is symmetric: encrypting is the same operation as decrypting
+    packet.encrypted = decrypt(DEFAULT_KEY, packet.id, 0x1234, data.SerializeToString())
+    payload = envelope.SerializeToString()
+
+    classifier = PacketClassifier(ChannelKeyCache(), lambda: [_channel("", b"\x01")])
+    ctx = IngressContext("msh/2/e/LongFast/!gw", payload, False, classifier=classifier)
+    assert ctx.portnum == portnums_pb2.TEXT_MESSAGE_APP
+    assert ctx.payload == payload
+
+    # Wrong key: not classified
+    wrong = PacketClassifier(ChannelKeyCache(), lambda: [_channel("", bytes(16))])
+    assert IngressContext("msh/2/e/LongFast/!gw", payload, False, classifier=wrong).portnum is None
+
+    # Extra-root message after the virtual channel rewrite: only channel_id names the key
+    ohio_key = bytes(range(16))
+    envelope.channel_id = "Ohio"
+    packet.channel = 230
+    packet.encrypted = decrypt(ohio_key, packet.id, 0x1234, data.SerializeToString())
+    extra = PacketClassifier(ChannelKeyCache(extra_keys={"Ohio": ohio_key}), lambda: [_channel("", b"\x01")])
+    ctx = IngressContext("msh/2/e/US-Ohio/!gw", envelope.SerializeToString(), False, classifier=extra)
+    assert ctx.portnum == portnums_pb2.TEXT_MESSAGE_APP
+
+    # Per-packet cost is reported for the status log
+    assert classifier.stats()["us_per_packet"] is not None
@@ -0,0 +1,132 @@
+"""Test the cached config stream served to radio mux clients."""
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.config_cache import ConfigCache, changes_config, SPECIAL_NONCE_ONLY_CONFIG, SPECIAL_NONCE_ONLY_NODES
+from handlers.radio_mux import RadioMux
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import admin_pb2, portnums_pb2
+
+
+def _feed(cache, from_radio):
+    cache.observe(from_radio, from_radio.SerializeToString())
+
+
+def _config_stream(cache, nonce=1):
+    _feed(cache, mesh_pb2.FromRadio(my_info=mesh_pb2.MyNodeInfo(my_node_num=0x0a)))
+    _feed(cache, mesh_pb2.FromRadio(node_info=mesh_pb2.NodeInfo(num=0x0a)))
+    _feed(cache, mesh_pb2.FromRadio(node_info=mesh_pb2.NodeInfo(num=0x0b)))
+    channel = mesh_pb2.FromRadio()
+    channel.channel.index = 0
+    channel.channel.settings.name = "LongFast"
+    _feed(cache, channel)
+    lora = mesh_pb2.FromRadio()
+    lora.config.lora.hop_limit = 3
+    _feed(cache, lora)
+    _feed(cache, mesh_pb2.FromRadio(config_complete_id=nonce))
+
+
+def _parse(frames):
+    parsed = []
+    for raw in frames:
+        from_radio = mesh_pb2.FromRadio()
+        from_radio.ParseFromString(raw)
+        parsed.append(from_radio)
+    return parsed
+
+
+def test_replay_from_snapshot():
+    cache = ConfigCache()
+    assert cache.replay(5) is None
+    _config_stream(cache)
+
+    frames = _parse(cache.replay(1234))
+    assert [f.WhichOneof("payload_variant") for f in frames] == \
+        ["my_info", "node_info", "node_info", "channel", "config", "config_complete_id"]
+    assert frames[-1].config_complete_id == 1234
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Config only: the NodeDB is left out apart from our own node
+    frames = _parse(cache.replay(SPECIAL_NONCE_ONLY_CONFIG))
+    assert [f.node_info.num for f in frames if f.HasField("node_info")] == [0x0a]
+
+
+def test_nodedb_kept_current_from_packets():
+    cache = ConfigCache()
+    _config_stream(cache)
+
+    user = mesh_pb2.User(long_name="New Node")
+    packet = mesh_pb2.MeshPacket(rx_time=1000, rx_snr=5.5)
+    setattr(packet, "from", 0x0c)
+    packet.decoded.portnum = portnums_pb2.NODEINFO_APP
+    packet.decoded.payload = user.SerializeToString()
+    _feed(cache, mesh_pb2.FromRadio(packet=packet))
+
+    nodes = {f.node_info.num: f.node_info for f in _parse(cache.replay(1)) if f.HasField("node_info")}
+    assert nodes[0x0c].user.long_name == "New Node"
+    assert nodes[0x0c].last_heard == 1000
+
+
+def test_partial_streams_only_update_snapshot():
+    cache = ConfigCache()
+    # A config-only stream with nothing cached yet doesn't make a (node-less) snapshot
+    _config_stream(cache, nonce=SPECIAL_NONCE_ONLY_CONFIG)
+    assert not cache.valid
+
+    _config_stream(cache)
+    # A nodes-only stream replaces the NodeDB and keeps the cached config
+    _feed(cache, mesh_pb2.FromRadio(my_info=mesh_pb2.MyNodeInfo(my_node_num=0x0a)))
+    _feed(cache, mesh_pb2.FromRadio(node_info=mesh_pb2.NodeInfo(num=0x0a)))
+    _feed(cache, mesh_pb2.FromRadio(node_info=mesh_pb2.NodeInfo(num=0x0d)))
+    _feed(cache, mesh_pb2.FromRadio(config_complete_id=SPECIAL_NONCE_ONLY_NODES))
+    frames = _parse(cache.replay(1))
+    assert [f.node_info.num for f in frames if f.HasField("node_info")] == [0x0a, 0x0d]
+    assert any(f.HasField("channel") for f in frames) and any(f.HasField("config") for f in frames)
+
+
+def test_live_nodedb_is_capped():
+    cache = ConfigCache(max_nodes=3)
+    _config_stream(cache)
+    for sender, heard in ((0x0c, 300), (0x0d, 200)):
+        packet = mesh_pb2.MeshPacket(rx_time=heard)
+        setattr(packet, "from", sender)
+        packet.decoded.portnum = portnums_pb2.TEXT_MESSAGE_APP
+        _feed(cache, mesh_pb2.FromRadio(packet=packet))
+    # 0x0b was never heard: evicted first; our own node 0x0a is kept
+    nodes = [f.node_info.num for f in _parse(cache.replay(1)) if f.HasField("node_info")]
+    assert sorted(nodes) == [0x0a, 0x0c, 0x0d]
+    assert cache.stats()["nodes"] == 3
+
+
+def test_invalidated_by_config_changes():
+    cache = ConfigCache()
+    _config_stream(cache)
+
+    def admin(**kwargs):
+        to_radio = mesh_pb2.ToRadio()
+        to_radio.packet.decoded.portnum = portnums_pb2.ADMIN_APP
+        to_radio.packet.decoded.payload = admin_pb2.AdminMessage(**kwargs).SerializeToString()
+        return to_radio
+
+    assert not changes_config(admin(get_channel_request=1))
+    assert changes_config(admin(begin_edit_settings=True))
+    assert not changes_config(mesh_pb2.ToRadio(want_config_id=1))
+
+    mux = RadioMux(0, MagicMock(), config_cache=cache)
+    client = MagicMock(address="127.0.0.1:5000")
+    mux.on_to_radio(admin(get_channel_request=1), client)
+    assert cache.valid
+    mux.on_to_radio(admin(begin_edit_settings=True), client)
+    assert not cache.valid
+    assert not mux.serve_config(client, 99)
+
+    # The next full stream (e.g. the forwarded want_config) rebuilds it
+    _config_stream(cache, nonce=99)
+    assert mux.serve_config(client, 100)
+    client.offer.assert_called_once()
+
+    _feed(cache, mesh_pb2.FromRadio(rebooted=True))
+    assert not cache.valid
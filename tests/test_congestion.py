@@ -0,0 +1,96 @@
+"""Test congestion-aware downlink pacing."""
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg
+from handlers.congestion import CongestionPacer
+from handlers.meshtastic import MQTTProxyMixin
+from handlers.queue import MessageQueue
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import portnums_pb2, telemetry_pb2
+
+
+def test_quiet_channel_keeps_full_rate():
+    pacer = CongestionPacer(ceiling=40)
+    pacer.update(channel_utilization=10.0, now=0)
+    assert pacer.factor(now=0) == 1.0
+    assert pacer.extra_delay(now=0) == 0.0
+
+
+def test_backs_off_near_ceiling_and_recovers_gradually():
+    pacer = CongestionPacer(ceiling=40, max_factor=16, half_life=100)
+    pacer.update(channel_utilization=30.0, now=0)  # 75% of the ceiling
+    mid = pacer.factor(now=0)
+    assert 1.0 < mid < 16.0
+
+    pacer.update(channel_utilization=45.0, now=10)  # Over the ceiling: back off at once
+    assert pacer.factor(now=10) == 16.0
+
+    pacer.update(channel_utilization=5.0, now=20)  # Quiet again: ramp back with the half-life
+    assert pacer.factor(now=20) == 16.0
+    assert abs(pacer.factor(now=120) - 8.5) < 1e-9
+    assert pacer.factor(now=2000) < 1.01
+
+
+def test_air_util_tx_ceiling():
+    pacer = CongestionPacer(ceiling=40, air_util_tx_ceiling=10, max_factor=4)
+    pacer.update(channel_utilization=5.0, air_util_tx=12.0, now=0)
+    assert pacer.factor(now=0) == 4.0
+
+
+def test_queue_pacing_disabled_by_default():
+    config = SimpleNamespace()
+    queue = MessageQueue(config, lambda: None)
+    assert queue.pacer is None
+    queue.update_congestion(90.0, 20.0)
+    assert queue.pacing_factor() == 1.0
+    assert queue.congestion_stats() is None
+
+
+def test_queue_pacing_delay(monkeypatch):
+    monkeypatch.setattr(cfg, "mesh_congestion_ceiling", 40.0)
+    monkeypatch.setattr(cfg, "mesh_congestion_max_factor", 4.0)
+    monkeypatch.setattr(cfg, "mesh_congestion_base_delay", 0.5)
+    queue = MessageQueue(SimpleNamespace(), lambda: None)
+    queue.update_congestion(50.0, None)
+    assert queue.pacing_factor() == 4.0
+    assert abs(queue._pacing_delay() - 1.5) < 1e-6
+
+
+class _Parent:
+    def _handleFromRadio(self, fr):
+        pass
+
+
+class _Mixin(MQTTProxyMixin, _Parent):
+    def __init__(self, proxy, my_node):
+        self.proxy = proxy
+        self.myNodeNum = my_node
+
+
+def _telemetry_packet(sender, channel_util):
+    from_radio = mesh_pb2.FromRadio()
+    packet = from_radio.packet
+    setattr(packet, "from", sender)
+    packet.decoded.portnum = portnums_pb2.TELEMETRY_APP
+    telemetry = telemetry_pb2.Telemetry()
+    telemetry.device_metrics.channel_utilization = channel_util
+    packet.decoded.payload = telemetry.SerializeToString()
+    return from_radio
+
+
+def test_local_telemetry_reaches_proxy():
+    proxy = MagicMock()
+    mixin = _Mixin(proxy, 0x1234)
+
+    mixin._handleFromRadio(_telemetry_packet(0x1234, 33.5))
+    proxy.on_local_telemetry.assert_called_once_with(33.5, None)
+
+    # Telemetry from other nodes on the mesh is ignored
+    proxy.on_local_telemetry.reset_mock()
+    mixin._handleFromRadio(_telemetry_packet(0x9999, 80.0))
+    proxy.on_local_telemetry.assert_not_called()
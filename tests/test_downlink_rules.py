@@ -0,0 +1,115 @@
+"""Test declarative downlink filter rules."""
+import os
+import sys
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.ingress import IngressContext
+from handlers.rules import DownlinkRuleSet, RuleError, compile_rule
+from meshtastic.protobuf import mqtt_pb2
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def make_ctx(topic="msh/US/OH/2/e/LongFast/!gw", sender=0x1234, dest=0xFFFFFFFF,
+             hop_start=3, hop_limit=1, via_mqtt=False):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.to = dest
+    envelope.packet.hop_start = hop_start
+    envelope.packet.hop_limit = hop_limit
+    envelope.packet.via_mqtt = via_mqtt
+    envelope.packet.encrypted = b"x" * 20
+    return IngressContext(topic, envelope.SerializeToString(), False)
+
+
+def test_set_and_range_matching():
+    rules = DownlinkRuleSet.from_dict({"rules": [
+        {"name": "spammer", "match": {"from": ["!00001234"]}},
+        {"name": "far", "match": {"hops_away": {"min": 3}}},
+    ]})
+    assert rules.evaluate(make_ctx(sender=0x1234)).name == "spammer"
+    assert rules.evaluate(make_ctx(sender=0x9999, hop_start=5, hop_limit=1)).name == "far"
+    assert rules.evaluate(make_ctx(sender=0x9999)) is None
+    assert rules.stats() == {"spammer": 1, "far": 1}
+
+
+def test_allow_rule_short_circuits():
+    rules = DownlinkRuleSet.from_dict([
+        {"name": "keep-oh", "action": "allow", "match": {"root": "msh/US/OH"}},
+        {"name": "drop-all", "match": {"size": {"min": 0}}},
+    ])
+    assert rules.evaluate(make_ctx()) is None
+    assert rules.evaluate(make_ctx(topic="msh/US/CA/2/e/LongFast/!gw")).name == "drop-all"
+
+
+def test_topic_only_rules_skip_decode():
+    rules = DownlinkRuleSet.from_dict([{"name": "ch", "match": {"channel": "longfast"}}])
+    ctx = IngressContext("msh/2/e/LongFast/!gw", b"\xff\xff", False)
+    with patch.object(IngressContext, "_parse") as mock_parse:
+        assert rules.evaluate(ctx).name == "ch"
+        mock_parse.assert_not_called()
+
+
+def test_shadow_mode_counts_without_dropping():
+    rules = DownlinkRuleSet.from_dict({"shadow": True, "rules": [{"name": "mqtt", "match": {"via_mqtt": True}}]})
+    assert rules.evaluate(make_ctx(via_mqtt=True)) is None
+    assert rules.stats() == {"mqtt": 1}
+
+    per_rule = DownlinkRuleSet.from_dict([
+        {"name": "trial", "shadow": True, "match": {"via_mqtt": True}},
+        {"name": "real", "match": {"via_mqtt": True}},
+    ])
+    assert per_rule.evaluate(make_ctx(via_mqtt=True)).name == "real"
+    assert per_rule.stats() == {"trial": 1, "real": 1}
+
+
+def test_invalid_rules_rejected():
+    with pytest.raises(RuleError):
+        compile_rule({"match": {"colour": "red"}}, 0)
+    with pytest.raises(RuleError):
+        compile_rule({"match": {"from": ["!zz"]}}, 0)
+    with pytest.raises(RuleError):
+        compile_rule({"action": "reject", "match": {"size": 1}}, 0)
+    for bad in ({"min": "3"}, {"max": None}, ["0", 5], {"min": True}, [5, 1], {"min": 3, "max": 2}):
+        with pytest.raises(RuleError):
+            compile_rule({"match": {"hops_away": bad}}, 0)
+    assert compile_rule({"match": {"size": {"min": 0.5, "max": 10}}}, 0).conditions == [("size", "range", (0.5, 10))]
+
+
+def test_proxy_applies_rules_before_queue(tmp_path, monkeypatch):
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps([{"name": "spammer", "match": {"from": [0x1234]}}]))
+    import config as cfgmod
+    monkeypatch.setattr(cfgmod.cfg, "downlink_rules_file", str(rules_file))
+
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    ctx = make_ctx(sender=0x1234)
+    proxy.on_mqtt_message_to_radio(ctx.topic, ctx.payload, False)
+    proxy.message_queue.put.assert_not_called()
+
+    ctx = make_ctx(sender=0x5678)
+    proxy.on_mqtt_message_to_radio(ctx.topic, ctx.payload, False)
+    proxy.message_queue.put.assert_called_once()
+
+
+def test_proxy_ignores_invalid_rules_file(tmp_path, monkeypatch):
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text("{not json")
+    import config as cfgmod
+    monkeypatch.setattr(cfgmod.cfg, "downlink_rules_file", str(rules_file))
+    proxy = MQTTProxy()
+    assert proxy.downlink_rules is None
@@ -0,0 +1,91 @@
+"""Test the cost-ordered MQTT ingress filter chain."""
+import os
+import sys
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.ingress import IngressChain, IngressContext, FilterStage, COST_TOPIC, COST_DECODE
+from handlers.mqtt import MQTTHandler
+from handlers.node_tracker import PacketDeduplicator
+from meshtastic.protobuf import mqtt_pb2
+
+
+class RejectAll(FilterStage):
+    name = "reject_all"
+    cost = COST_DECODE
+
+    def accept(self, ctx):
+        return False
+
+
+class PassAll(FilterStage):
+    name = "pass_all"
+    cost = COST_TOPIC
+
+    def accept(self, ctx):
+        return True
+
+
+def make_message(topic, payload=b"", retain=False):
+    msg = MagicMock()
+    msg.topic = topic
+    msg.payload = payload
+    msg.retain = retain
+    return msg
+
+
+def test_stages_sorted_by_cost():
+    chain = IngressChain([RejectAll(), PassAll()])
+    assert [st.name for st in chain.stages] == ["pass_all", "reject_all"]
+
+    rejected = chain.process(IngressContext("t", b"", False))
+    assert rejected.name == "reject_all"
+    stats = {st["name"]: st for st in chain.stats()}
+    assert stats["pass_all"]["hits"] == 1 and stats["pass_all"]["drops"] == 0
+    assert stats["reject_all"]["hits"] == 1 and stats["reject_all"]["drops"] == 1
+
+
+def test_cheap_checks_run_before_parse():
+    config = SimpleNamespace()
+    config.mqtt_forward_retained = False
+    handler = MQTTHandler(config, "1234abcd", on_message_callback=MagicMock())
+
+    with patch.object(IngressContext, "_parse") as mock_parse:
+        handler._on_message(None, None, make_message("msh/2/stat/!abcd"))
+        handler._on_message(None, None, make_message("msh/2/e/LongFast/!abcd", retain=True))
+        mock_parse.assert_not_called()
+
+    stats = {st["name"]: st for st in handler.ingress.stats()}
+    assert stats["stat"]["drops"] == 1
+    assert stats["retained"]["drops"] == 1
+    # Later stages never saw the rejected messages
+    assert stats["duplicate"]["hits"] == 0
+    handler.on_message_callback.assert_not_called()
+
+
+def test_envelope_parsed_once_per_message():
+    deduplicator = PacketDeduplicator()
+    handler = MQTTHandler(SimpleNamespace(), "mynode", on_message_callback=MagicMock(), deduplicator=deduplicator)
+
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.gateway_id = "!mynode"
+    envelope.packet.encrypted = b"secret"
+    setattr(envelope.packet, "from", 0x1234)
+    envelope.packet.id = 7
+
+    real_parse = IngressContext._parse
+    with patch.object(IngressContext, "_parse", autospec=True, side_effect=real_parse) as mock_parse:
+        handler._on_message(None, None, make_message("msh/2/e/LongFast/!mynode", envelope.SerializeToString()))
+        assert mock_parse.call_count == 1
+    handler.on_message_callback.assert_called_once()
+
+
+def test_custom_stage_plugged_in():
+    handler = MQTTHandler(SimpleNamespace(), "1234abcd", on_message_callback=MagicMock())
+    handler.ingress.add_stage(RejectAll())
+    handler._on_message(None, None, make_message("msh/2/e/LongFast/!abcd"))
+    handler.on_message_callback.assert_not_called()
+    assert handler.ingress.get_stage("reject_all").drops == 1
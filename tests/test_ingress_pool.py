@@ -0,0 +1,107 @@
+"""Test the multi-process ingress prefilter."""
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg
+from handlers.ingress_pool import IngressPool, encode_batch, decode_batch
+from handlers.shm_ring import ShmRing
+from handlers.mqtt import MQTTHandler
+from handlers.node_tracker import PacketDeduplicator
+from meshtastic.protobuf import mqtt_pb2
+
+
+def _wait_for(predicate, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_ring_wraps_and_refuses_when_full():
+    ring = ShmRing(64)
+    try:
+        assert ring.read() is None
+        for i in range(10):
+            # Records straddle the end of the buffer as the counters advance
+            record = bytes([i]) * 20
+            assert ring.write(record)
+            assert ring.read() == record
+        assert ring.write(b"a" * 30) and not ring.write(b"b" * 30)
+        assert ring.read() == b"a" * 30 and ring.used() == 0
+
+        items = [("msh/2/e/LongFast/!abcd", b"\x00\x01", False), ("msh/2/stat/!abcd", b"", True)]
+        assert decode_batch(encode_batch(items)) == items
+    finally:
+        ring.close(unlink=True)
+
+
+def _message(topic, sender, packet_id, retain=False):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = packet_id
+    envelope.packet.encrypted = b"\x01"
+    envelope.gateway_id = "!00001111"
+    return MagicMock(topic=topic, payload=envelope.SerializeToString(), retain=retain)
+
+
+def test_workers_return_only_survivors(monkeypatch):
+    monkeypatch.setattr(cfg, "ingress_workers", 2)
+    monkeypatch.setattr(cfg, "ingress_batch_size", 4)
+    config = SimpleNamespace()
+    config.mqtt_forward_retained = False
+    deduplicator = PacketDeduplicator()
+    handler = MQTTHandler(config, "1234abcd", on_message_callback=MagicMock(), deduplicator=deduplicator)
+    handler.mqtt_root = "msh"
+    handler.handle_incoming = MagicMock()
+    pool = handler.ingress_pool
+    assert isinstance(pool, IngressPool)
+
+    pool.start()
+    try:
+        deduplicator.mark_seen("!00005678", 7)
+        # Give the workers' copies of the dedup table time to catch up
+        time.sleep(0.2)
+        messages = [
+            MagicMock(topic="msh/2/stat/!00001111", payload=b"online", retain=True),
+            _message("msh/2/e/LongFast/!00001111", 0x5678, 8, retain=True),
+            _message("msh/2/e/LongFast/!00001111", 0x5678, 7),
+            _message("msh/2/e/LongFast/!00001111", 0x5678, 9),
+        ]
+        source = MagicMock()
+        for message in messages:
+            handler.receive(message, source)
+
+        assert _wait_for(lambda: pool.stats()["passed"] == 1)
+        assert _wait_for(lambda: handler.handle_incoming.call_count == 1)
+        handler.handle_incoming.assert_called_once_with(messages[3], source)
+        stats = pool.stats()
+        assert stats["messages"] == 4 and stats["workers"] == 2
+        assert stats["drops"] == {"stat": 1, "retained": 1, "duplicate": 1}
+    finally:
+        pool.stop()
+    assert not pool.workers and pool.mark_seen not in deduplicator.listeners
+
+
+def test_dead_worker_batches_are_processed_inline():
+    handler = MagicMock(node_id="1234abcd", peers={}, deduplicator=None)
+    pool = IngressPool(handler, workers=1)
+    worker = MagicMock(index=0)
+    worker.process.is_alive.return_value = False
+    batch = [(MagicMock(), MagicMock())]
+    worker.outstanding = {5: batch}
+    pool.workers = [worker]
+    pool.running = True
+    replacement = MagicMock()
+    pool._spawn = MagicMock(return_value=replacement)
+
+    pool._check_workers()
+    assert pool.workers == [replacement] and pool.restarts == 1
+    handler.handle_incoming.assert_called_once_with(*batch[0])
+    worker.ring.close.assert_called_once_with(unlink=True)
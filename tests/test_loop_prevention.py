@@ -8,8 +8,10 @@ from unittest.mock import MagicMock, patch
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from handlers.node_tracker import PacketDeduplicator
+from handlers.node_tracker import PacketDeduplicator, InjectedPacketSet
 from handlers.mqtt import MQTTHandler
+from handlers.meshtastic import MQTTProxyMixin
+from handlers.queue import MessageQueue
 from meshtastic import mesh_pb2
 from meshtastic.protobuf import mqtt_pb2
 
@@ -91,3 +93,66 @@ def test_mqtt_new_packet_passed():
     
     # Verify callback CALLED (passed through)
     callback.assert_called_once()
+
+
+def test_injected_packet_set_expires_and_is_bounded():
+    injected = InjectedPacketSet(ttl_seconds=10, max_entries=2)
+    injected.add(0xaa, 1, now=0.0)
+    assert injected.contains(0xaa, 1, now=5.0)
+    assert not injected.contains(0xaa, 2, now=5.0)
+    assert not injected.contains(0xaa, 1, now=11.0)
+
+    injected.add(0xaa, 2, now=20.0)
+    injected.add(0xbb, 3, now=21.0)
+    injected.add(0xcc, 4, now=22.0)
+    assert len(injected) == 2
+    assert not injected.contains(0xaa, 2, now=22.0)
+
+
+class _Parent:
+    def _handleFromRadio(self, fr):
+        pass
+
+
+class _Mixin(MQTTProxyMixin, _Parent):
+    def __init__(self, proxy, my_node):
+        self.proxy = proxy
+        self.myNodeNum = my_node
+
+
+def _envelope(sender, packet_id):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = packet_id
+    envelope.gateway_id = "!gw"
+    return envelope.SerializeToString()
+
+
+def _proxied(data):
+    fr = mesh_pb2.FromRadio()
+    fr.mqttClientProxyMessage.topic = "msh/2/e/LongFast/!00001111"
+    fr.mqttClientProxyMessage.data = data
+    return fr
+
+
+def test_injected_packets_not_republished():
+    injected = InjectedPacketSet()
+    queue = MessageQueue(MagicMock(), lambda: None, injected=injected)
+    iface = MagicMock()
+    queue._send_to_radio(iface, {'topic': "msh/2/e/LongFast/!gw", 'payload': _envelope(0x2222, 55), 'retained': False})
+    queue._send_to_radio(iface, {'topic': "msh/2/e/LongFast/!gw", 'payload': _envelope(0x1111, 56), 'retained': False})
+
+    proxy = MagicMock()
+    proxy.injected_packets = injected
+    proxy.rf_heard = None
+    proxy.reachable_nodes = None
+    mixin = _Mixin(proxy, 0x1111)
+
+    mixin._handleFromRadio(_proxied(_envelope(0x2222, 55)))
+    proxy.mqtt_handler.publish.assert_not_called()
+    assert injected.suppressed == 1
+
+    # Our own node's packets are always published (implicit ACK echoes), as are new packets
+    mixin._handleFromRadio(_proxied(_envelope(0x1111, 56)))
+    mixin._handleFromRadio(_proxied(_envelope(0x2222, 57)))
+    assert proxy.mqtt_handler.publish.call_count == 2
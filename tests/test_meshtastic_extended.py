@@ -158,6 +158,39 @@ def test_handle_from_radio_super_crash_handling():
     except:
         pytest.fail("Should not raise exception")
 
+def test_suppressed_uplink_still_reaches_library(monkeypatch):
+    from handlers.tracing import tracer
+    monkeypatch.setattr(tracer, "enabled", True)
+    proxy = MockProxy()
+    proxy._is_channel_uplink_enabled = lambda channel_name: False
+    mixin = MixinTestHelper(proxy)
+
+    from_radio = mesh_pb2.FromRadio()
+    from_radio.mqttClientProxyMessage.topic = "msh/2/e/LongFast/!12345678"
+    from_radio.mqttClientProxyMessage.data = b"abc"
+    with patch.object(ParentInterface, "_handleFromRadio") as library:
+        mixin._handleFromRadio(from_radio.SerializeToString())
+
+    # Only the publish is suppressed: the library still sees the frame, and the trace is closed
+    proxy.mqtt_handler.publish.assert_not_called()
+    library.assert_called_once()
+    assert tracer.current() is None
+
+def test_subscriptions_replanned_after_config_stream():
+    proxy = MockProxy()
+    proxy.on_channel_config_changed = MagicMock()
+    mixin = MixinTestHelper(proxy)
+
+    channel = mesh_pb2.FromRadio()
+    channel.channel.index = 1
+    mixin._handleFromRadio(channel)
+    proxy.on_channel_config_changed.assert_called_once_with(resubscribe=False)
+
+    complete = mesh_pb2.FromRadio()
+    complete.config_complete_id = 69420
+    mixin._handleFromRadio(complete)
+    proxy.on_channel_config_changed.assert_called_with(resubscribe=True)
+
 def test_create_interface_serial():
     config = MagicMock()
     config.interface_type = "serial"
@@ -0,0 +1,111 @@
+"""Test the Prometheus metrics endpoint."""
+import os
+import sys
+import urllib.request
+import urllib.error
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.histogram import LatencyHistogram
+from handlers.metrics import MetricFamily, MetricsServer, render, merge
+from handlers.mqtt import MQTTHandler
+from handlers.node_tracker import PacketDeduplicator, RFHeardTable
+from meshtastic.protobuf import mqtt_pb2
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def test_render_text_format():
+    histogram = LatencyHistogram(bounds=(0.01, 0.1))
+    histogram.observe(0.005)
+    histogram.observe(0.05)
+    histogram.observe(5)
+    drops = MetricFamily("ingress_dropped_total", "counter", "Dropped.")
+    drops.add(3, stage='dup"licate').add(MagicMock(), stage="skipped")
+    families = merge([({"radio": "a"}, [drops, MetricFamily("wait_seconds", "histogram", "Wait.").add(histogram)]),
+                      ({"radio": "b"}, [MetricFamily("ingress_dropped_total", "counter", "Dropped.").add(1)])])
+    text = render(families + [MetricFamily("empty", "gauge", "Not reported.")])
+
+    assert "# TYPE mqtt_proxy_ingress_dropped_total counter" in text
+    assert 'mqtt_proxy_ingress_dropped_total{radio="a",stage="dup\\"licate"} 3' in text
+    assert 'mqtt_proxy_ingress_dropped_total{radio="b"} 1' in text
+    assert "skipped" not in text and "mqtt_proxy_empty" not in text
+    assert 'mqtt_proxy_wait_seconds_bucket{radio="a",le="0.01"} 1' in text
+    assert 'mqtt_proxy_wait_seconds_bucket{radio="a",le="+Inf"} 3' in text
+    assert 'mqtt_proxy_wait_seconds_count{radio="a"} 3' in text
+
+
+def test_server_serves_metrics_path_only():
+    server = MetricsServer(lambda: [MetricFamily("up", "gauge", "Up.").add(1)], port=0, host="127.0.0.1")
+    server.start()
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode().endswith("mqtt_proxy_up 1\n")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(base + "/", timeout=5)
+        assert server.scrapes == 1
+    finally:
+        server.stop()
+
+
+def test_proxy_collects_pipeline_counters():
+    deduplicator = PacketDeduplicator()
+    proxy = MQTTProxy(deduplicator=deduplicator)
+    deduplicator.mark_seen("!00001234", 1)
+    assert deduplicator.is_duplicate("!00001234", 1)
+    assert not deduplicator.is_duplicate("!00001234", 2)
+
+    config = SimpleNamespace()
+    config.ingress_workers = 0
+    handler = MQTTHandler(config, "1234abcd", on_message_callback=MagicMock(), deduplicator=deduplicator)
+    handler.rx_count, handler.tx_count = 7, 5
+    handler._on_connect(MagicMock(), None, MagicMock(), 0)
+    handler._on_connect(MagicMock(), None, MagicMock(), 0)
+    proxy.mqtt_handler = handler
+    proxy.message_queue.put("msh/2/e/LongFast/!1234abcd", b"\x01", False)
+
+    text = render(proxy.collect_metrics())
+    assert "mqtt_proxy_radio_connected 0" in text
+    assert "mqtt_proxy_mqtt_connected 1" in text
+    assert "mqtt_proxy_mqtt_reconnects_total 1" in text
+    assert "mqtt_proxy_mqtt_rx_total 7" in text and "mqtt_proxy_mqtt_tx_total 5" in text
+    assert 'mqtt_proxy_ingress_dropped_total{stage="duplicate"} 0' in text
+    assert "mqtt_proxy_queue_depth 1" in text and "mqtt_proxy_queue_evictions_total 0" in text
+    assert "mqtt_proxy_queue_wait_seconds_count 0" in text
+    assert "mqtt_proxy_dedup_entries 1" in text
+    assert "mqtt_proxy_dedup_checks_total 2" in text and "mqtt_proxy_dedup_hits_total 1" in text
+
+
+def test_proxy_counts_downlink_drops_by_reason():
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    proxy.rf_heard = RFHeardTable(window_seconds=60)
+    proxy.rf_heard.mark_heard(0x2222)
+    proxy.iface = MagicMock()
+    proxy.iface.localNode.nodeNum = 0x1111
+
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", 0x2222)
+    proxy._is_channel_downlink_enabled = lambda name: name != "Private"
+    proxy.on_mqtt_message_to_radio("msh/2/e/Private/!gw", envelope.SerializeToString(), False)
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", envelope.SerializeToString(), False)
+    proxy.message_queue.put.assert_not_called()
+
+    text = render(proxy.collect_metrics())
+    assert 'mqtt_proxy_downlink_dropped_total{reason="channel_disabled"} 1' in text
+    assert 'mqtt_proxy_downlink_dropped_total{reason="rf_heard"} 1' in text
+    assert 'reason="rate_limit"' not in text
@@ -6,7 +6,9 @@ from unittest.mock import MagicMock, patch
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import cfg as proxy_cfg
 from handlers.mqtt import MQTTHandler
+from handlers.topic_alias import TopicAliasMap
 from meshtastic import mesh_pb2
 from meshtastic.protobuf import mqtt_pb2
 import paho.mqtt.client as mqtt
@@ -141,3 +143,127 @@ def test_mqtt_on_message_exception_handling():
     
     # Should handle without crashing
     handler._on_message(None, None, msg)
+
+def test_mqtt_configure_qos_window(monkeypatch):
+    config = MagicMock()
+    monkeypatch.setattr(proxy_cfg, "mqtt_uplink_qos", 1)
+    monkeypatch.setattr(proxy_cfg, "mqtt_max_inflight", 50)
+    monkeypatch.setattr(proxy_cfg, "mqtt_max_queued", 1000)
+    handler = MQTTHandler(config, "1234abcd")
+    node_cfg = MagicMock()
+    node_cfg.address = "broker.local"
+    node_cfg.port = 1883
+    node_cfg.tlsEnabled = False
+    node_cfg.username = None
+    node_cfg.password = None
+    node_cfg.root = 'msh'
+    with patch('handlers.mqtt.mqtt.Client') as client_cls:
+        handler.configure(node_cfg)
+    client = client_cls.return_value
+    client.max_inflight_messages_set.assert_called_with(50)
+    client.max_queued_messages_set.assert_called_with(1000)
+    assert client.on_publish == handler._on_publish
+
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_SUCCESS
+    handler.client.publish.return_value.mid = 7
+    handler.publish("topic", b"abc")
+    handler.client.publish.assert_called_with("topic", b"abc", retain=False, qos=1)
+    assert handler.publish_stats()["inflight"] == 1
+
+def test_mqtt_publish_completion_tracking():
+    handler = MQTTHandler(MagicMock(), "1234abcd")
+    handler.client = MagicMock()
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_SUCCESS
+
+    handler.client.publish.return_value.mid = 1
+    handler.publish("topic", b"abc")
+    handler._on_publish(handler.client, None, 1, mqtt.ReasonCode(mqtt.PacketTypes.PUBACK), None)
+
+    # Completion racing ahead of publish() returning is still counted once
+    handler._on_publish(handler.client, None, 2, None, None)
+    handler.client.publish.return_value.mid = 2
+    handler.publish("topic", b"abc")
+
+    stats = handler.publish_stats()
+    assert stats["completed"] == 2
+    assert stats["inflight"] == 0
+    assert stats["latency"]["count"] == 2
+
+    # Completion of an untracked publish (e.g. presence) doesn't match a later one reusing its mid
+    with patch('handlers.mqtt.time.monotonic', return_value=1000.0):
+        handler._on_publish(handler.client, None, 3, None, None)
+    handler.client.publish.return_value.mid = 3
+    with patch('handlers.mqtt.time.monotonic', return_value=1010.0):
+        handler.publish("topic", b"abc")
+    stats = handler.publish_stats()
+    assert stats["completed"] == 2 and stats["inflight"] == 1
+
+def test_topic_alias_map_lru():
+    aliases = TopicAliasMap(maximum=2)
+    assert aliases.resolve("a/1") == ("a/1", 1)
+    assert aliases.resolve("a/1") == ("", 1)
+    assert aliases.resolve("b/2") == ("b/2", 2)
+    aliases.resolve("a/1")  # b/2 is now least recently used
+    assert aliases.resolve("c/3") == ("c/3", 2)
+    assert aliases.resolve("b/2") == ("b/2", 1)
+    assert aliases.bytes_saved == 6
+
+    aliases.reset(0)
+    assert aliases.resolve("a/1") == ("a/1", None)
+
+def test_topic_alias_registered_before_use():
+    aliases = TopicAliasMap(maximum=2)
+    sent = []
+
+    def send(publish_topic, alias, rc=mqtt.MQTT_ERR_SUCCESS):
+        # No other publish can resolve an alias until this one is queued
+        assert aliases._lock.locked()
+        sent.append((publish_topic, alias))
+        return MagicMock(rc=rc)
+
+    aliases.publish("a/1", lambda t, a: send(t, a, rc=mqtt.MQTT_ERR_QUEUE_SIZE))
+    # The failed registration gave its alias back: the topic is registered again
+    aliases.publish("a/1", send)
+    aliases.publish("b/2", send)
+    aliases.publish("a/1", send)
+    assert sent == [("a/1", 1), ("a/1", 1), ("b/2", 2), ("", 1)]
+
+def test_mqtt_v5_topic_aliases_and_session(monkeypatch):
+    config = MagicMock()
+    monkeypatch.setattr(proxy_cfg, "mqtt_protocol", "5")
+    monkeypatch.setattr(proxy_cfg, "mqtt_topic_aliases", 4)
+    monkeypatch.setattr(proxy_cfg, "mqtt_session_expiry", 3600)
+    monkeypatch.setattr(proxy_cfg, "mqtt_receive_maximum", 10)
+    handler = MQTTHandler(config, "1234abcd")
+    node_cfg = MagicMock()
+    node_cfg.address = "broker.local"
+    node_cfg.port = 1883
+    node_cfg.tlsEnabled = False
+    node_cfg.username = None
+    node_cfg.password = None
+    node_cfg.root = 'msh'
+    with patch('handlers.mqtt.mqtt.Client') as client_cls:
+        handler.configure(node_cfg)
+        assert client_cls.call_args.kwargs["protocol"] == mqtt.MQTTv5
+        handler.start()
+    props = handler.client.connect.call_args.kwargs["properties"]
+    assert props.SessionExpiryInterval == 3600
+    assert props.ReceiveMaximum == 10
+
+    connack = MagicMock()
+    connack.TopicAliasMaximum = 2
+    flags = MagicMock()
+    flags.session_present = True
+    handler.subscriptions = {"msh/2/e/#"}
+    handler._on_connect(handler.client, None, flags, 0, connack)
+    assert handler.topic_aliases.maximum == 2
+    handler.client.subscribe.assert_not_called()  # Resumed session keeps the subscription
+
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_SUCCESS
+    handler.client.publish.return_value.mid = 1
+    handler.publish("msh/2/e/LongFast/!1234abcd", b"one")
+    handler.publish("msh/2/e/LongFast/!1234abcd", b"two")
+    first, second = handler.client.publish.call_args_list[-2:]
+    assert first.args[0] == "msh/2/e/LongFast/!1234abcd"
+    assert second.args[0] == ""
+    assert second.kwargs["properties"].TopicAlias == first.kwargs["properties"].TopicAlias == 1
@@ -0,0 +1,95 @@
+"""Test running the MQTT client in its own process."""
+import os
+import sys
+import time
+import threading
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.shm_ring import ShmRing, RingChannel, pack_frame, unpack_frame
+from handlers.mqtt_process import MQTTProcess, RemoteMQTTHandler, PUBLISH, CHANNELS
+from handlers.node_tracker import PacketDeduplicator
+from meshtastic.protobuf import module_config_pb2
+
+
+def _wait_for(predicate, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_frames_and_channel():
+    assert unpack_frame(pack_frame(PUBLISH, b"msh/2/e/LongFast/!abcd", b"\x00" * 300, b"")) == \
+        (PUBLISH, [b"msh/2/e/LongFast/!abcd", b"\x00" * 300, b""])
+
+    ring = ShmRing(256)
+    try:
+        channel = RingChannel(ring, threading.Semaphore(0), send_timeout=0.01)
+        assert channel.recv(timeout=0.01) is None
+        assert channel.send(CHANNELS, b'["LongFast"]')
+        assert channel.recv(timeout=0.01) == (CHANNELS, [b'["LongFast"]'])
+        # A frame larger than the ring is dropped instead of blocking the sender
+        assert not channel.send(PUBLISH, b"x" * 300)
+        assert channel.dropped == 1 and channel.sent == 1
+    finally:
+        ring.close(unlink=True)
+
+
+def test_remote_handler_forwards_to_process():
+    process = MagicMock()
+    handler = RemoteMQTTHandler(process, "1234abcd", channel_provider=lambda: ["LongFast"])
+    handler.configure(module_config_pb2.ModuleConfig.MQTTConfig(root="msh"))
+    handler.start()
+    process.configure.assert_called_once_with(handler)
+
+    handler.publish("msh/2/e/LongFast/!1234abcd", b"\x01", retain=True)
+    process.send.assert_called_with(PUBLISH, b"msh/2/e/LongFast/!1234abcd", b"\x01", b"\x01")
+    handler.replan()
+    process.send.assert_called_with(CHANNELS, b'["LongFast"]')
+
+    handler.update({"connected": True, "health_check_enabled": True, "last_activity": 5.0, "tx_count": 2,
+                    "rx_count": 3, "tx_failures": 0, "publish": {"completed": 0}, "brokers": [],
+                    "ingress": [{"name": "stat"}], "uplink_buffer": None, "ingress_pool": None,
+                    "publish_latency": {"buckets": [[0.1, 1], [1.0, 2]], "count": 3, "sum": 2.5}})
+    assert handler.connected and handler.rx_count == 3
+    assert handler.publish_latency.buckets() == [(0.1, 1), (1.0, 2), (float("inf"), 3)]
+    assert handler.publish_latency.count == 3 and handler.publish_latency.sum == 2.5
+    assert handler.ingress.stats() == [{"name": "stat"}] and handler.uplink_buffer is None
+    handler.update(None)
+    assert not handler.connected
+
+    handler.stop()
+    process.release.assert_called_once_with(handler)
+
+
+def test_mqtt_process_reports_and_restarts():
+    deduplicator = PacketDeduplicator()
+    process = MQTTProcess(MagicMock(), deduplicator=deduplicator, ring_bytes=64 * 1024)
+    process.start()
+    try:
+        handler = process.handler_for("1234abcd", lambda: ["LongFast"])
+        # No broker address, so the client is set up but never connects
+        handler.configure(module_config_pb2.ModuleConfig.MQTTConfig(root="msh"))
+        handler.start()
+        assert _wait_for(lambda: handler.ingress is not None)
+        assert not handler.connected
+        assert [stage["name"] for stage in handler.ingress.stats()][0] == "stat"
+        assert handler.publish_latency.count == 0
+
+        deduplicator.mark_seen("!00005678", 7)
+        assert process.stats()["sent"] >= 2
+
+        process.process.terminate()
+        assert _wait_for(lambda: process.restarts == 1)
+        handler.ingress = None
+        # The node's config is sent again to the new process
+        assert _wait_for(lambda: handler.ingress is not None)
+        assert process.stats()["alive"]
+    finally:
+        process.stop()
+    assert not process.process.is_alive()
+    assert process.mark_seen not in deduplicator.listeners
@@ -62,7 +62,7 @@ class TestMQTTHandler:
         handler.client.publish.return_value.rc = 0
         
         assert handler.publish("topic", b"payload") == True
-        handler.client.publish.assert_called_with("topic", b"payload", retain=False)
+        handler.client.publish.assert_called_with("topic", b"payload", retain=False, qos=0)
 
     def test_on_message(self):
         """Test MQTT -> Node message handling"""
@@ -0,0 +1,121 @@
+"""Test multi-radio mode: several nodes sharing one process and broker connection."""
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg as proxy_cfg
+from handlers.multi_radio import SharedBrokers, MultiRadioSupervisor, target_config, broker_key
+from handlers.mqtt import MQTTHandler
+from handlers.node_tracker import PacketDeduplicator
+from meshtastic.protobuf import mqtt_pb2
+
+
+def test_radio_targets_config():
+    env = {"RADIO_TARGETS": "tcp:10.0.0.5:4404, 10.0.0.6, serial:/dev/ttyUSB1"}
+    with patch.dict(os.environ, env):
+        from config import Config
+        cfg = Config()
+    assert cfg.radio_targets == [("tcp", "10.0.0.5", 4404), ("tcp", "10.0.0.6", cfg.tcp_node_port),
+                                 ("serial", "/dev/ttyUSB1", None)]
+
+    node_cfg = target_config(cfg, ("serial", "/dev/ttyUSB1", None))
+    assert node_cfg.interface_type == "serial" and node_cfg.serial_port == "/dev/ttyUSB1"
+    assert cfg.interface_type != "serial" or cfg.serial_port != "/dev/ttyUSB1"
+
+
+def _mqtt_cfg(root="msh/US"):
+    return MagicMock(address="broker.example", port=1883, username="u", password="p", tlsEnabled=False, root=root)
+
+
+def _factory(*args, **kwargs):
+    handler = MQTTHandler(*args, **kwargs)
+    handler.configure = MagicMock()
+    handler.start = MagicMock()
+    handler.stop = MagicMock()
+    handler.client = MagicMock()
+    handler.mqtt_root = "msh/US"
+    return handler
+
+
+def test_nodes_with_same_broker_share_a_connection(monkeypatch):
+    brokers = SharedBrokers(SimpleNamespace(), PacketDeduplicator(), handler_factory=_factory)
+    a = brokers.attach("0000000a", _mqtt_cfg(), MagicMock(), lambda: ["LongFast"])
+    b = brokers.attach("0000000b", _mqtt_cfg(), MagicMock(), lambda: ["MediumFast"])
+    c = brokers.attach("0000000c", _mqtt_cfg(root="msh/EU"), MagicMock(), None)
+    assert a is b and a is not c and len(brokers) == 2
+    assert broker_key(_mqtt_cfg()) != broker_key(_mqtt_cfg(root="msh/EU"))
+
+    # Selective plans cover the channels of every node on the connection
+    monkeypatch.setattr(proxy_cfg, "mqtt_selective_subscribe", True)
+    a.config.extra_mqtt_roots = []
+    assert a._planned_topics()[:2] == ["msh/US/2/e/LongFast/#", "msh/US/2/e/MediumFast/#"]
+
+    # The owner leaving keeps the connection for the peer; the last node stops it
+    brokers.detach(a, "0000000a")
+    a.stop.assert_not_called()
+    brokers.detach(b, "0000000b")
+    a.stop.assert_called_once()
+    assert len(brokers) == 1
+
+
+def _message(gateway, sender, packet_id, encrypted=True):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.gateway_id = f"!{gateway}"
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = packet_id
+    if encrypted:
+        envelope.packet.encrypted = b"\x01\x02"
+    else:
+        envelope.packet.decoded.payload = b"hi"
+    return MagicMock(topic=f"msh/US/2/e/LongFast/!{gateway}", payload=envelope.SerializeToString(), retain=False)
+
+
+def test_shared_ingress_delivers_once_per_node():
+    config = SimpleNamespace()
+    config.extra_mqtt_roots = []
+    dedup = PacketDeduplicator()
+    owner_cb, peer_cb = MagicMock(), MagicMock()
+    handler = MQTTHandler(config, "0000000a", owner_cb, deduplicator=dedup)
+    handler.mqtt_root = "msh/US"
+    handler.add_peer("0000000b", peer_cb)
+
+    # Remote traffic goes to both nodes after a single ingress pass
+    handler._on_message(None, None, _message("000000ff", 0xff, 1))
+    assert owner_cb.call_count == 1 and peer_cb.call_count == 1
+    assert sum(st["hits"] for st in handler.ingress.stats() if st["name"] == "stat") == 1
+
+    # A peer's echo reaches only that peer, even though its RF copy was marked seen
+    dedup.mark_seen("!0000000b", 2)
+    handler._on_message(None, None, _message("0000000b", 0x0b, 2))
+    assert owner_cb.call_count == 1 and peer_cb.call_count == 2
+
+    # A peer's non-echo uplink is not downlinked to anyone
+    handler._on_message(None, None, _message("0000000b", 0x0b, 3, encrypted=False))
+    assert owner_cb.call_count == 1 and peer_cb.call_count == 2
+
+    # Packets heard on any node's RF are dropped for all of them
+    dedup.mark_seen("!000000ff", 4)
+    handler._on_message(None, None, _message("000000ff", 0xff, 4))
+    assert owner_cb.call_count == 1 and peer_cb.call_count == 2
+
+
+def test_supervisor_health_covers_every_node():
+    proxies = []
+
+    def factory(target, deduplicator, brokers):
+        proxy = MagicMock(label=target[1], last_healthy=0)
+        proxies.append((proxy, deduplicator, brokers))
+        return proxy
+
+    config = MagicMock(health_check_activity_timeout=300, metrics_port=0)
+    supervisor = MultiRadioSupervisor(config, [("tcp", "a", 4403), ("tcp", "b", 4403)], factory)
+    assert proxies[0][1] is proxies[1][1] and proxies[0][2] is proxies[1][2]
+
+    assert supervisor.healthy(100.0, started=0.0)
+    proxies[0][0].last_healthy = 350.0
+    assert not supervisor.healthy(400.0, started=0.0)
+    proxies[1][0].last_healthy = 390.0
+    assert supervisor.healthy(400.0, started=0.0)
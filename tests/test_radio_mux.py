@@ -0,0 +1,107 @@
+"""Test the radio connection multiplexer."""
+import os
+import sys
+import time
+import socket
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.radio_mux import RadioMux, FrameReader, frame
+from meshtastic import mesh_pb2
+
+
+def test_frame_reader_resyncs_and_splits():
+    reader = FrameReader()
+    data = b"\x00debug log\n" + frame(b"abc") + b"\x94\xc3\xff\xff" + frame(b"de")
+    assert reader.feed(data[:14]) == []
+    assert reader.feed(data[14:]) == [b"abc", b"de"]
+    assert reader.feed(frame(b"xyz")[:1]) == []
+    assert reader.feed(frame(b"xyz")[1:]) == [b"xyz"]
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _recv_exactly(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        assert chunk
+        data += chunk
+    return data
+
+
+def test_fan_out_and_client_writes():
+    to_radio = MagicMock()
+    mux = RadioMux(0, to_radio, host="127.0.0.1")
+    mux.start()
+    try:
+        clients = [socket.create_connection(("127.0.0.1", mux.port), timeout=2) for _ in range(2)]
+        assert _wait_for(lambda: len(mux.clients) == 2)
+
+        mux.broadcast(b"hello")
+        for sock in clients:
+            assert _recv_exactly(sock, 9) == frame(b"hello")
+
+        packet = mesh_pb2.ToRadio()
+        packet.packet.id = 7
+        heartbeat = mesh_pb2.ToRadio()
+        heartbeat.heartbeat.SetInParent()
+        clients[0].sendall(frame(heartbeat.SerializeToString()) + frame(packet.SerializeToString()))
+        assert _wait_for(lambda: to_radio.called)
+        assert to_radio.call_count == 1 and to_radio.call_args.args[0].packet.id == 7
+
+        # A client disconnecting does not end the session for the others
+        bye = mesh_pb2.ToRadio()
+        bye.disconnect = True
+        clients[0].sendall(frame(bye.SerializeToString()))
+        assert _wait_for(lambda: len(mux.clients) == 1)
+        mux.broadcast(b"again")
+        assert _recv_exactly(clients[1], 9) == frame(b"again")
+        for sock in clients:
+            sock.close()
+    finally:
+        mux.stop()
+
+
+def test_slow_client_is_dropped():
+    mux = RadioMux(0, MagicMock(), queue_size=2)
+    slow = MagicMock()
+    slow.offer.return_value = False
+    fast = MagicMock()
+    fast.offer.return_value = True
+    mux.clients = [slow, fast]
+
+    mux.broadcast(b"frame")
+    assert mux.clients == [fast]
+    assert mux.dropped_clients == 1
+    slow.close.assert_called_once()
+    # Every client is offered the same framed buffer
+    assert fast.offer.call_args.args[0] is slow.offer.call_args.args[0]
+
+
+def test_mixin_fans_out_raw_frames():
+    from handlers.meshtastic import MQTTProxyMixin
+
+    class Base:
+        def _handleFromRadio(self, fromRadio):
+            pass
+
+    class Iface(MQTTProxyMixin, Base):
+        pass
+
+    iface = Iface()
+    iface.proxy = MagicMock()
+    iface.proxy.mqtt_handler = None
+    raw = mesh_pb2.FromRadio(id=1).SerializeToString()
+    iface._handleFromRadio(raw)
+    iface.proxy.radio_mux.broadcast.assert_called_once()
+    assert iface.proxy.radio_mux.broadcast.call_args.args[0] == raw
+    assert iface.proxy.radio_mux.broadcast.call_args.args[1].id == 1
@@ -0,0 +1,89 @@
+"""Test per-sender downlink rate limiting."""
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.rate_limit import SenderRateLimiter
+from meshtastic.protobuf import mqtt_pb2
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def test_burst_then_refill():
+    limiter = SenderRateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.allow(1, now=0.0)
+    assert limiter.allow(1, now=0.0)
+    assert not limiter.allow(1, now=0.0)
+    # One token per second
+    assert limiter.allow(1, now=1.0)
+    assert not limiter.allow(1, now=1.5)
+    # Other senders have their own bucket
+    assert limiter.allow(2, now=1.5)
+    assert limiter.throttled == 2
+
+
+def test_table_is_bounded_lru():
+    limiter = SenderRateLimiter(rate_per_minute=1, burst=1, max_senders=3)
+    for sender in (1, 2, 3):
+        limiter.allow(sender, now=0.0)
+    limiter.allow(1, now=0.0)  # touch 1 so 2 becomes least recently used
+    limiter.allow(4, now=0.0)
+    assert len(limiter) == 3
+    # 2 was evicted: it gets a fresh bucket (and a token) again
+    assert limiter.allow(2, now=0.0)
+    assert not limiter.allow(1, now=0.0)
+    assert limiter.evictions == 2
+
+
+def test_idle_buckets_evicted():
+    limiter = SenderRateLimiter(rate_per_minute=1, burst=1, max_senders=100, idle_timeout=10)
+    limiter.allow(1, now=0.0)
+    limiter.allow(2, now=5.0)
+    limiter.allow(3, now=12.0)
+    assert len(limiter) == 2
+
+
+def test_top_throttled():
+    limiter = SenderRateLimiter(rate_per_minute=1, burst=1)
+    for _ in range(5):
+        limiter.allow(0xaa, now=0.0)
+    for _ in range(3):
+        limiter.allow(0xbb, now=0.0)
+    limiter.allow(0xcc, now=0.0)
+    assert limiter.top_throttled(2) == [(0xaa, 4), (0xbb, 2)]
+
+
+def _payload(sender):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = 1
+    return envelope.SerializeToString()
+
+
+def test_proxy_throttles_but_not_own_node():
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    proxy.sender_limiter = SenderRateLimiter(rate_per_minute=1, burst=1)
+    proxy.iface = MagicMock()
+    proxy.iface.localNode.channels = []
+    proxy.iface.localNode.nodeNum = 0x1111
+
+    for _ in range(3):
+        proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", _payload(0x2222), False)
+    assert proxy.message_queue.put.call_count == 1
+
+    for _ in range(3):
+        proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", _payload(0x1111), False)
+    assert proxy.message_queue.put.call_count == 4
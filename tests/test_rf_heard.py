@@ -0,0 +1,157 @@
+"""Test RF-heard suppression and PKI destination filtering."""
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.node_tracker import RFHeardTable, ReachableNodeIndex
+from handlers.meshtastic import MQTTProxyMixin
+from meshtastic import mesh_pb2
+from meshtastic.protobuf import mqtt_pb2
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def test_heard_within_window():
+    table = RFHeardTable(window_seconds=60)
+    table.mark_heard(0xaa, now=0.0)
+    assert table.heard_recently(0xaa, now=59.0)
+    assert not table.heard_recently(0xaa, now=61.0)
+    assert not table.heard_recently(0xbb, now=0.0)
+    assert not table.heard_recently(0, now=0.0)
+
+
+def test_table_is_bounded():
+    table = RFHeardTable(window_seconds=600, max_senders=2)
+    table.mark_heard(1, now=0.0)
+    table.mark_heard(2, now=1.0)
+    table.mark_heard(1, now=2.0)  # Refresh: 2 is now the least recently heard
+    table.mark_heard(3, now=3.0)
+    assert len(table) == 2
+    assert table.heard_recently(1, now=4.0)
+    assert not table.heard_recently(2, now=4.0)
+    assert table.heard_recently(3, now=4.0)
+
+
+class _Parent:
+    def _handleFromRadio(self, fr):
+        pass
+
+
+class _Mixin(MQTTProxyMixin, _Parent):
+    def __init__(self, proxy, my_node):
+        self.proxy = proxy
+        self.myNodeNum = my_node
+
+
+def test_mixin_tracks_rf_senders_only():
+    proxy = MagicMock()
+    proxy.rf_heard = RFHeardTable(window_seconds=60)
+    mixin = _Mixin(proxy, 0x1111)
+
+    def from_radio(sender, via_mqtt=False):
+        fr = mesh_pb2.FromRadio()
+        setattr(fr.packet, "from", sender)
+        fr.packet.to = 0xffffffff
+        fr.packet.via_mqtt = via_mqtt
+        return fr
+
+    mixin._handleFromRadio(from_radio(0x2222))
+    mixin._handleFromRadio(from_radio(0x3333, via_mqtt=True))
+    mixin._handleFromRadio(from_radio(0x1111))
+
+    # Packets the node uplinks through the proxy count as heard too
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", 0x4444)
+    proxied = mesh_pb2.FromRadio()
+    proxied.mqttClientProxyMessage.topic = "msh/2/e/LongFast/!00001111"
+    proxied.mqttClientProxyMessage.data = envelope.SerializeToString()
+    mixin._handleFromRadio(proxied)
+
+    assert proxy.rf_heard.heard_recently(0x2222)
+    assert not proxy.rf_heard.heard_recently(0x3333)
+    assert not proxy.rf_heard.heard_recently(0x1111)
+    assert proxy.rf_heard.heard_recently(0x4444)
+
+
+def _payload(sender, gateway="!gw"):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = 1
+    envelope.gateway_id = gateway
+    return envelope.SerializeToString()
+
+
+def test_proxy_drops_mqtt_copies_of_rf_senders():
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    proxy.rf_heard = RFHeardTable(window_seconds=60)
+    proxy.rf_heard.mark_heard(0x2222)
+    proxy.iface = MagicMock()
+    proxy.iface.localNode.channels = []
+    proxy.iface.localNode.nodeNum = 0x1111
+
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", _payload(0x2222), False)
+    proxy.message_queue.put.assert_not_called()
+    assert proxy.rf_heard.suppressed == 1
+
+    # Our own gateway's echo of the sender's packet still passes
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!00001111", _payload(0x2222, "!00001111"), False)
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", _payload(0x3333), False)
+    assert proxy.message_queue.put.call_count == 2
+
+
+def test_reachable_index_nodedb_and_heard():
+    # The sweep clock starts at construction: pin it to the injected timeline
+    with patch('handlers.node_tracker.time.monotonic', return_value=0.0):
+        index = ReachableNodeIndex(heard_hours=1)
+    index.sync_nodedb({0x10: {"num": 0x10}, 0x20: {"num": 0x20, "viaMqtt": True}})
+    assert 0x10 in index
+    assert 0x20 not in index
+
+    index.mark_heard(0x30, now=0.0)
+    assert 0x30 in index
+    # Heard-only entries expire after the horizon; NodeDB entries stay
+    index.mark_heard(0x40, now=3700.0)
+    assert 0x30 not in index
+    assert 0x10 in index and 0x40 in index
+
+
+def _pki_payload(dest):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", 0x5555)
+    envelope.packet.to = dest
+    envelope.packet.id = 7
+    envelope.gateway_id = "!gw"
+    return envelope.SerializeToString()
+
+
+def test_proxy_drops_pki_for_unreachable_destinations():
+    proxy = MQTTProxy()
+    proxy.message_queue = MagicMock()
+    proxy.reachable_nodes = ReachableNodeIndex()
+    proxy.reachable_nodes.sync_nodedb({0x10: {}})
+    proxy.iface = MagicMock()
+    proxy.iface.localNode.channels = []
+    proxy.iface.localNode.nodeNum = 0x1111
+
+    proxy.on_mqtt_message_to_radio("msh/2/e/PKI/!gw", _pki_payload(0x99), False)
+    proxy.message_queue.put.assert_not_called()
+    assert proxy.reachable_nodes.dropped == 1
+
+    proxy.on_mqtt_message_to_radio("msh/2/e/PKI/!gw", _pki_payload(0x10), False)
+    proxy.on_mqtt_message_to_radio("msh/2/e/PKI/!gw", _pki_payload(0x1111), False)
+    proxy.on_mqtt_message_to_radio("msh/2/e/PKI/!gw", _pki_payload(0xFFFFFFFF), False)
+    # Non-PKI channels are not affected
+    proxy.on_mqtt_message_to_radio("msh/2/e/LongFast/!gw", _pki_payload(0x99), False)
+    assert proxy.message_queue.put.call_count == 4
@@ -0,0 +1,102 @@
+"""Test warm standby radio failover."""
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.standby import StandbyRadio
+
+import importlib.util
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+mqtt_proxy_mod = load_module("mqtt_proxy_test", "mqtt-proxy.py")
+MQTTProxy = mqtt_proxy_mod.MQTTProxy
+
+
+def _iface(node_num):
+    iface = MagicMock()
+    iface.localNode.nodeNum = node_num
+    iface.standby = True
+    return iface
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_standby_connects_and_promotes():
+    ifaces = {"b": _iface(0x0b), "a": _iface(0x0a)}
+    connect = MagicMock(side_effect=lambda target: ifaces[target[1]])
+    standby = StandbyRadio(("tcp", "b", 4403), connect, config_timeout=1)
+    assert standby.promote() is None
+
+    standby.start()
+    try:
+        assert _wait_for(lambda: standby.ready)
+        promoted = standby.promote()
+        assert promoted is ifaces["b"] and promoted.standby is False
+        assert not standby.ready
+
+        # After a failover the failed radio becomes the standby
+        standby.retarget(("tcp", "a", 4403))
+        assert _wait_for(lambda: standby.ready)
+        assert standby.stats() == {"target": "tcp:a:4403", "ready": True}
+
+        # Losing the standby's own connection drops it until it reconnects
+        standby.on_connection_lost(ifaces["a"])
+        ifaces["a"].close.assert_called()
+    finally:
+        standby.stop()
+
+
+def test_proxy_fails_over_to_standby(monkeypatch):
+    import config as cfgmod
+    monkeypatch.setattr(cfgmod.cfg, "standby_target", ("tcp", "standby", 4403))
+    monkeypatch.setattr(cfgmod.cfg, "interface_type", "tcp")
+    monkeypatch.setattr(cfgmod.cfg, "tcp_node_host", "primary")
+    monkeypatch.setattr(cfgmod.cfg, "tcp_node_port", 4403)
+
+    proxy = MQTTProxy()
+    assert proxy.active_target == ("tcp", "primary", 4403)
+    old_iface = _iface(0x0a)
+    old_iface.standby = False
+    proxy.iface = old_iface
+    new_iface = _iface(0x0b)
+    proxy.standby = MagicMock(target=("tcp", "standby", 4403))
+    proxy.standby.promote.return_value = new_iface
+    proxy._init_mqtt = MagicMock()
+
+    # Events from the standby interface don't count as losing our radio
+    proxy.on_connection_lost(new_iface)
+    assert proxy.connection_lost_time == 0
+
+    proxy.on_connection_lost(old_iface)
+    assert proxy._failover(time.time())
+    assert proxy.iface is new_iface and old_iface.standby is True
+    assert proxy.active_target == ("tcp", "standby", 4403)
+    assert proxy.connection_lost_time == 0 and proxy.failovers == 1
+    assert proxy.last_failover_duration is not None
+    proxy.standby.retarget.assert_called_once_with(("tcp", "primary", 4403))
+    proxy._init_mqtt.assert_called_once()
+
+    # The queue follows the active interface
+    assert proxy.message_queue.get_interface() is new_iface
+
+    # Late events from the radio we left are ignored
+    proxy.on_connection_lost(old_iface)
+    assert proxy.connection_lost_time == 0
+
+    proxy.standby.promote.return_value = None
+    assert not proxy._failover(time.time())
@@ -0,0 +1,110 @@
+"""Test selective MQTT subscription planning."""
+import os
+import sys
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch, call
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg as proxy_cfg
+from handlers.subscriptions import SubscriptionPlanner
+from handlers.mqtt import MQTTHandler
+
+
+def make_config(monkeypatch, selective=False, extra_roots=None, allowlists=None):
+    monkeypatch.setattr(proxy_cfg, "mqtt_selective_subscribe", selective)
+    monkeypatch.setattr(proxy_cfg, "extra_mqtt_root_channels", allowlists or {})
+    config = SimpleNamespace()
+    config.extra_mqtt_roots = extra_roots or []
+    return config
+
+
+class TestSubscriptionPlanner:
+
+    def test_wildcard_by_default(self, monkeypatch):
+        planner = SubscriptionPlanner(make_config(monkeypatch, extra_roots=[("msh/US/OH", "OH")]))
+        assert planner.plan("msh/US/MI", ["LongFast"]) == ["msh/US/MI/2/e/#", "msh/US/OH/2/e/#"]
+
+    def test_selective_primary_root(self, monkeypatch):
+        planner = SubscriptionPlanner(make_config(monkeypatch, selective=True))
+        assert planner.plan("msh/US/MI", ["LongFast", "Admin"]) == [
+            "msh/US/MI/2/e/LongFast/#",
+            "msh/US/MI/2/e/Admin/#",
+            "msh/US/MI/2/e/PKI/#",
+        ]
+
+    def test_selective_unknown_channels_falls_back_to_wildcard(self, monkeypatch):
+        planner = SubscriptionPlanner(make_config(monkeypatch, selective=True))
+        assert planner.plan("msh", None) == ["msh/2/e/#"]
+
+    def test_selective_extra_root_allowlist(self, monkeypatch):
+        config = make_config(monkeypatch, 
+            selective=True,
+            extra_roots=[("msh/US/OH", "OH"), ("msh/US/CA", "CA"), ("msh/US/MI", "MI")],
+            allowlists={"msh/US/OH": ["LongFast", "MediumFast"]},
+        )
+        planner = SubscriptionPlanner(config)
+        assert planner.plan("msh/US/MI", []) == [
+            "msh/US/MI/2/e/PKI/#",
+            "msh/US/OH/2/e/LongFast/#",
+            "msh/US/OH/2/e/MediumFast/#",
+            "msh/US/CA/2/e/#",
+        ]
+
+    def test_diff(self):
+        to_sub, to_unsub = SubscriptionPlanner.diff({"a", "b"}, ["b", "c"])
+        assert to_sub == ["c"]
+        assert to_unsub == ["a"]
+
+
+class TestHandlerReplan:
+
+    def _make_handler(self, monkeypatch, channels):
+        state = {"channels": channels}
+        handler = MQTTHandler(make_config(monkeypatch, selective=True), "1234abcd",
+                              channel_provider=lambda: state["channels"])
+        node_cfg = MagicMock()
+        node_cfg.address = "mqtt.example.com"
+        node_cfg.port = 1883
+        node_cfg.tlsEnabled = False
+        node_cfg.root = "msh/US/MI"
+        handler.configure(node_cfg)
+        handler.client = MagicMock()
+        return handler, state
+
+    def test_connect_subscribes_plan(self, monkeypatch):
+        handler, _ = self._make_handler(monkeypatch, ["LongFast"])
+        handler._on_connect(handler.client, None, None, 0)
+        topics = [c[0][0] for c in handler.client.subscribe.call_args_list]
+        assert topics == ["msh/US/MI/2/e/LongFast/#", "msh/US/MI/2/e/PKI/#"]
+
+    def test_replan_is_incremental(self, monkeypatch):
+        handler, state = self._make_handler(monkeypatch, ["LongFast"])
+        handler._on_connect(handler.client, None, None, 0)
+        handler.client.subscribe.reset_mock()
+
+        state["channels"] = ["Admin"]
+        handler.replan()
+
+        handler.client.subscribe.assert_called_once_with("msh/US/MI/2/e/Admin/#")
+        handler.client.unsubscribe.assert_called_once_with("msh/US/MI/2/e/LongFast/#")
+        assert handler.subscriptions == {"msh/US/MI/2/e/Admin/#", "msh/US/MI/2/e/PKI/#"}
+
+    def test_replan_noop_while_disconnected(self, monkeypatch):
+        handler, state = self._make_handler(monkeypatch, ["LongFast"])
+        state["channels"] = ["Admin"]
+        handler.replan()
+        handler.client.subscribe.assert_not_called()
+
+
+class TestConfigParsing:
+
+    def test_extra_root_channels_parsed(self):
+        with patch.dict(os.environ, {"EXTRA_MQTT_ROOT_CHANNELS": "msh/US/OH=LongFast|MediumFast, msh/US/CA=LongFast,bad"}):
+            from config import Config
+            cfg = Config()
+            assert cfg.extra_mqtt_root_channels == {
+                "msh/US/OH": ["LongFast", "MediumFast"],
+                "msh/US/CA": ["LongFast"],
+            }
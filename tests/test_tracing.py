@@ -0,0 +1,111 @@
+"""Test per-packet latency tracing."""
+import os
+import sys
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.histogram import log_bounds
+from handlers.tracing import LatencyTracer, tracer, DOWNLINK, UPLINK, TOTAL
+from handlers.queue import MessageQueue
+from handlers.mqtt import MQTTHandler
+from handlers.mqtt_process import RemoteMQTTHandler
+from meshtastic.protobuf import mqtt_pb2
+
+
+@pytest.fixture
+def fresh_tracer(monkeypatch):
+    monkeypatch.setattr(tracer, "histograms", LatencyTracer().histograms)
+    monkeypatch.setattr(tracer, "enabled", True)
+    tracer.end()
+    return tracer
+
+
+def test_log_bounds_and_stage_intervals():
+    bounds = log_bounds(1e-3, 1.0, 4)
+    assert bounds[0] == 0.001 and bounds[-1] == 1.0 and len(bounds) == 13
+    assert all(b > a for a, b in zip(bounds, bounds[1:]))
+
+    local = LatencyTracer()
+    trace = local.begin(UPLINK)
+    local.stamp("filter")
+    # Traces are per thread: another thread has nothing to stamp
+    other = threading.Thread(target=lambda: local.stamp("publish"))
+    other.start()
+    other.join()
+    assert local.histogram(UPLINK, "publish").count == 0
+    local.stamp("enqueue", direction=DOWNLINK)
+    local.stamp("publish", direction=UPLINK)
+    assert local.current() is None
+    assert local.histogram(UPLINK, "filter").count == 1
+    assert local.histogram(UPLINK, TOTAL).count == 1
+    assert trace.last >= trace.start
+    assert set(local.summary()) == {UPLINK}
+
+    local.enabled = False
+    assert local.begin(DOWNLINK) is None
+
+
+def _envelope_message(topic, sender, packet_id):
+    envelope = mqtt_pb2.ServiceEnvelope()
+    setattr(envelope.packet, "from", sender)
+    envelope.packet.id = packet_id
+    envelope.packet.encrypted = b"\x01"
+    return MagicMock(topic=topic, payload=envelope.SerializeToString(), retain=False)
+
+
+def test_downlink_trace_follows_message_to_radio(fresh_tracer):
+    iface = MagicMock()
+    queue = MessageQueue(SimpleNamespace(mesh_transmit_delay=0), lambda: iface)
+    config = SimpleNamespace()
+    config.ingress_workers = 0
+    config.extra_mqtt_roots = []
+    handler = MQTTHandler(config, "1234abcd", on_message_callback=queue.put)
+    handler.mqtt_root = "msh"
+
+    handler.receive(_envelope_message("msh/2/e/LongFast/!00005678", 0x5678, 1), handler)
+    # Dropped by the stat filter: nothing past receive
+    handler.receive(MagicMock(topic="msh/2/stat/!00005678", payload=b"online", retain=False), handler)
+    assert tracer.current() is None
+    assert tracer.histogram(DOWNLINK, "filter").count == 1
+    assert tracer.histogram(DOWNLINK, "enqueue").count == 1
+
+    item = queue._get()
+    assert item["trace"] is not None
+    queue._dispatch(iface, item, 0.0)
+    for stage in ("dequeue", "write", TOTAL):
+        assert tracer.histogram(DOWNLINK, stage).count == 1
+    # Messages not coming from an MQTT receive carry no trace
+    queue.put("msh/2/e/LongFast/!1", b"\x01", False)
+    assert queue._get()["trace"] is None
+
+
+def test_downlink_trace_forked_per_node(fresh_tracer):
+    iface = MagicMock()
+    queues = [MessageQueue(SimpleNamespace(mesh_transmit_delay=0), lambda: iface) for _ in range(2)]
+    handler = MQTTHandler(SimpleNamespace(extra_mqtt_roots=[]), "0000000a", on_message_callback=queues[0].put)
+    handler.add_peer("0000000b", queues[1].put)
+    handler.mqtt_root = "msh"
+
+    handler.receive(_envelope_message("msh/2/e/LongFast/!00005678", 0x5678, 1), handler)
+    items = [queue._get() for queue in queues]
+    assert items[0]["trace"] is not items[1]["trace"]
+    assert tracer.histogram(DOWNLINK, "enqueue").count == 2
+    for queue, item in zip(queues, items):
+        queue._dispatch(iface, item, 0.0)
+    assert tracer.histogram(DOWNLINK, TOTAL).count == 2
+
+
+def test_uplink_publish_and_status_api(fresh_tracer):
+    process = MagicMock()
+    handler = RemoteMQTTHandler(process, "1234abcd")
+    tracer.begin(UPLINK)
+    tracer.stamp("filter", direction=UPLINK)
+    handler.publish("msh/2/e/LongFast/!1234abcd", b"\x01")
+    assert tracer.current() is None
+    summary = tracer.summary()[UPLINK]
+    assert list(summary) == ["filter", "publish", TOTAL]
+    assert summary[TOTAL]["count"] == 1 and summary[TOTAL]["p99"] is not None
@@ -0,0 +1,103 @@
+"""Test buffering of Node->MQTT uplinks while the broker is unreachable."""
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import paho.mqtt.client as mqtt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import cfg
+from handlers.uplink_buffer import UplinkBuffer
+from handlers.mqtt import MQTTHandler
+
+
+def test_bounded_by_entries_and_bytes():
+    buf = UplinkBuffer(max_entries=3, max_bytes=10)
+    for i in range(4):
+        buf.put(f"msh/2/e/LongFast/!{i}", b"ab", False, now=0.0)
+    assert len(buf) == 3 and buf.overflowed == 1
+    buf.put("msh/2/e/LongFast/!big", b"x" * 8, False, now=0.0)
+    assert buf.stats()["bytes"] == 10
+    assert [buf.pop(now=0.0)[0] for _ in range(2)] == ["msh/2/e/LongFast/!3", "msh/2/e/LongFast/!big"]
+
+
+def test_ttl_and_state_topics():
+    buf = UplinkBuffer(ttl=60)
+    buf.put("msh/2/e/LongFast/!a", b"old", False, now=0.0)
+    buf.put("msh/2/e/LongFast/!a", b"new", False, now=100.0)
+    buf.put("msh/2/stat/!a", b"offline", True, now=0.0)
+    buf.put("msh/2/stat/!a", b"online", True, now=1.0)
+    buf.put("msh/2/map/", b"report", True, now=2.0)
+    assert buf.coalesced == 1
+
+    # State topics first (latest value only, never expired), then the unexpired backlog
+    assert buf.pop(now=120.0) == ("msh/2/stat/!a", b"online", True)
+    assert buf.pop(now=120.0) == ("msh/2/map/", b"report", True)
+    assert buf.pop(now=120.0) == ("msh/2/e/LongFast/!a", b"new", False)
+    assert buf.pop(now=120.0) is None
+    assert buf.expired == 1
+
+
+def _handler(monkeypatch):
+    monkeypatch.setattr(cfg, "mqtt_uplink_buffer_size", 100)
+    monkeypatch.setattr(cfg, "mqtt_uplink_flush_rate", 0.0)
+    handler = MQTTHandler(SimpleNamespace(), "1234abcd")
+    handler.client = MagicMock()
+    return handler
+
+
+def test_publish_buffers_while_disconnected_and_flushes_on_connect(monkeypatch):
+    handler = _handler(monkeypatch)
+    handler.health_check_enabled = True
+    handler.connected = False
+
+    assert handler.publish("msh/2/e/LongFast/!1234abcd", b"one") is False
+    handler.client.publish.assert_not_called()
+
+    # paho reporting no connection also lands in the buffer
+    handler.health_check_enabled = False
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_NO_CONN
+    assert handler.publish("msh/2/e/LongFast/!1234abcd", b"two") is False
+    assert len(handler.uplink_buffer) == 2
+
+    handler.client.publish.reset_mock()
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_SUCCESS
+    handler.current_mqtt_cfg = MagicMock()
+    handler.mqtt_root = "msh"
+    handler._on_connect(handler.client, None, None, 0)
+    handler._flush_thread.join(timeout=1.0)
+
+    payloads = [c.kwargs.get("payload", c.args[1] if len(c.args) > 1 else None)
+                for c in handler.client.publish.call_args_list]
+    assert payloads == ["online", b"one", b"two"]
+    assert len(handler.uplink_buffer) == 0
+
+
+def test_publish_without_buffer_unchanged(monkeypatch):
+    monkeypatch.setattr(cfg, "mqtt_uplink_buffer_size", 0)
+    handler = MQTTHandler(SimpleNamespace(), "1234abcd")
+    handler.client = MagicMock()
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_NO_CONN
+    assert handler.uplink_buffer is None
+    assert handler.publish("topic", b"x") is False
+    assert handler.tx_failures == 1
+
+
+def test_qos1_no_conn_left_to_paho(monkeypatch):
+    handler = _handler(monkeypatch)
+    handler.uplink_qos = 1
+    handler.client.publish.return_value.rc = mqtt.MQTT_ERR_NO_CONN
+    handler.client.publish.return_value.mid = 7
+    assert handler.publish("msh/2/e/LongFast/!1234abcd", b"one") is False
+    # paho keeps QoS 1/2 messages for resend, so the buffer must not hold a second copy
+    assert len(handler.uplink_buffer) == 0
+    assert 7 in handler._inflight
+
+    handler.uplink_buffer.put("msh/2/e/LongFast/!1234abcd", b"two", False)
+    handler.connected = True
+    handler._flush_uplink_buffer()
+    assert len(handler.uplink_buffer) == 0
+    assert handler.client.publish.call_count == 2